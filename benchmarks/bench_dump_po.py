@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_dump_po
+    ~~~~~~~~~~~~~
+
+    Throughput benchmark of po serializers: babel's ``write_po`` against
+    ``sphinx_intl.catalog.write_po``.
+
+    usage: python benchmarks/bench_dump_po.py [--messages N] [--repeat N]
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import argparse
+import io
+import time
+
+from babel.messages import pofile
+
+from sphinx_intl import catalog as c
+
+from synthetic import make_catalog
+
+
+def measure(write, cat, line_width, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        buf = io.BytesIO()
+        start = time.perf_counter()
+        write(buf, cat, line_width)
+        elapsed = time.perf_counter() - start
+        size = len(buf.getvalue())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cat = make_catalog(args.messages, long_ratio=0.3)
+    for line_width in (76, 0):
+        for name, write in (('babel', pofile.write_po), ('sphinx_intl', c.write_po)):
+            best, size = measure(write, cat, line_width, args.repeat)
+            print('{0:<12} width={1:<3} {2:8.1f} ms  {3:8.1f} MB/s  {4:9.0f} msg/s'.format(
+                name, line_width, best * 1000, size / best / 2 ** 20,
+                args.messages / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+    run_benchmarks
+    ~~~~~~~~~~~~~~
+
+    Time catalog and basic functions against a synthetic locale tree.
+
+    usage: python benchmarks/run_benchmarks.py [--output FILE] [--compare FILE]
+
+    Results are stored as json, ``--compare`` flags benchmarks that are slower
+    than the baseline by more than ``--threshold`` and exits with status 1.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import babel
+
+import sphinx_intl
+from sphinx_intl import basic
+from sphinx_intl import catalog as c
+from sphinx_intl import tree
+
+import synthetic
+
+
+def best_of(func, repeat, setup=None):
+    """return the best wall time of ``func`` in seconds"""
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(args, workdir):
+    tree_dir = os.path.join(workdir, 'tree')
+    pot_dir, locale_dir = synthetic.generate_tree(
+        os.path.join(workdir, 'origin'), args.pots, args.messages, args.languages,
+        args.translated, args.fuzzy, args.long_ratio, args.uuids, args.seed)
+    languages = tuple(args.languages)
+    tree_pot_dir = os.path.join(tree_dir, 'pot')
+    tree_locale_dir = os.path.join(tree_dir, 'locale')
+    mo_dir = os.path.join(workdir, 'mo')
+
+    def fresh_tree():
+        shutil.rmtree(tree_dir, ignore_errors=True)
+        shutil.copytree(os.path.dirname(pot_dir), tree_dir)
+
+    def fresh_mo():
+        shutil.rmtree(mo_dir, ignore_errors=True)
+
+    def empty_locale():
+        fresh_tree()
+        shutil.rmtree(tree_locale_dir)
+
+    # the largest po file for micro benchmarks
+    po_files = tree.scan(locale_dir, ('.po',))['.po'].values()
+    sample = max(po_files, key=lambda entry: entry.size).path
+    sample_cat = c.load_po(sample)
+    sample_out = os.path.join(workdir, 'sample')
+
+    results = {}
+    results['catalog.load_po'] = best_of(lambda: c.load_po(sample), args.repeat)
+    results['catalog.dump_po'] = best_of(
+        lambda: c.dump_po(sample_out + '.po', sample_cat), args.repeat)
+    results['catalog.write_mo'] = best_of(
+        lambda: c.write_mo(sample_out + '.mo', sample_cat), args.repeat)
+    results['basic.update (create)'] = best_of(
+        lambda: basic.update(tree_locale_dir, tree_pot_dir, languages),
+        args.repeat, setup=empty_locale)
+    results['basic.update'] = best_of(
+        lambda: basic.update(tree_locale_dir, tree_pot_dir, languages),
+        args.repeat, setup=fresh_tree)
+    results['basic.build'] = best_of(
+        lambda: basic.build(tree_locale_dir, mo_dir, languages),
+        args.repeat, setup=fresh_mo)
+    results['basic.build (up to date)'] = best_of(
+        lambda: basic.build(tree_locale_dir, mo_dir, languages), args.repeat)
+    results['basic.stat'] = best_of(
+        lambda: basic.stat(tree_locale_dir, languages), args.repeat)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'babel': babel.__version__,
+            'sphinx_intl': sphinx_intl.__version__,
+        },
+        'parameters': {
+            'pots': args.pots,
+            'messages': args.messages,
+            'languages': list(languages),
+            'translated': args.translated,
+            'fuzzy': args.fuzzy,
+            'long_ratio': args.long_ratio,
+            'uuids': args.uuids,
+            'seed': args.seed,
+            'sample_size': os.path.getsize(sample),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """print ratios against baseline and return names of regressions"""
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if not base:
+            print('{0:<28} {1:9.3f}s'.format(name, seconds))
+            continue
+        ratio = seconds / base
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        print('{0:<28} {1:9.3f}s  baseline {2:9.3f}s  x{3:.2f}{4}'.format(
+            name, seconds, base, ratio, mark))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pots', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--languages', default='de,ja',
+                        type=lambda s: tuple(filter(None, s.split(','))),
+                        help='comma separated languages')
+    parser.add_argument('--translated', type=float, default=0.5)
+    parser.add_argument('--fuzzy', type=float, default=0.05)
+    parser.add_argument('--long-ratio', type=float, default=0.1)
+    parser.add_argument('--uuids', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', metavar='FILE', help='write results as json')
+    parser.add_argument('--compare', metavar='FILE', help='baseline results json')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed slowdown ratio against baseline (default: 0.1)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sphinx-intl-bench-')
+    try:
+        report = run(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    regressions = compare(report['results'], baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print('{0} benchmark(s) regressed: {1}'.format(
+            len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
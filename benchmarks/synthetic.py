@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    synthetic
+    ~~~~~~~~~
+
+    Generate synthetic pot/po trees that look like the output of Sphinx's
+    gettext builder and ``sphinx-intl update``.
+
+    usage: python benchmarks/synthetic.py <DIR> [--pots N] [--messages N] ...
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import argparse
+import os
+import random
+import uuid
+
+from babel.messages import Catalog
+
+from sphinx_intl import catalog as c
+
+WORDS = ('sphinx', 'translation', 'document', 'the', 'of', 'reST', '``literal``',
+         'catalog', 'message', ':ref:`target`', 'and', 'with', 'builder',
+         'cross-reference', 'a', 'to', ':py:func:`sphinx_intl.basic.update`',
+         'configuration', 'is', '*emphasis*', 'directive', '--', 'option')
+
+POT_HEADER = '''\
+# SOME DESCRIPTIVE TITLE.
+# Copyright (C) 2019, Takayuki SHIMIZUKAWA
+# This file is distributed under the same license as the benchmark package.
+# FIRST AUTHOR <EMAIL@ADDRESS>, YEAR.
+#
+#, fuzzy
+msgid ""
+msgstr ""
+"Project-Id-Version: benchmark 1.0\\n"
+"Report-Msgid-Bugs-To: \\n"
+"POT-Creation-Date: 2019-05-03 21:58+0900\\n"
+"PO-Revision-Date: YEAR-MO-DA HO:MI+ZONE\\n"
+"Last-Translator: FULL NAME <EMAIL@ADDRESS>\\n"
+"Language-Team: LANGUAGE <LL@li.org>\\n"
+"MIME-Version: 1.0\\n"
+"Content-Type: text/plain; charset=UTF-8\\n"
+"Content-Transfer-Encoding: 8bit\\n"
+
+'''
+
+
+def make_text(rnd, long_ratio=0.1):
+    """make a random paragraph, sometimes as long as a reST paragraph"""
+    if rnd.random() < long_ratio:
+        count = rnd.randint(80, 300)
+    else:
+        count = rnd.randint(1, 25)
+    return ' '.join(rnd.choice(WORDS) for _ in range(count))
+
+
+def make_messages(rnd, count, long_ratio=0.1, uuids=False):
+    """make messages as [(msgid, [(source, lineno), ...], [uuid, ...]), ...]"""
+    messages = []
+    for i in range(count):
+        msgid = '{0} {1}'.format(make_text(rnd, long_ratio), i)
+        locations = [('../../doc{0}.rst'.format(rnd.randint(0, 9)), rnd.randint(1, 2000))
+                     for _ in range(rnd.choice((1, 1, 1, 2, 5)))]
+        ids = [uuid.UUID(int=rnd.getrandbits(128)).hex for _ in locations] if uuids else []
+        messages.append((msgid, locations, ids))
+    return messages
+
+
+def make_catalog(messages, seed=0, locale='ja', translated=0.5, long_ratio=0.1):
+    """make a translated babel catalog with ``messages`` entries"""
+    rnd = random.Random(seed)
+    cat = Catalog(locale=locale, project='benchmark', version='1.0')
+    for msgid, locations, ids in make_messages(rnd, messages, long_ratio):
+        msgstr = msgid.upper() if rnd.random() < translated else ''
+        cat.add(msgid, msgstr, locations=locations)
+    return cat
+
+
+def write_pot(filename, messages):
+    """write a pot file in the same layout as Sphinx's gettext builder"""
+    lines = [POT_HEADER]
+    for msgid, locations, ids in messages:
+        for source, lineno in locations:
+            lines.append('#: {0}:{1}\n'.format(source, lineno))
+        for id_ in ids:
+            lines.append('#: {0}\n'.format(id_))
+        lines.append('msgid "{0}"\nmsgstr ""\n\n'.format(
+            msgid.replace('\\', '\\\\').replace('"', '\\"')))
+    dirname = os.path.dirname(filename)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(''.join(lines))
+
+
+def generate_tree(root, pots=20, messages=100, languages=('de', 'ja'),
+                  translated=0.5, fuzzy=0.05, long_ratio=0.1, uuids=False, seed=0):
+    """
+    Generate ``<root>/pot/*.pot`` and ``<root>/locale/<lang>/LC_MESSAGES/*.po``.
+
+    :param unicode root: output directory
+    :param int pots: number of pot files
+    :param int messages: average number of messages per pot file
+    :param tuple languages: languages of po files, empty for pot only tree
+    :param float translated: ratio of translated messages in po files
+    :param float fuzzy: ratio of fuzzy messages in po files
+    :param float long_ratio: ratio of long paragraphs
+    :param bool uuids: add uuid comments like ``gettext_uuid = True``
+    :param int seed: random seed, same arguments generate the same tree
+    :return: (pot_dir, locale_dir)
+    """
+    rnd = random.Random(seed)
+    pot_dir = os.path.join(root, 'pot')
+    locale_dir = os.path.join(root, 'locale')
+    for i in range(pots):
+        basename = os.path.join('section{0}'.format(i % 5), 'doc{0}'.format(i))
+        count = max(1, int(rnd.gauss(messages, messages / 2)))
+        msgs = make_messages(rnd, count, long_ratio, uuids)
+        write_pot(os.path.join(pot_dir, basename + '.pot'), msgs)
+
+        for lang in languages:
+            cat = Catalog(locale=lang, project='benchmark', version='1.0')
+            for msgid, locations, ids in msgs:
+                if rnd.random() < 0.05:
+                    continue  # new message in pot
+                r = rnd.random()
+                msgstr = '[{0}] {1}'.format(lang, msgid) if r < translated else ''
+                flags = ('fuzzy',) if msgstr and r < translated * fuzzy else ()
+                cat.add(msgid, msgstr, locations=locations, flags=flags)
+            for j in range(rnd.randint(0, 3)):  # removed messages
+                cat.add('removed message {0} {1}'.format(i, j), 'removed')
+            c.dump_po(os.path.join(locale_dir, lang, 'LC_MESSAGES', basename + '.po'), cat)
+    return pot_dir, locale_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', metavar='DIR')
+    parser.add_argument('--pots', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--languages', default='de,ja', help='comma separated languages')
+    parser.add_argument('--translated', type=float, default=0.5)
+    parser.add_argument('--fuzzy', type=float, default=0.05)
+    parser.add_argument('--long-ratio', type=float, default=0.1)
+    parser.add_argument('--uuids', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_tree(args.root, args.pots, args.messages,
+                  tuple(filter(None, args.languages.split(','))),
+                  args.translated, args.fuzzy, args.long_ratio, args.uuids, args.seed)
+
+
+if __name__ == '__main__':
+    main()
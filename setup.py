@@ -6,7 +6,7 @@ from sphinx_intl import __version__
 
 install_requires = [
     'setuptools',
-    'click',
+    'click>=8',
     'babel',
     'sphinx',
 ]
@@ -17,6 +17,9 @@ extras_require = {
         'mock',
         'six',
     ],
+    'watch': [
+        'watchdog',
+    ],
 }
 
 here = os.path.abspath(os.path.dirname(__file__))
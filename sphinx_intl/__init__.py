@@ -1,3 +1,9 @@
 # -*- coding: utf-8 -*-
 
 __version__ = '2.1.0'
+
+
+def setup(app):
+    """Sphinx extension to build mo files in sphinx-build, see sphinx_intl.ext"""
+    from .ext import setup
+    return setup(app)
@@ -1,142 +1,1435 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import os
-from glob import glob
-
-import click
+import time
+from collections import namedtuple
+from functools import partial
 
+from . import bundle as bundle_
 from . import catalog as c
-from .pycompat import relpath
+from . import locking
+from . import parallel
+from . import records
+from . import report
+from . import timing
+from . import tree
+from . import vcs
+
+
+# size is the total size in bytes of the files to parse, for scheduling.
+UpdateTask = namedtuple('UpdateTask', 'basename lang pot_file po_file exists size')
+BuildTask = namedtuple('BuildTask', 'po_file mo_file size')
+BundleTask = namedtuple('BundleTask', 'bundle_file entries')
+# name is the entry name in the bundle, and a stale entry is compiled again.
+BundleEntry = namedtuple('BundleEntry', 'name po_file size stale')
+SyncTask = namedtuple('SyncTask', 'basename pot_file targets')
+SyncTarget = namedtuple('SyncTarget', 'lang po_file mo_file exists stale')
+# old_data is the content of the old file read from git, if old_file is None.
+DiffTask = namedtuple('DiffTask', 'po_file old_file new_file old_data')
+ImportTask = namedtuple('ImportTask', 'po_file records')
+
+# events of each processed file. status is 'create', 'update' or 'notchanged',
+# and duration is seconds to process the file.
+UpdateEvent = namedtuple('UpdateEvent', 'status po_file added deleted pruned duration')
+BuildEvent = namedtuple('BuildEvent', 'mo_file po_file duration')
+BundleEvent = namedtuple('BundleEvent', 'bundle_file compiled total duration')
+StatEvent = namedtuple('StatEvent', 'po_file translated fuzzy untranslated duration')
+# changes is {KIND: [{'msgid': ..., 'msgctxt': ..., 'old': ..., 'new': ...}, ...]}
+# of catalog.DIFF_KINDS, or an empty dict if the file is not changed.
+DiffEvent = namedtuple('DiffEvent', 'po_file changes duration')
+# unmatched is [msgid, ...] of records whose message is not found.
+ImportEvent = namedtuple('ImportEvent', 'po_file updated unmatched duration')
 
 
 # ==================================
 # utility functions
 
 def get_lang_dirs(path):
-    dirs = [relpath(d, path)
-            for d in glob(path+'/[a-z]*')
-            if os.path.isdir(d) and not d.endswith('pot')]
-    return (tuple(dirs),)
+    return (tree.get_lang_dirs(path),)
+
+
+def in_shard(relname, shard):
+    """
+    Whether a resource belongs to the shard. Resources are distributed by a
+    stable hash of the path, so all languages of a resource and every run
+    with the same shard count select the same files.
+
+    :param unicode relname: resource path in a language directory such as
+                            ``LC_MESSAGES/index``
+    :param tuple shard: (index, count) where index starts from 1, or None for all
+    :rtype: bool
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    digest = hashlib.sha1(relname.replace(os.sep, '/').encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count == index - 1
+
+
+def merge_results(results):
+    """
+    Merge results of update, build, stat or sync that are processed in
+    shards, into the same structure of one run. Numbers are summed up,
+    dicts are merged recursively and lists are concatenated.
+
+    :param list results: results of the same command
+    :return: merged result
+    """
+    merged = None
+    for result in results:
+        if merged is None:
+            merged = result
+        elif isinstance(result, dict):
+            merged = dict(merged)
+            for key, value in result.items():
+                merged[key] = merge_results([merged[key], value]) if key in merged else value
+        else:
+            merged = merged + result
+    return merged
+
+
+def new_po_file(locale_dir, lang, relname, compression=None):
+    """path for a new po file, with ``.gz`` or ``.xz`` for the compression"""
+    po_file = os.path.join(locale_dir, lang, relname + '.po')
+    return po_file + '.' + compression if compression else po_file
+
+
+def is_changed(changed, *paths):
+    """whether any of the paths is in ``changed``, or True if it is None"""
+    return changed is None or any(path in changed for path in paths)
+
+
+def is_same_dir(path1, path2):
+    return path1 == path2 or (
+        os.path.exists(path1) and os.path.exists(path2) and
+        os.path.samefile(path1, path2))
 
 
 # ==================================
-# commands
+# tasks
 
-def update(locale_dir, pot_dir, languages, line_width=76):
+def update_tasks(locale_dir, pot_dir, languages, shard=None, changed=None,
+                 compression=None):
     """
-    Update specified language's po files from pot.
+    Collect (pot, po) pairs to update.
 
     :param unicode locale_dir: path for locale directory
     :param unicode pot_dir: path for pot directory
     :param tuple languages: languages to update po files
+    :param tuple shard: (index, count) to collect only a part, see in_shard()
+    :param changed: collect only pairs that the pot file or the po file is in
+                    it, or the po file doesn't exist, such as vcs.Changes
+    :param unicode compression: 'gz' or 'xz' to create new po files compressed
+    :return: [UpdateTask, ...]
+    :rtype: list
+    """
+    pots = tree.scan(pot_dir, ('.pot',))['.pot']
+    pos = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+
+    tasks = []
+    for basename in sorted(pots):
+        if not in_shard(os.path.join('LC_MESSAGES', basename), shard):
+            continue
+        pot_file = pots[basename].path
+        for lang in languages:
+            po = pos[lang]['.po'].get(os.path.join('LC_MESSAGES', basename))
+            exists = po is not None
+            po_file = po.path if exists else new_po_file(
+                locale_dir, lang, os.path.join('LC_MESSAGES', basename), compression)
+            if exists and not is_changed(changed, pot_file, po_file):
+                continue
+            size = pots[basename].size + (po.size if exists else 0)
+            tasks.append(UpdateTask(basename, lang, pot_file, po_file, exists, size))
+    return tasks
+
+
+def build_tasks(locale_dir, output_dir, languages, shard=None, changed=None):
+    """
+    Collect po files that have no mo file or newer than the mo file.
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode output_dir: path for mo output directory
+    :param tuple languages: languages to build mo files
+    :param tuple shard: (index, count) to collect only a part, see in_shard()
+    :param changed: files changed since a revision, such as vcs.Changes. Po
+                    files whose mo file is missing or older are collected
+                    even if they are not in it, and the mtimes already limit
+                    the po files to the touched ones, so it doesn't narrow
+                    the po files to build.
+    :return: [BuildTask, ...]
+    :rtype: list
+    """
+    if is_same_dir(locale_dir, output_dir):
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po', '.mo'))
+        mos = files
+    else:
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+        mos = tree.scan_locale_dir(output_dir, languages, ('.mo',))
+
+    tasks = []
+    for lang in languages:
+        lang_mos = mos[lang]['.mo']
+        for basename, po in sorted(files[lang]['.po'].items()):
+            if not in_shard(basename, shard):
+                continue
+            mo = lang_mos.get(basename)
+            if mo is not None and mo.mtime > po.mtime:
+                continue
+            mo_file = os.path.join(output_dir, lang, basename + ".mo")
+            tasks.append(BuildTask(po.path, mo_file, po.size))
+    return tasks
+
+
+def bundle_tasks(locale_dir, output_dir, languages):
+    """
+    Collect bundles to build. A bundle of a language is built if a po file
+    is newer than the bundle, or po files are added or removed. Entries of
+    po files that are older than the bundle are copied from it.
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode output_dir: path for bundle output directory
+    :param tuple languages: languages to build bundles
+    :return: [BundleTask, ...]
+    :rtype: list
+    """
+    files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+    tasks = []
+    for lang in languages:
+        bundle_file = os.path.join(output_dir, lang + bundle_.BUNDLE_EXT)
+        names = set()
+        mtime = None
+        if os.path.exists(bundle_file):
+            try:
+                with bundle_.Bundle(bundle_file) as b:
+                    names = set(b.names())
+                mtime = os.path.getmtime(bundle_file)
+            except ValueError:
+                pass  # build it again
+        entries = []
+        for basename, po in sorted(files[lang]['.po'].items()):
+            name = (basename + '.mo').replace(os.sep, '/')
+            stale = mtime is None or po.mtime >= mtime or name not in names
+            entries.append(BundleEntry(name, po.path, po.size, stale))
+        if entries and (any(e.stale for e in entries) or len(entries) != len(names)):
+            tasks.append(BundleTask(bundle_file, entries))
+    return tasks
+
+
+def stat_tasks(locale_dir, languages, shard=None):
+    """
+    Collect po files to take statistics.
+
+    :param unicode locale_dir: path for locale directory
+    :param tuple languages: languages of po files
+    :param tuple shard: (index, count) to collect only a part, see in_shard()
+    :return: [po_file, ...]
+    :rtype: list
+    """
+    files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+    return [po.path
+            for lang in languages
+            for basename, po in sorted(files[lang]['.po'].items())
+            if in_shard(basename, shard)]
+
+
+def sync_tasks(locale_dir, pot_dir, languages, output_dir=None, shard=None,
+               changed=None, compression=None):
+    """
+    Collect pot files with their po and mo files of all languages, and po
+    files that have no pot file, to be processed together by sync_files().
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode pot_dir: path for pot directory
+    :param tuple languages: languages to sync
+    :param unicode output_dir: path for mo output directory, default is locale_dir
+    :param tuple shard: (index, count) to collect only a part, see in_shard()
+    :param changed: collect only files in it, such as vcs.Changes, and files
+                    whose po file or mo file is missing or older
+    :param unicode compression: 'gz' or 'xz' to create new po files compressed
+    :return: [SyncTask, ...]
+    :rtype: list
+    """
+    output_dir = output_dir or locale_dir
+    pots = tree.scan(pot_dir, ('.pot',))['.pot']
+    if is_same_dir(locale_dir, output_dir):
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po', '.mo'))
+        mos = files
+    else:
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+        mos = tree.scan_locale_dir(output_dir, languages, ('.mo',))
+
+    def target(lang, relname):
+        po = files[lang]['.po'].get(relname)
+        mo = mos[lang]['.mo'].get(relname)
+        return SyncTarget(
+            lang,
+            po.path if po is not None else new_po_file(
+                locale_dir, lang, relname, compression),
+            os.path.join(output_dir, lang, relname + ".mo"),
+            po is not None,
+            po is None or mo is None or mo.mtime <= po.mtime)
+
+    tasks = []
+    synced = set()
+    for basename in sorted(pots):
+        relname = os.path.join('LC_MESSAGES', basename)
+        synced.add(relname)
+        if not in_shard(relname, shard):
+            continue
+        pot_file = pots[basename].path
+        targets = [target(lang, relname) for lang in languages]
+        targets = [t for t in targets
+                   if t.stale or is_changed(changed, pot_file, t.po_file)]
+        if targets:
+            tasks.append(SyncTask(basename, pot_file, targets))
+    for lang in languages:
+        for relname in sorted(files[lang]['.po']):
+            if relname not in synced and in_shard(relname, shard):
+                t = target(lang, relname)
+                if t.stale or is_changed(changed, t.po_file):
+                    tasks.append(SyncTask(relname, None, [t]))
+    return tasks
+
+
+def find_output_conflicts(targets, bundle=False):
+    """
+    Find po files of locale directories that are built into the same file,
+    when the locale directories share an output directory.
+
+    :param list targets: [(locale_dir, pot_dir, languages), ...]. pot_dir is
+                         None to find only existing po files, otherwise po
+                         files to be created from pot files are also found.
+    :param bool bundle: whether po files of a language are built into a bundle
+    :return: [(output file relative to output directory, locale_dir,
+             other locale_dir), ...]
+    :rtype: list
+    """
+    owners = {}
+    conflicts = []
+    for locale_dir, pot_dir, languages in targets:
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+        pots = tree.scan(pot_dir, ('.pot',))['.pot'] if pot_dir else {}
+        for lang in languages:
+            basenames = set(files[lang]['.po'])
+            basenames.update(os.path.join('LC_MESSAGES', basename) for basename in pots)
+            if bundle:
+                names = [lang + bundle_.BUNDLE_EXT] if basenames else []
+            else:
+                names = [os.path.join(lang, basename + '.mo')
+                         for basename in sorted(basenames)]
+            for name in names:
+                owner = owners.setdefault(name, locale_dir)
+                if owner != locale_dir:
+                    conflicts.append((name, owner, locale_dir))
+    return conflicts
+
+
+def find_orphans(locale_dir, pot_dir, languages, output_dir=None, shared_locale_dirs=()):
+    """
+    Find po files whose pot file no longer exists, and mo files whose po file
+    no longer exists or is an orphan. Nothing is an orphan if ``pot_dir`` has
+    no pot files, to protect translations from a wrong ``pot_dir``.
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode pot_dir: path for pot directory
+    :param tuple languages: languages to find orphans
+    :param unicode output_dir: path for mo output directory, default is locale_dir
+    :param list shared_locale_dirs: other locale directories that build mo
+                                    files into ``output_dir``. Their po files
+                                    keep the mo files, and their orphans are
+                                    found with their own locale directory.
+    :return: [path, ...]
+    :rtype: list
+    """
+    output_dir = output_dir or locale_dir
+    pots = tree.scan(pot_dir, ('.pot',))['.pot']
+    if not pots:
+        return []
+    if is_same_dir(locale_dir, output_dir):
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po', '.mo'))
+        mos = files
+    else:
+        files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+        mos = tree.scan_locale_dir(output_dir, languages, ('.mo',))
+
+    shared = [tree.scan_locale_dir(d, languages, ('.po',)) for d in shared_locale_dirs]
+    expected = set(os.path.join('LC_MESSAGES', basename) for basename in pots)
+    orphans = []
+    for lang in languages:
+        live = set()
+        for other in shared:
+            live.update(other[lang]['.po'])
+        for basename, po in sorted(files[lang]['.po'].items()):
+            # only po files in LC_MESSAGES are created from pot files
+            if basename.startswith('LC_MESSAGES' + os.sep) and basename not in expected:
+                orphans.append(po.path)
+            else:
+                live.add(basename)
+        orphans.extend(mo.path for basename, mo in sorted(mos[lang]['.mo'].items())
+                       if basename not in live)
+    return orphans
+
+
+def diff_tasks(old_dir, new_dir, languages):
+    """
+    Collect po files to compare between two locale directories.
+
+    :param unicode old_dir: path for old locale directory
+    :param unicode new_dir: path for new locale directory
+    :param tuple languages: languages of po files
+    :return: [DiffTask, ...]. po_file is the path in new_dir, or in old_dir if
+             the file is removed.
+    :rtype: list
+    """
+    olds = tree.scan_locale_dir(old_dir, languages, ('.po',))
+    news = tree.scan_locale_dir(new_dir, languages, ('.po',))
+    tasks = []
+    for lang in languages:
+        old_files, new_files = olds[lang]['.po'], news[lang]['.po']
+        for basename in sorted(set(old_files) | set(new_files)):
+            old, new = old_files.get(basename), new_files.get(basename)
+            tasks.append(DiffTask((new or old).path, old and old.path, new and new.path,
+                                  None))
+    return tasks
+
+
+def diff_tasks_since(rev, locale_dir, languages):
+    """
+    Collect po files to compare between the git revision and the work tree.
+    Files that git reports unchanged are skipped without reading, and old
+    contents of the others are read at once.
+
+    :param unicode rev: git revision such as ``HEAD~1`` or ``origin/main``
+    :param unicode locale_dir: path for locale directory
+    :param tuple languages: languages of po files
+    :return: [DiffTask, ...]
+    :rtype: list
+    :raise ValueError: not in a git work tree, or the revision is not found
+    """
+    changes = vcs.changed_since(rev)
+    if changes is None:
+        raise ValueError('git work tree is not found')
+    files = tree.scan_locale_dir(locale_dir, languages, ('.po',))
+    paths = [po.path
+             for lang in languages
+             for basename, po in sorted(files[lang]['.po'].items())
+             if po.path in changes]
+
+    # files removed from the work tree
+    cwd = os.path.realpath('.')
+    for relpath in sorted(changes.changed):
+        path = os.path.relpath(os.path.join(changes.top, relpath), cwd)
+        parts = os.path.relpath(path, locale_dir).split(os.sep)
+        if (parts[0] in languages and tree.split_ext(path)[1] == '.po' and
+                not os.path.exists(path)):
+            paths.append(path)
+
+    contents = vcs.read_files(rev, paths)
+    return [DiffTask(path, None, path if os.path.exists(path) else None, contents[path])
+            for path in paths]
+
+
+def import_tasks(items):
+    """
+    Group records by po file, to write each po file once.
+
+    :param items: iterable of records, see records.load()
+    :return: [ImportTask, ...] in the order that po files appear
+    :rtype: list
+    :raise ValueError: a file of records is not an existing po file
+    """
+    tasks = {}
+    for record in items:
+        po_file = record['file']
+        task = tasks.get(po_file)
+        if task is None:
+            if tree.split_ext(po_file)[1] != '.po' or not os.path.isfile(po_file):
+                raise ValueError('{0} is not an existing po file'.format(po_file))
+            task = tasks[po_file] = ImportTask(po_file, [])
+        task.records.append(record)
+    return list(tasks.values())
+
+
+def update_po(task, line_width=76, backend='babel', **options):
+    """
+    Create or update one po file from the pot file.
+
+    :param UpdateTask task: task to process
+    :param number line_width: maximum line wdith of po files
+    :param unicode backend: 'gettext' to update the po file with GNU msgmerge
+                            if possible, see use_gettext(), or 'babel'
+    :param options: keyword arguments for merge_po() such as prune_obsolete
+    :return: ('create' or 'update' or 'notchanged', number of added msgids,
+             number of deleted msgids, number of pruned obsolete entries)
+    :rtype: tuple
+    """
+    with locking.locked(task.po_file):
+        task = recheck_exists(task)
+        if not task.exists and not is_compact(**options):
+            # rewrite only the header of the pot file if possible
+            if c.init_po(task.pot_file, task.po_file, task.lang, line_width):
+                return 'create', 0, 0, 0
+        if task.exists and use_gettext(backend, task.pot_file, task.po_file, **options):
+            added, deleted = c.msgmerge(task.po_file, task.pot_file, line_width)
+            return ('update' if added or deleted else 'notchanged'), added, deleted, 0
+        cat_pot = c.load_po(task.pot_file)
+        return merge_po(task, cat_pot, line_width, **options)[:4]
+
+
+def recheck_exists(task):
+    """
+    Check again whether the po file exists while it is locked, because
+    another run may have created it after the task was planned.
+
+    :param task: UpdateTask or SyncTarget
+    :return: the task with the current ``exists``
+    """
+    if locking.is_enabled() and not task.exists and os.path.exists(task.po_file):
+        return task._replace(exists=True)
+    return task
+
+
+def is_compact(add_location='full', max_locations=None, uuid=True, **options):
+    """whether the options of merge_po() change location comments"""
+    return add_location != 'full' or max_locations is not None or not uuid
+
+
+def use_gettext(backend, *filenames, **options):
+    """
+    Whether to process the files with GNU gettext. Babel is used instead if
+    msgmerge and msgfmt are not installed, the files are compressed, or the
+    options of merge_po() need the parsed catalog.
+
+    :param unicode backend: 'gettext' or 'babel'
+    :param filenames: paths of files to process
+    :param options: keyword arguments for merge_po()
+    :rtype: bool
+    """
+    if (backend != 'gettext' or is_compact(**options) or options.get('prune_obsolete') or
+            options.get('max_obsolete_age') is not None):
+        return False
+    return c.can_use_gettext(*filenames)
+
+
+def merge_po(task, cat_pot, line_width=76, prune_obsolete=False,
+             max_obsolete_age=None, obsolete_archive=None,
+             add_location='full', max_locations=None, uuid=True):
+    """
+    Create or update one po file from the parsed pot catalog. ``cat_pot`` is
+    used as the new po catalog if the po file does not exist.
+
+    :param UpdateTask task: task to process
+    :param babel.messages.Catalog cat_pot: catalog of the pot file
     :param number line_width: maximum line wdith of po files
+    :param bool prune_obsolete: remove obsolete entries from the po file
+    :param int max_obsolete_age: remove obsolete entries that are obsolete for
+                                 more than the days, implies prune_obsolete
+    :param unicode obsolete_archive: directory to keep removed obsolete entries
+                                     as ``<lang>/LC_MESSAGES/<name>.po``
+    :param unicode add_location: 'full', 'file' or 'never' to keep, deduplicate
+                                 or drop location comments in the po file
+    :param int max_locations: maximum number of location comments of an entry
+    :param bool uuid: keep uuid comments of sphinx ``gettext_uuid``
+    :return: result of update_po() and the catalog of the po file
+    :rtype: tuple
+    """
+    compact = is_compact(add_location, max_locations, uuid)
+    if not task.exists:  # new po file
+        cat_pot.locale = task.lang
+        if compact:
+            c.compact_locations(cat_pot, add_location, max_locations, uuid)
+        c.dump_po(task.po_file, cat_pot, line_width)
+        return 'create', 0, 0, 0, cat_pot
+
+    cat = c.load_po(task.po_file)
+    with timing.phase('merge', task.po_file):
+        msgids = set([m.id for m in cat if m.id])
+        if compact:
+            locations = dict(((m.id, m.context), m.locations) for m in cat if m.id)
+        c.update_with_fuzzy(cat, cat_pot)
+        new_msgids = set([m.id for m in cat if m.id])
+
+    removed, stamped = [], 0
+    if prune_obsolete or max_obsolete_age is not None:
+        removed, stamped = c.prune_obsolete(cat, max_obsolete_age)
+        if removed and obsolete_archive:
+            archive_file = os.path.join(
+                obsolete_archive, task.lang, 'LC_MESSAGES', task.basename + '.po')
+            with locking.locked(archive_file):
+                c.archive_messages(archive_file, removed, task.lang, line_width)
+
+    compacted = False
+    if compact:
+        c.compact_locations(cat, add_location, max_locations, uuid)
+        # write the po file if it is not compacted yet
+        compacted = any(locations.get((m.id, m.context)) != m.locations
+                        for m in cat if m.id)
+
+    if msgids == new_msgids and not removed and not stamped and not compacted:
+        return 'notchanged', 0, 0, 0, cat
+    c.dump_po(task.po_file, cat, line_width)
+    return 'update', len(new_msgids - msgids), len(msgids - new_msgids), len(removed), cat
+
+
+def build_mo(task, backend='babel'):
+    """
+    Build one mo file from the po file.
+
+    :param BuildTask task: task to process
+    :param unicode backend: 'gettext' to build the mo file with GNU msgfmt if
+                            possible, see use_gettext(), or 'babel'
+    :return: None
+    """
+    with locking.locked(task.mo_file):
+        if use_gettext(backend, task.po_file):
+            c.msgfmt(task.po_file, task.mo_file)
+            return
+        cat = c.load_po(task.po_file)
+        c.write_mo(task.mo_file, cat)
+
+
+def compile_po(po_file):
+    """
+    Compile one po file into content of mo file.
+
+    :param unicode po_file: path for po file
+    :return: content of mo file
+    :rtype: bytes
+    """
+    cat = c.load_po(po_file)
+    with timing.phase('compile', po_file):
+        return c.compile_mo(cat)
+
+
+def write_bundle(task, compiled):
+    """
+    Write one bundle with compiled entries, and the other entries that are
+    read from the current bundle.
+
+    :param BundleTask task: task to process
+    :param dict compiled: {name: content of mo file} of stale entries
+    :return: None
+    """
+    with locking.locked(task.bundle_file):
+        with timing.phase('bundle', task.bundle_file):
+            if len(compiled) < len(task.entries):
+                # read before the bundle is replaced
+                with bundle_.Bundle(task.bundle_file) as b:
+                    entries = [(e.name, compiled.get(e.name) or b.read(e.name))
+                               for e in task.entries]
+            else:
+                entries = [(e.name, compiled[e.name]) for e in task.entries]
+            bundle_.write_bundle(task.bundle_file, entries)
+
+
+def stat_po(po_file):
+    """
+    Count entries of one po file.
+
+    :param unicode po_file: path for po file
+    :return: {'translated': 0, 'fuzzy': 0, 'untranslated': 0}
+    :rtype: dict
+    """
+    cat = c.load_po(po_file)
+    with timing.phase('stat', po_file):
+        return count_entries(cat)
+
+
+def count_entries(cat):
+    return {
+        'translated': len(c.translated_entries(cat)),
+        'fuzzy': len(c.fuzzy_entries(cat)),
+        'untranslated': len(c.untranslated_entries(cat)),
+    }
+
+
+def sync_files(task, line_width=76, **options):
+    """
+    Update po files of one pot file, build their mo files and count their
+    entries, parsing the pot file and each po file only once. A po file
+    without pot file is only built and counted.
+
+    :param SyncTask task: task to process
+    :param number line_width: maximum line wdith of po files
+    :param options: keyword arguments for update_po() such as prune_obsolete
+    :return: [UpdateEvent, BuildEvent, StatEvent, ...]. UpdateEvent is only
+             for po files with pot file, and BuildEvent is only for built mo
+             files.
+    :rtype: list
+    """
+    started = time.perf_counter()
+    cat_pot = task.pot_file and c.load_po(task.pot_file)
+    events = []
+    for i, target in enumerate(task.targets):
+        with locking.locked(target.po_file):
+            target = recheck_exists(target)
+            changed = target.stale
+            if cat_pot is None:
+                cat = c.load_po(target.po_file)
+            else:
+                # merging can modify or take over the template
+                template = cat_pot if i == len(task.targets) - 1 else c.copy_catalog(cat_pot)
+                update_task = UpdateTask(task.basename, target.lang, task.pot_file,
+                                         target.po_file, target.exists, None)
+                status, added, deleted, pruned, cat = merge_po(
+                    update_task, template, line_width, **options)
+                changed = changed or status != 'notchanged'
+                events.append(UpdateEvent(status, target.po_file, added, deleted, pruned,
+                                          time.perf_counter() - started))
+                started = time.perf_counter()
+            if changed:
+                with locking.locked(target.mo_file):
+                    c.write_mo(target.mo_file, cat)
+                events.append(BuildEvent(target.mo_file, target.po_file,
+                                         time.perf_counter() - started))
+                started = time.perf_counter()
+        with timing.phase('stat', target.po_file):
+            r = count_entries(cat)
+        events.append(StatEvent(target.po_file, r['translated'], r['fuzzy'],
+                                r['untranslated'], time.perf_counter() - started))
+        started = time.perf_counter()
+    return events
+
+
+def diff_po(task):
+    """
+    Compare messages of one po file between the old and the new version.
+    Messages are parsed only if the contents are different.
+
+    :param DiffTask task: task to process
+    :return: changes of DiffEvent
+    :rtype: dict
+    """
+    with timing.phase('compare', task.po_file):
+        old = task.old_data if task.old_file is None else read_data(task.old_file)
+        new = read_data(task.new_file)
+        if old == new:
+            return {}
+    old_cat = None if old is None else c.parse_po(old, task.old_file or task.po_file)
+    new_cat = None if new is None else c.parse_po(new, task.new_file)
+    with timing.phase('diff', task.po_file):
+        result = c.diff_catalogs(old_cat, new_cat)
+        return dict((kind, [format_change(before, after) for before, after in pairs])
+                    for kind, pairs in result.items())
+
+
+def read_data(path):
+    """:return: content of the file, or None if path is None"""
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def format_change(old, new):
+    """
+    :param old: message of the old version, or None
+    :param new: message of the new version, or None
+    :return: {'msgid': ..., 'msgctxt': ..., 'old': ..., 'new': ...} with
+             strings of the versions, that are None if it doesn't exist
+    :rtype: dict
+    """
+    message = new or old
+    return {
+        'msgid': message.id,
+        'msgctxt': message.context,
+        'old': old and old.string,
+        'new': new and new.string,
+    }
+
+
+def export_records(po_files):
+    """
+    Read records of active entries of po files, parsing one po file at a
+    time to keep memory usage constant.
+
+    :param list po_files: paths for po files
+    :return: iterator of records, see records.message_record()
+    """
+    for po_file in po_files:
+        cat = c.load_po(po_file)
+        for message in cat:
+            if message.id:
+                yield records.message_record(po_file, message)
+
+
+def import_po(task, line_width=76):
+    """
+    Apply records to messages of one po file, and write the po file if it is
+    changed.
+
+    :param ImportTask task: task to process
+    :param number line_width: maximum line wdith of po files
+    :return: (number of updated messages, [msgid, ...] of unmatched records)
+    :rtype: tuple
+    """
+    with locking.locked(task.po_file):
+        cat = c.load_po(task.po_file)
+        updated = 0
+        unmatched = []
+        with timing.phase('import', task.po_file):
+            for record in task.records:
+                message = cat.get(record['msgid'], record.get('msgctxt'))
+                msgstr = record.get('msgstr')
+                if message is None or (msgstr is not None and
+                                       message.pluralizable != isinstance(msgstr, list)):
+                    unmatched.append(record['msgid'])
+                elif apply_record(message, record):
+                    updated += 1
+        if updated:
+            c.dump_po(task.po_file, cat, line_width)
+    return updated, unmatched
+
+
+def apply_record(message, record):
+    """
+    Set msgstr and flags of the record to the message, if they are in the
+    record. msgstr must be a list for a plural message.
+
+    :return: True if the message is changed
+    :rtype: bool
+    """
+    changed = False
+    msgstr = record.get('msgstr')
+    if msgstr is not None:
+        if message.pluralizable:
+            msgstr = tuple(msgstr)
+        if msgstr != message.string:
+            message.string = msgstr
+            changed = True
+    flags = record.get('flags')
+    if flags is not None and set(flags) != message.flags:
+        message.flags = set(flags)
+        changed = True
+    return changed
+
+
+def by_size(tasks, jobs=1):
+    """
+    Sort tasks in descending order of the size for parallel processing, to
+    start large files first instead of waiting for them at the end.
+
+    :param list tasks: [UpdateTask, ...] or [BuildTask, ...]
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: sorted tasks, or tasks as is for one process
+    :rtype: list
+    """
+    if parallel.normalize_jobs(jobs) <= 1:
+        return list(tasks)
+    return sorted(tasks, key=lambda task: -task.size)
+
+
+def timed(func, item):
+    """
+    Call ``func`` with ``item`` and measure the duration.
+
+    :return: (result, seconds)
+    :rtype: tuple
+    """
+    started = time.perf_counter()
+    result = func(item)
+    return result, time.perf_counter() - started
+
+
+# ==================================
+# events
+
+def process_update(tasks, line_width=76, jobs=1, memory_budget=None, **options):
+    """
+    Process update tasks and yield the result of each po file as soon as it
+    is processed, in the order of tasks, or in descending order of the size
+    with multiple processes.
+
+    :param list tasks: [UpdateTask, ...] from update_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param int memory_budget: estimated memory in bytes for each process to
+                              limit large files that are processed at once
+    :param options: keyword arguments for update_po()
+    :return: iterator of UpdateEvent
+    """
+    worker = partial(timed, partial(update_po, line_width=line_width, **options))
+    tasks = by_size(tasks, jobs)
+    results = parallel.imap(worker, tasks, jobs, [task.size for task in tasks],
+                            memory_budget)
+    for task, (result, duration) in zip(tasks, results):
+        status, added, deleted, pruned = result
+        yield UpdateEvent(status, task.po_file, added, deleted, pruned, duration)
+
+
+def process_build(tasks, jobs=1, memory_budget=None, backend='babel'):
+    """
+    Process build tasks and yield each built mo file, in the order of tasks,
+    or in descending order of the size with multiple processes.
+
+    :param list tasks: [BuildTask, ...] from build_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param int memory_budget: estimated memory in bytes for each process to
+                              limit large files that are processed at once
+    :param unicode backend: 'gettext' or 'babel', see build_mo()
+    :return: iterator of BuildEvent
+    """
+    worker = partial(timed, partial(build_mo, backend=backend))
+    tasks = by_size(tasks, jobs)
+    results = parallel.imap(worker, tasks, jobs, [task.size for task in tasks],
+                            memory_budget)
+    for task, (_, duration) in zip(tasks, results):
+        yield BuildEvent(task.mo_file, task.po_file, duration)
+
+
+def process_bundle(tasks, jobs=1, memory_budget=None):
+    """
+    Process bundle tasks and yield each written bundle. Stale entries of all
+    bundles are compiled on one process pool.
+
+    :param list tasks: [BundleTask, ...] from bundle_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param int memory_budget: estimated memory in bytes for each process to
+                              limit large files that are processed at once
+    :return: iterator of BundleEvent
+    """
+    stale = [entry for task in tasks for entry in task.entries if entry.stale]
+    results = parallel.imap(partial(timed, compile_po), [e.po_file for e in stale], jobs,
+                            [e.size for e in stale], memory_budget)
+    for task in tasks:
+        compiled = {}
+        duration = 0.0
+        for entry in task.entries:
+            if entry.stale:
+                compiled[entry.name], seconds = next(results)
+                duration += seconds
+        started = time.perf_counter()
+        write_bundle(task, compiled)
+        yield BundleEvent(task.bundle_file, len(compiled), len(task.entries),
+                          duration + time.perf_counter() - started)
+
+
+def process_stat(tasks, jobs=1):
+    """
+    Process stat tasks and yield statistics of each po file.
+
+    :param list tasks: [po_file, ...] from stat_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: iterator of StatEvent
+    """
+    worker = partial(timed, stat_po)
+    for po_file, (r, duration) in zip(tasks, parallel.imap(worker, tasks, jobs)):
+        yield StatEvent(po_file, r['translated'], r['fuzzy'], r['untranslated'], duration)
+
+
+def process_sync(tasks, line_width=76, jobs=1, **options):
+    """
+    Process sync tasks and yield events of each po and mo file.
+
+    :param list tasks: [SyncTask, ...] from sync_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param options: keyword arguments for update_po()
+    :return: iterator of UpdateEvent, BuildEvent and StatEvent
+    """
+    worker = partial(sync_files, line_width=line_width, **options)
+    for events in parallel.imap(worker, tasks, jobs):
+        for event in events:
+            yield event
+
+
+def process_diff(tasks, jobs=1):
+    """
+    Process diff tasks and yield changes of each po file.
+
+    :param list tasks: [DiffTask, ...] from diff_tasks() or diff_tasks_since()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: iterator of DiffEvent
+    """
+    worker = partial(timed, diff_po)
+    for task, (changes, duration) in zip(tasks, parallel.imap(worker, tasks, jobs)):
+        yield DiffEvent(task.po_file, changes, duration)
+
+
+def process_import(tasks, line_width=76, jobs=1):
+    """
+    Process import tasks and yield the result of each po file.
+
+    :param list tasks: [ImportTask, ...] from import_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: iterator of ImportEvent
+    """
+    worker = partial(timed, partial(import_po, line_width=line_width))
+    for task, (result, duration) in zip(tasks, parallel.imap(worker, tasks, jobs)):
+        updated, unmatched = result
+        yield ImportEvent(task.po_file, updated, unmatched, duration)
+
+
+def format_event(event):
+    """
+    :return: message of the event to print
+    :rtype: unicode
+    """
+    if isinstance(event, UpdateEvent):
+        if event.status == 'create':
+            return 'Create: {0}'.format(event.po_file)
+        elif event.status == 'update':
+            msg = 'Update: {0} +{1}, -{2}'.format(event.po_file, event.added, event.deleted)
+            if event.pruned:
+                msg += ', pruned {0} obsolete'.format(event.pruned)
+            return msg
+        return 'Not Changed: {0}'.format(event.po_file)
+    elif isinstance(event, BuildEvent):
+        return 'Build: {0}'.format(event.mo_file)
+    elif isinstance(event, BundleEvent):
+        return 'Bundle: {0} {1} of {2} compiled'.format(
+            event.bundle_file, event.compiled, event.total)
+    elif isinstance(event, ImportEvent):
+        if not event.updated:
+            return 'Not Changed: {0}'.format(event.po_file)
+        return 'Import: {0} {1} updated'.format(event.po_file, event.updated)
+    elif isinstance(event, DiffEvent):
+        return '{0}: {1}.'.format(event.po_file, ', '.join(
+            '{0} {1}'.format(len(event.changes[kind]), kind) for kind in c.DIFF_KINDS))
+    return '{0}: {1} translated, {2} fuzzy, {3} untranslated.'.format(
+        event.po_file,
+        event.translated,
+        event.fuzzy,
+        event.untranslated,
+    )
+
+
+# ==================================
+# runners
+
+def run_update(tasks, line_width=76, jobs=1, reporter=None, memory_budget=None, **options):
+    """
+    Process update tasks and report the result of each po file.
+
+    :param list tasks: [UpdateTask, ...] from update_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :param int memory_budget: estimated memory in bytes for each process
+    :param options: keyword arguments for update_po()
     :return: {'create': 0, 'update': 0, 'notchanged': 0}
     :rtype: dict
     """
+    reporter = reporter or report.Reporter()
     status = {
         'create': 0,
         'update': 0,
         'notchanged': 0,
     }
+    reporter.start('Updating po files', len(tasks))
+    for event in process_update(tasks, line_width, jobs, memory_budget, **options):
+        status[event.status] += 1
+        reporter.line(format_event(event))
+        reporter.step()
+    reporter.finish(format_update_summary(status))
+    return status
 
-    for dirpath, dirnames, filenames in os.walk(pot_dir):
-        for filename in filenames:
-            pot_file = os.path.join(dirpath, filename)
-            base, ext = os.path.splitext(pot_file)
-            if ext != ".pot":
-                continue
-            basename = relpath(base, pot_dir)
-            for lang in languages:
-                po_dir = os.path.join(locale_dir, lang, 'LC_MESSAGES')
-                po_file = os.path.join(po_dir, basename + ".po")
-                cat_pot = c.load_po(pot_file)
-                if os.path.exists(po_file):
-                    cat = c.load_po(po_file)
-                    msgids = set([m.id for m in cat if m.id])
-                    c.update_with_fuzzy(cat, cat_pot)
-                    new_msgids = set([m.id for m in cat if m.id])
-                    if msgids != new_msgids:
-                        added = new_msgids - msgids
-                        deleted = msgids - new_msgids
-                        status['update'] += 1
-                        click.echo('Update: {0} +{1}, -{2}'.format(
-                            po_file, len(added), len(deleted)))
-                        c.dump_po(po_file, cat, line_width)
-                    else:
-                        status['notchanged'] += 1
-                        click.echo('Not Changed: {0}'.format(po_file))
-                else:  # new po file
-                    status['create'] += 1
-                    click.echo('Create: {0}'.format(po_file))
-                    cat_pot.locale = lang
-                    c.dump_po(po_file, cat_pot, line_width)
 
+def run_build(tasks, jobs=1, reporter=None, memory_budget=None, backend='babel'):
+    """
+    Process build tasks and report each mo file.
+
+    :param list tasks: [BuildTask, ...] from build_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :param int memory_budget: estimated memory in bytes for each process
+    :param unicode backend: 'gettext' or 'babel', see build_mo()
+    :return: [mo_file, ...]
+    :rtype: list
+    """
+    reporter = reporter or report.Reporter()
+    result = []
+    reporter.start('Building mo files', len(tasks))
+    for event in process_build(tasks, jobs, memory_budget, backend):
+        reporter.line(format_event(event))
+        reporter.step()
+        result.append(event.mo_file.replace('\\', '/'))
+    reporter.finish(format_build_summary(len(result)))
+    return result
+
+
+def run_bundle(tasks, jobs=1, reporter=None, memory_budget=None):
+    """
+    Process bundle tasks and report each bundle.
+
+    :param list tasks: [BundleTask, ...] from bundle_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each bundle
+    :param int memory_budget: estimated memory in bytes for each process
+    :return: [bundle_file, ...]
+    :rtype: list
+    """
+    reporter = reporter or report.Reporter()
+    result = []
+    reporter.start('Building bundles', len(tasks))
+    for event in process_bundle(tasks, jobs, memory_budget):
+        reporter.line(format_event(event))
+        reporter.step()
+        result.append(event.bundle_file.replace('\\', '/'))
+    reporter.finish('Bundles: {0} built.'.format(len(result)))
+    return result
+
+
+def run_stat(tasks, jobs=1, reporter=None):
+    """
+    Process stat tasks and report statistics of each po file, that are
+    printed unless the reporter is quiet.
+
+    :param list tasks: [po_file, ...] from stat_tasks()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results
+    :return: {'FILENAME': {'translated': 0, 'fuzzy': 0, 'untranslated': 0}, ...}
+    :rtype: dict
+    """
+    reporter = reporter or report.Reporter()
+    result = {}
+    for event in process_stat(tasks, jobs):
+        reporter.line(format_event(event), report.NORMAL)
+        result[event.po_file.replace('\\', '/')] = stat_result(event)
+    reporter.finish()
+    return result
+
+
+def run_sync(tasks, line_width=76, jobs=1, reporter=None, **options):
+    """
+    Process sync tasks and report the results of update, build and stat.
+
+    :param list tasks: [SyncTask, ...] from sync_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :param options: keyword arguments for update_po()
+    :return: {'update': result of run_update(), 'build': number of mo files,
+             'stat': result of run_stat()}
+    :rtype: dict
+    """
+    reporter = reporter or report.Reporter()
+    status = {
+        'create': 0,
+        'update': 0,
+        'notchanged': 0,
+    }
+    built = 0
+    stats = {}
+    totals = {'translated': 0, 'fuzzy': 0, 'untranslated': 0}
+    reporter.start('Syncing po files', sum(len(task.targets) for task in tasks))
+    for event in process_sync(tasks, line_width, jobs, **options):
+        reporter.line(format_event(event))
+        if isinstance(event, UpdateEvent):
+            status[event.status] += 1
+        elif isinstance(event, BuildEvent):
+            built += 1
+        else:
+            r = stats[event.po_file.replace('\\', '/')] = stat_result(event)
+            for key in totals:
+                totals[key] += r[key]
+            reporter.step()
+    reporter.finish(
+        format_update_summary(status),
+        format_build_summary(built),
+        'Total: {translated} translated, {fuzzy} fuzzy, {untranslated} untranslated.'.format(
+            **totals),
+    )
+    return {'update': status, 'build': built, 'stat': stats}
+
+
+def run_diff(tasks, jobs=1, reporter=None):
+    """
+    Process diff tasks and report changed po files, and changed messages for
+    the verbose reporter.
+
+    :param list tasks: [DiffTask, ...] from diff_tasks() or diff_tasks_since()
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results
+    :return: {'FILENAME': changes of DiffEvent, ...} of changed po files
+    :rtype: dict
+    """
+    reporter = reporter or report.Reporter()
+    result = {}
+    totals = dict((kind, 0) for kind in c.DIFF_KINDS)
+    for event in process_diff(tasks, jobs):
+        if not any(event.changes.values()):
+            continue
+        reporter.line(format_event(event), report.NORMAL)
+        for kind in c.DIFF_KINDS:
+            totals[kind] += len(event.changes[kind])
+            for change in event.changes[kind]:
+                msgid = change['msgid']
+                if isinstance(msgid, (list, tuple)):  # plural forms
+                    msgid = msgid[0]
+                reporter.line('  {0}: {1!r}'.format(kind, msgid))
+        result[event.po_file.replace('\\', '/')] = event.changes
+    reporter.finish(
+        'Po files: {0} changed, {1} not changed.'.format(
+            len(result), len(tasks) - len(result)),
+        'Messages: {0}.'.format(', '.join(
+            '{0} {1}'.format(totals[kind], kind) for kind in c.DIFF_KINDS)),
+    )
+    return result
+
+
+def run_import(tasks, line_width=76, jobs=1, reporter=None):
+    """
+    Process import tasks and report the result of each po file.
+
+    :param list tasks: [ImportTask, ...] from import_tasks()
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :return: {'update': 0, 'notchanged': 0, 'messages': 0, 'unmatched': 0}
+             of po files and records
+    :rtype: dict
+    """
+    reporter = reporter or report.Reporter()
+    status = {
+        'update': 0,
+        'notchanged': 0,
+        'messages': 0,
+        'unmatched': 0,
+    }
+    reporter.start('Importing po files', len(tasks))
+    for event in process_import(tasks, line_width, jobs):
+        status['update' if event.updated else 'notchanged'] += 1
+        status['messages'] += event.updated
+        status['unmatched'] += len(event.unmatched)
+        reporter.line(format_event(event))
+        for msgid in event.unmatched:
+            reporter.line('  not found: {0!r}'.format(msgid))
+        reporter.step()
+    reporter.finish(
+        'Po files: {update} updated, {notchanged} not changed.'.format(**status),
+        'Messages: {messages} updated, {unmatched} not found.'.format(**status),
+    )
     return status
 
 
-def build(locale_dir, output_dir, languages):
+def format_update_summary(status):
+    return 'Po files: {create} created, {update} updated, {notchanged} not changed.'.format(
+        **status)
+
+
+def format_build_summary(count):
+    return 'Mo files: {0} built.'.format(count)
+
+
+def stat_result(event):
+    return {
+        'translated': event.translated,
+        'fuzzy': event.fuzzy,
+        'untranslated': event.untranslated,
+    }
+
+
+# ==================================
+# commands
+
+def update(locale_dir, pot_dir, languages, line_width=76, jobs=1, shard=None,
+           changed_since=None, compression=None, memory_budget=None, **options):
     """
-    Build specified language's po files into mo.
+    Update specified language's po files from pot.
 
     :param unicode locale_dir: path for locale directory
-    :param unicode output_dir: path for mo output directory
+    :param unicode pot_dir: path for pot directory
     :param tuple languages: languages to update po files
-    :return: None
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param tuple shard: (index, count) to process only a part, see in_shard()
+    :param unicode changed_since: git revision to process only pot and po files
+                                  changed since it, see vcs.changed_since()
+    :param unicode compression: 'gz' or 'xz' to create new po files compressed
+    :param int memory_budget: estimated memory in bytes for each process to
+                              limit large files that are processed at once
+    :param options: keyword arguments for update_po() such as prune_obsolete
+    :return: {'create': 0, 'update': 0, 'notchanged': 0}
+    :rtype: dict
     """
-    for lang in languages:
-        lang_dir = os.path.join(locale_dir, lang)
-        for dirpath, dirnames, filenames in os.walk(lang_dir):
-            dirpath_output = os.path.join(output_dir, os.path.relpath(dirpath, locale_dir))
+    changed = changed_since and vcs.changed_since(changed_since)
+    tasks = update_tasks(locale_dir, pot_dir, languages, shard, changed, compression)
+    return run_update(tasks, line_width, jobs, memory_budget=memory_budget, **options)
+
+
+def init_language(locale_dir, pot_dir, languages, line_width=76, jobs=1,
+                  compression=None, reporter=None, **options):
+    """
+    Create po files of new languages from pot. Existing po files are not
+    changed. Only the header of each pot file is rewritten for the language
+    if the pot file is formatted as sphinx-intl writes it, see
+    catalog.init_po().
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode pot_dir: path for pot directory
+    :param tuple languages: languages to create po files
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param unicode compression: 'gz' or 'xz' to create new po files compressed
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :param options: keyword arguments for update_po() such as add_location
+    :return: {'create': 0, 'update': 0, 'notchanged': 0}
+    :rtype: dict
+    """
+    tasks = [task for task in update_tasks(locale_dir, pot_dir, languages,
+                                           compression=compression)
+             if not task.exists]
+    return run_update(tasks, line_width, jobs, reporter, **options)
 
-            for filename in filenames:
-                base, ext = os.path.splitext(filename)
-                if ext != ".po":
-                    continue
 
-                mo_file = os.path.join(dirpath_output, base + ".mo")
-                po_file = os.path.join(dirpath, filename)
+def clean(locale_dir, pot_dir, languages, output_dir=None, dry_run=False,
+          shared_locale_dirs=(), reporter=None):
+    """
+    Delete po and mo files that are left after their pot file was removed.
 
-                if (os.path.exists(mo_file) and
-                   os.path.getmtime(mo_file) > os.path.getmtime(po_file)):
-                    continue
-                click.echo('Build: {0}'.format(mo_file))
-                cat = c.load_po(po_file)
-                c.write_mo(mo_file, cat)
+    :param unicode locale_dir: path for locale directory
+    :param unicode pot_dir: path for pot directory
+    :param tuple languages: languages to clean
+    :param unicode output_dir: path for mo output directory, default is locale_dir
+    :param bool dry_run: only report files to be deleted
+    :param list shared_locale_dirs: other locale directories that build mo
+                                    files into ``output_dir``, see find_orphans()
+    :param report.Reporter reporter: reporter to print results, default is
+                                     to print each file
+    :return: [deleted path, ...]
+    :rtype: list
+    """
+    reporter = reporter or report.Reporter()
+    orphans = find_orphans(locale_dir, pot_dir, languages, output_dir, shared_locale_dirs)
+    for path in orphans:
+        if dry_run:
+            reporter.line('Would delete: {0}'.format(path))
+        else:
+            reporter.line('Delete: {0}'.format(path))
+            os.remove(path)
+    reporter.finish('Orphans: {0} {1}.'.format(
+        len(orphans), 'would be deleted' if dry_run else 'deleted'))
+    return orphans
 
 
-def stat(locale_dir, languages):
+def build(locale_dir, output_dir, languages, jobs=1, shard=None, changed_since=None,
+          memory_budget=None, backend='babel', bundle=False):
+    """
+    Build specified language's po files into mo, or into a bundle of each
+    language.
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode output_dir: path for mo output directory
+    :param tuple languages: languages to update po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param tuple shard: (index, count) to process only a part, see in_shard()
+    :param unicode changed_since: git revision, see build_tasks() for po files
+                                  to build with it
+    :param int memory_budget: estimated memory in bytes for each process to
+                              limit large files that are processed at once
+    :param unicode backend: 'gettext' or 'babel', see build_mo()
+    :param bool bundle: write ``<output_dir>/<lang>.zip`` bundles of mo files
+                        with babel instead of mo files, see bundle_tasks().
+                        shard, changed_since and backend are not used.
+    :return: [mo_file, ...], or [bundle_file, ...] for bundles
+    :rtype: list
+    """
+    if bundle:
+        tasks = bundle_tasks(locale_dir, output_dir, languages)
+        return run_bundle(tasks, jobs, memory_budget=memory_budget)
+    changed = changed_since and vcs.changed_since(changed_since)
+    tasks = build_tasks(locale_dir, output_dir, languages, shard, changed)
+    return run_build(tasks, jobs, memory_budget=memory_budget, backend=backend)
+
+
+def stat(locale_dir, languages, jobs=1, shard=None):
     """
     Print statistics for all po files.
 
     :param unicode locale_dir: path for locale directory
     :param tuple languages: languages to update po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param tuple shard: (index, count) to process only a part, see in_shard()
     :return: {'FILENAME': {'translated': 0, 'fuzzy': 0, 'untranslated': 0}, ...}
     :rtype: dict
     """
-    result = {}
+    tasks = stat_tasks(locale_dir, languages, shard)
+    return run_stat(tasks, jobs)
 
-    for lang in languages:
-        lang_dir = os.path.join(locale_dir, lang)
-        for dirpath, dirnames, filenames in os.walk(lang_dir):
-            for filename in filenames:
-                po_file = os.path.join(dirpath, filename)
-                base, ext = os.path.splitext(po_file)
-                if ext != ".po":
-                    continue
-
-                cat = c.load_po(po_file)
-                r = result[po_file.replace('\\', '/')] = {
-                    'translated': len(c.translated_entries(cat)),
-                    'fuzzy': len(c.fuzzy_entries(cat)),
-                    'untranslated': len(c.untranslated_entries(cat)),
-                }
-                click.echo(
-                    '{0}: {1} translated, {2} fuzzy, {3} untranslated.'.format(
-                        po_file,
-                        r['translated'],
-                        r['fuzzy'],
-                        r['untranslated'],
-                    )
-                )
 
-    return result
+def sync(locale_dir, pot_dir, languages, output_dir=None, line_width=76, jobs=1,
+         shard=None, changed_since=None, compression=None, **options):
+    """
+    Update po files from pot, build them into mo and print statistics in one
+    pass, which parses each pot and po file only once.
+
+    :param unicode locale_dir: path for locale directory
+    :param unicode pot_dir: path for pot directory
+    :param tuple languages: languages to sync
+    :param unicode output_dir: path for mo output directory, default is locale_dir
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param tuple shard: (index, count) to process only a part, see in_shard()
+    :param unicode changed_since: git revision to process only pot and po files
+                                  changed since it, see vcs.changed_since()
+    :param unicode compression: 'gz' or 'xz' to create new po files compressed
+    :param options: keyword arguments for update_po() such as prune_obsolete
+    :return: result of run_sync()
+    :rtype: dict
+    """
+    changed = changed_since and vcs.changed_since(changed_since)
+    tasks = sync_tasks(locale_dir, pot_dir, languages, output_dir, shard, changed,
+                       compression)
+    return run_sync(tasks, line_width, jobs, **options)
+
+
+def diff(old, locale_dir, languages, jobs=1):
+    """
+    Print messages changed between two locale directories, or between a git
+    revision and the work tree of a locale directory.
+
+    :param unicode old: path for old locale directory, or git revision if it
+                        is not a directory
+    :param unicode locale_dir: path for new locale directory
+    :param tuple languages: languages to compare
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: result of run_diff()
+    :rtype: dict
+    :raise ValueError: the revision is not found
+    """
+    if os.path.isdir(old):
+        tasks = diff_tasks(old, locale_dir, languages)
+    else:
+        tasks = diff_tasks_since(old, locale_dir, languages)
+    return run_diff(tasks, jobs)
+
+
+def export(locale_dir, languages, fileobj, fmt='jsonl', shard=None):
+    """
+    Write entries of all po files as records.
+
+    :param unicode locale_dir: path for locale directory
+    :param tuple languages: languages to export
+    :param fileobj: text file object to write
+    :param unicode fmt: 'jsonl' or 'csv'
+    :param tuple shard: (index, count) to process only a part, see in_shard()
+    :return: number of records
+    :rtype: int
+    """
+    po_files = stat_tasks(locale_dir, languages, shard)
+    return records.dump(export_records(po_files), fileobj, fmt)
+
+
+def import_records(fileobj, fmt='jsonl', line_width=76, jobs=1):
+    """
+    Apply records to po files. Each changed po file is written once.
+
+    :param fileobj: text file object to read
+    :param unicode fmt: 'jsonl' or 'csv'
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :return: result of run_import()
+    :rtype: dict
+    :raise ValueError: the records are invalid
+    """
+    tasks = import_tasks(records.load(fileobj, fmt))
+    return run_import(tasks, line_width, jobs)
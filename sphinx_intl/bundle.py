@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.bundle
+    ~~~~~~~~~~~~~~~~~~
+
+    Bundles of mo files of a language for ``build --bundle`` option. A bundle
+    is an uncompressed zip file of ``LC_MESSAGES/<domain>.mo`` entries, that
+    is deployed as one file and read without extracting::
+
+        from sphinx_intl.bundle import Bundle
+
+        with Bundle('locales/ja.zip') as bundle:
+            translations = bundle.translation('index')
+            print(translations.gettext('Hello'))
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import gettext
+import io
+import mmap
+import struct
+import zipfile
+
+from . import locking
+
+BUNDLE_EXT = '.zip'
+
+# fixed timestamp of entries for the same bundle from the same mo files
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# local file header of zip entries
+_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def write_bundle(filename, entries):
+    """
+    Write a bundle file. The file is written to a temporary file and renamed,
+    not to be read while it is written.
+
+    :param unicode filename: path to bundle file
+    :param entries: iterable of (name, data) such as
+                    ('LC_MESSAGES/index.mo', b'...'), in the order to store
+    :return: number of entries
+    :rtype: int
+    """
+    count = 0
+    with locking.replacing(filename) as tmp:
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+            for name, data in entries:
+                info = zipfile.ZipInfo(name, _DATE_TIME)
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+                count += 1
+    return count
+
+
+def entry_name(domain):
+    """:return: entry name of the domain, such as 'LC_MESSAGES/index.mo'"""
+    return 'LC_MESSAGES/{0}.mo'.format(domain)
+
+
+class Bundle(object):
+    """
+    Memory-mapped bundle file. Only the index of entries is read on open, and
+    each mo file is parsed on the first request of the domain.
+
+    :param unicode filename: path to bundle file
+    :raise ValueError: the file is not a bundle of uncompressed entries
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._translations = {}
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index = _read_index(self._map)
+        except (ValueError, zipfile.BadZipFile) as e:
+            self._map.close()
+            raise ValueError('{0}: {1}'.format(filename, e))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def names(self):
+        """:return: sorted names of entries"""
+        return sorted(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def read(self, name):
+        """
+        :param unicode name: entry name such as 'LC_MESSAGES/index.mo'
+        :return: content of the entry
+        :rtype: bytes
+        :raise KeyError: the entry is not found
+        """
+        offset, size = self._index[name]
+        return self._map[offset:offset + size]
+
+    def translation(self, domain, fallback=False):
+        """
+        Translations of the domain, as ``gettext.translation()`` returns for
+        a mo file of the domain.
+
+        :param unicode domain: domain such as 'index' for 'LC_MESSAGES/index.mo'
+        :param bool fallback: return NullTranslations if the domain is not
+                              found, instead of raising an error
+        :rtype: gettext.GNUTranslations
+        :raise FileNotFoundError: the domain is not found
+        """
+        translations = self._translations.get(domain)
+        if translations is not None:
+            return translations
+        name = entry_name(domain)
+        if name not in self._index:
+            if fallback:
+                return gettext.NullTranslations()
+            raise FileNotFoundError('{0} is not found in {1}'.format(name, self.filename))
+        translations = gettext.GNUTranslations(io.BytesIO(self.read(name)))
+        self._translations[domain] = translations
+        return translations
+
+
+def _read_index(data):
+    """
+    :param mmap.mmap data: content of bundle file
+    :return: {name: (offset, size)} of data of entries
+    """
+    index = {}
+    with zipfile.ZipFile(data) as zf:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('{0} is compressed'.format(info.filename))
+            header = _LOCAL_HEADER.unpack_from(data, info.header_offset)
+            if header[0] != _LOCAL_HEADER_SIGNATURE:
+                raise ValueError('bad local header of {0}'.format(info.filename))
+            name_length, extra_length = header[-2:]
+            offset = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+            index[info.filename] = (offset, info.file_size)
+    return index
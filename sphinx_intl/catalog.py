@@ -1,43 +1,149 @@
 # -*- coding: utf-8 -*-
 
+import codecs
+import datetime
+import functools
+import gzip
+import hashlib
 import os
 import io
+import itertools
+import lzma
+import pickle
+import re
+import subprocess
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from shutil import which
 
-from babel.messages import pofile, mofile
+import babel
+from babel.messages import Catalog, Message, pofile, mofile
+
+from . import __version__
+from . import locking
+from . import timing
+
+
+# compressions of po/pot files by the extension
+_COMPRESSORS = {
+    '.gz': gzip,
+    '.xz': lzma,
+}
+
+
+def _compressor(filename):
+    return _COMPRESSORS.get(os.path.splitext(filename)[1])
+
+
+def _open_data(data, compressor):
+    # compressed content is decompressed while it is parsed, not into memory
+    if compressor is not None:
+        return compressor.open(io.BytesIO(data), 'rb')
+    return io.BytesIO(data)
+
+
+def _compress(compressor, data):
+    if compressor is gzip:
+        # mtime=0 for the same output from the same content
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as f:
+            f.write(data)
+        return buf.getvalue()
+    return compressor.compress(data)
 
 
 def load_po(filename):
     """read po/pot file and return catalog object
 
+    If the parsed catalog cache is enabled by ``enable_cache``, the catalog is
+    loaded from the cache when the file content is not changed. If parsing
+    in chunks is enabled by ``enable_split_parse``, large files are parsed on
+    multiple processes. ``.po.gz``/``.pot.gz`` and ``.po.xz``/``.pot.xz``
+    files are decompressed while they are parsed. Only a compressed file
+    to be parsed in chunks is decompressed into memory.
+
     :param unicode filename: path to po/pot file
     :return: catalog object
     """
-    # pre-read to get charset
-    with io.open(filename, 'rb') as f:
-        cat = pofile.read_po(f)
-    charset = cat.charset or 'utf-8'
+    with timing.phase('parse', filename):
+        with io.open(filename, 'rb') as f:
+            data = f.read()
+        return _parse_po(data, filename)
+
+
+def parse_po(data, filename):
+    """parse content of po/pot file and return catalog object, as load_po
+
+    :param bytes data: content of po/pot file, such as a file of a git revision
+    :param unicode filename: path to po/pot file, the content is decompressed
+                             by the extension
+    :return: catalog object
+    """
+    with timing.phase('parse', filename):
+        return _parse_po(data, filename)
+
+
+def _parse_po(data, filename):
+    key = None
+    if _cache is not None:
+        key = _cache_key(data)
+        cat = _cache_load(key)
+        if cat is not None:
+            return cat
+
+    compressor = _compressor(filename)
+    cat = None
+    if _split_parse is not None and len(data) >= _split_parse[0]:
+        if compressor is not None:
+            # chunks are sent to processes, so they need the whole content.
+            # A compressed file smaller than min_size is parsed in this process.
+            data = compressor.decompress(data)
+            compressor = None
+        cat = _parse_in_chunks(data, _split_parse[1])
+
+    if cat is None:
+        # pre-read to get charset
+        with _open_data(data, compressor) as f:
+            cat = pofile.read_po(f)
+        charset = cat.charset or 'utf-8'
+
+        # To decode lines by babel, read po file as binary mode and specify charset for
+        # read_po function.
+        # FIXME: encoding VS charset
+        with _open_data(data, compressor) as f:
+            cat = pofile.read_po(f, charset=charset)
 
-    # To decode lines by babel, read po file as binary mode and specify charset for
-    # read_po function.
-    with io.open(filename, 'rb') as f:  # FIXME: encoding VS charset
-        return pofile.read_po(f, charset=charset)
+    if key is not None:
+        _cache_store(key, cat)
+    return cat
 
 
 def dump_po(filename, catalog, line_width=76):
     """write po/pot file from catalog object
 
+    The file is compressed if the filename ends with ``.gz`` or ``.xz``.
+
     :param unicode filename: path to po file
     :param catalog: catalog object
     :param line_width: maximum line wdith of po files
     :return: None
     """
-    dirname = os.path.dirname(filename)
-    if not os.path.exists(dirname):
-        os.makedirs(dirname)
-
     # Because babel automatically encode strings, file should be open as binary mode.
-    with io.open(filename, 'wb') as f:
-        pofile.write_po(f, catalog, line_width)
+    with timing.phase('serialize', filename):
+        buf = io.BytesIO()
+        write_po(buf, catalog, line_width)
+        data = buf.getvalue()
+    _write_po_data(filename, data)
+
+
+def _write_po_data(filename, data):
+    compressor = _compressor(filename)
+    if compressor is not None:
+        with timing.phase('compress', filename):
+            data = _compress(compressor, data)
+    with timing.phase('write', filename):
+        _replace_file(filename, data)
 
 
 def write_mo(filename, catalog):
@@ -47,11 +153,781 @@ def write_mo(filename, catalog):
     :param catalog: catalog object
     :return: None
     """
-    dirname = os.path.dirname(filename)
-    if not os.path.exists(dirname):
-        os.makedirs(dirname)
-    with io.open(filename, 'wb') as f:
-        mofile.write_mo(f, catalog)
+    with timing.phase('compile', filename):
+        data = compile_mo(catalog)
+    with timing.phase('write', filename):
+        _replace_file(filename, data)
+
+
+def compile_mo(catalog):
+    """compile catalog object into content of mo file
+
+    :param catalog: catalog object
+    :return: content of mo file
+    :rtype: bytes
+    """
+    buf = io.BytesIO()
+    mofile.write_mo(buf, catalog)
+    return buf.getvalue()
+
+
+def _replace_file(filename, data):
+    """write the file then rename it, readers see the old or the new content."""
+    with locking.replacing(filename) as tmp:
+        with io.open(tmp, 'wb') as f:
+            f.write(data)
+
+
+# ==================================
+# parsed catalog cache
+
+# (directory, max_size) of the parsed catalog cache, None while disabled.
+_cache = None
+
+# cached catalogs are invalidated when any of them is changed.
+_CACHE_SALT = 'sphinx-intl {0}, babel {1}, python {2}.{3}, format 1'.format(
+    __version__, babel.__version__, *sys.version_info[:2]).encode('ascii')
+
+
+def enable_cache(directory, max_size=256 * 2 ** 20):
+    """enable the on-disk cache of parsed catalogs for load_po.
+
+    Catalogs are stored as compressed pickles keyed by the hash of the file
+    content and versions of sphinx-intl, babel and python. The directory
+    must not be writable by untrusted users.
+
+    :param unicode directory: path to cache directory
+    :param int max_size: size limit of the cache in bytes for evict_cache
+    :return: None
+    """
+    global _cache
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    _cache = (directory, max_size)
+
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """:return: (directory, max_size) or None"""
+    return _cache
+
+
+def evict_cache():
+    """remove least recently used catalogs until the cache fits in max_size.
+
+    :return: number of removed entries
+    """
+    if _cache is None:
+        return 0
+    directory, max_size = _cache
+    entries = []
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def _cache_key(data):
+    h = hashlib.blake2b(data, digest_size=20)
+    h.update(_CACHE_SALT)
+    return h.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(_cache[0], key[:2], key)
+
+
+def _cache_load(key):
+    path = _cache_path(key)
+    try:
+        with io.open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        cat = pickle.loads(zlib.decompress(data))
+    except Exception:
+        # broken entry, parse the file again and overwrite it.
+        return None
+    try:
+        os.utime(path)  # mark as recently used
+    except OSError:
+        pass
+    return cat
+
+
+def _cache_store(key, catalog):
+    path = _cache_path(key)
+    data = zlib.compress(pickle.dumps(catalog, pickle.HIGHEST_PROTOCOL), 1)
+    try:
+        # other processes may store the same entry.
+        _replace_file(path, data)
+    except OSError:
+        pass
+
+
+# ==================================
+# parallel parsing of large files
+
+# (min_size, jobs) of parsing in chunks, None while disabled.
+_split_parse = None
+
+
+def enable_split_parse(min_size=16 * 2 ** 20, jobs=0):
+    """enable parsing of large po/pot files in chunks on processes for load_po.
+
+    A file is split at entry boundaries, and chunks are parsed by worker
+    processes and merged into the same catalog as a serial parse.
+
+    :param int min_size: size in bytes of the smallest file to split
+    :param int jobs: number of processes and chunks, 0 for number of CPUs
+    :return: None
+    """
+    global _split_parse
+    _split_parse = (min_size, jobs)
+
+
+def disable_split_parse():
+    global _split_parse
+    _split_parse = None
+
+
+def get_split_parse():
+    """:return: (min_size, jobs) or None"""
+    return _split_parse
+
+
+def _is_entry_end(data, pos):
+    # whether the line ending at pos is in msgstr of an entry, scanning back
+    # over continuation lines to the keyword line.
+    while pos > 0:
+        start = data.rfind(b'\n', 0, pos) + 1
+        line = data[start:pos]
+        if line.startswith((b'msgstr', b'#~ msgstr')):
+            return True
+        if not line.startswith((b'"', b'#~ "')):
+            return False
+        pos = start - 1
+    return False
+
+
+def _find_boundary(data, pos):
+    """find an offset after pos where babel's parser starts a new entry with
+    an empty state, that is a blank line after msgstr and before a comment,
+    msgctxt or msgid"""
+    while True:
+        pos = data.find(b'\n\n', pos)
+        if pos < 0:
+            return None
+        start = pos + 2
+        while data.startswith(b'\n', start):
+            start += 1
+        if (data.startswith((b'msgid ', b'msgctxt ', b'#~ msgid ', b'#~ msgctxt '), start) or
+                (data.startswith(b'#', start) and not data.startswith(b'#~', start))):
+            if _is_entry_end(data, pos):
+                return start
+        pos = start
+
+
+def _split_entries(data, start, count):
+    """split data after start into about count chunks at entry boundaries.
+
+    :return: [(offset, end offset), ...] of chunks after start
+    """
+    size = (len(data) - start) // count
+    offsets = [start]
+    for i in range(1, count):
+        pos = _find_boundary(data, max(offsets[-1], start + size * i))
+        if pos is None:
+            break
+        offsets.append(pos)
+    return list(zip(offsets, offsets[1:] + [len(data)]))
+
+
+def _parse_in_chunks(data, jobs):
+    """parse po file content in chunks on processes.
+
+    :return: catalog, or None if the content can not be split
+    """
+    m = _HEADER_RE.match(data)
+    if m is None:
+        return None
+    # the state of the parser after the header, to parse each chunk with
+    header = pofile.read_po(io.BytesIO(m.group(1)))
+    header = pofile.read_po(io.BytesIO(m.group(1)), charset=header.charset or 'utf-8')
+    if codecs.lookup(header.charset).name.startswith(('utf-16', 'utf-32')):
+        return None
+
+    jobs = jobs if jobs and jobs > 0 else os.cpu_count() or 1
+    chunks = _split_entries(data, m.end(), jobs)
+    if len(chunks) < 2:
+        return None
+    # the first chunk includes the header
+    chunks[0] = (0, chunks[0][1])
+    items = [(header, data[start:end], data.count(b'\n', 0, start))
+             for start, end in chunks]
+    with ProcessPoolExecutor(len(items)) as executor:
+        results = list(executor.map(_parse_chunk, items))
+
+    header_state = _header_state(header)
+    if any(_header_state(cat) != header_state for cat in results):
+        return None  # another header entry in the middle of the file
+    cat = results[0]
+    for chunk in results[1:]:
+        for message in chunk:
+            if message.id:
+                cat[message.id] = message
+        cat.obsolete.update(chunk.obsolete)
+    return cat
+
+
+def _header_state(catalog):
+    return catalog.mime_headers, catalog.header_comment, catalog.fuzzy
+
+
+def _parse_chunk(item):
+    header, data, lineno = item
+    if lineno:
+        cat = copy_catalog(header)
+        pofile.PoFileParser(cat).parse(io.BytesIO(data))
+    else:
+        cat = pofile.read_po(io.BytesIO(data), charset=header.charset)
+    # line numbers in the file
+    for message in itertools.chain(cat, cat.obsolete.values()):
+        if message.lineno is not None:
+            message.lineno += lineno
+    return cat
+
+
+# ==================================
+# po serializer
+
+# characters that str.splitlines() treats as line boundaries
+_LINE_BREAK_RE = re.compile('[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+# whitespaces that babel's TextWrapper replaces or expands before wrapping
+_WRAP_WHITESPACE_RE = re.compile('[\t\n\x0b\x0c\r]')
+# WORD_SEP of babel without the alternatives for hyphens
+_WHITESPACE_SEP_RE = re.compile(r'(\s+)')
+# characters that have to be escaped in po strings
+_ESCAPE_RE = re.compile('[\\\\\t\r\n"]')
+
+
+def _escape(string):
+    return '"%s"' % string.replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\r', '\\r').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _split_hyphens(chunks):
+    # The hyphen alternatives of babel's WORD_SEP can neither contain nor look
+    # around whitespaces, so splitting words separately equals splitting the
+    # whole line, without scanning every position of the line.
+    result = []
+    for i, chunk in enumerate(chunks):
+        if i % 2 == 0 and '-' in chunk:
+            result.extend(pofile.WORD_SEP.split(chunk))
+        else:
+            result.append(chunk)
+    return result
+
+
+def _normalize(string, prefix, width):
+    # Same result as ``babel.messages.pofile.normalize``. Most strings are a
+    # single line that fits in ``width`` and are returned right away, and the
+    # wrapping loop measures each chunk once instead of escaping it twice.
+    if not _LINE_BREAK_RE.search(string):
+        escaped = _escape(string)
+        if not width or width <= 0 or len(escaped) + len(prefix) <= width:
+            return escaped
+
+    if width and width > 0:
+        prefixlen = len(prefix)
+        lines = []
+        for line in string.splitlines(True):
+            if len(_escape(line)) + prefixlen <= width:
+                lines.append(line)
+                continue
+            chunks = _WHITESPACE_SEP_RE.split(line)
+            if '-' in line:
+                chunks = _split_hyphens(chunks)
+            if _ESCAPE_RE.search(line):
+                lengths = [len(_escape(chunk)) - 2 + prefixlen for chunk in chunks]
+            else:
+                lengths = [len(chunk) + prefixlen for chunk in chunks]
+            i = 0
+            count = len(chunks)
+            while i < count:
+                buf = []
+                size = 2
+                while i < count:
+                    length = lengths[i]
+                    if size + length < width:
+                        buf.append(chunks[i])
+                        size += length
+                        i += 1
+                    else:
+                        if not buf:
+                            # handle long chunks by putting them on a separate line
+                            buf.append(chunks[i])
+                            i += 1
+                        break
+                lines.append(''.join(buf))
+    else:
+        lines = string.splitlines(True)
+
+    if len(lines) <= 1:
+        return _escape(string)
+
+    # Remove empty trailing line
+    if lines and not lines[-1]:
+        del lines[-1]
+        lines[-1] += '\n'
+    return '""\n' + '\n'.join([prefix + _escape(line) for line in lines])
+
+
+def write_po(fileobj, catalog, line_width=76):
+    """write catalog object into file object as a po file.
+
+    The output is byte-identical to ``babel.messages.pofile.write_po`` with
+    the same ``line_width``, but short messages skip babel's per-line
+    wrapping and encoding overhead.
+
+    :param fileobj: binary file object to write
+    :param catalog: catalog object
+    :param line_width: maximum line wdith of po files
+    :return: None
+    """
+    if not hasattr(pofile, 'generate_po'):
+        # older babel has different formatting rules, keep using it as is.
+        pofile.write_po(fileobj, catalog, line_width)
+        return
+
+    width = line_width
+    comment_width = width if width and width > 0 else 76
+    comment_wrapper = pofile.TextWrapper(width=comment_width, break_long_words=False)
+    num_plurals = catalog.num_plurals
+    lines = []
+    append = lines.append
+
+    def _write_comment(comment, prefix=''):
+        if (len(comment) <= comment_width and
+                not _WRAP_WHITESPACE_RE.search(comment)):
+            comment = comment.strip()
+            if comment:
+                append('#%s %s\n' % (prefix, comment))
+            return
+        for line in comment_wrapper.wrap(comment):
+            append('#%s %s\n' % (prefix, line.strip()))
+
+    def _write_message(message, prefix=''):
+        if message.context:
+            append('%smsgctxt %s\n' % (
+                prefix, _normalize(message.context, prefix, width)))
+        if isinstance(message.id, (list, tuple)):
+            append('%smsgid %s\n' % (
+                prefix, _normalize(message.id[0], prefix, width)))
+            append('%smsgid_plural %s\n' % (
+                prefix, _normalize(message.id[1], prefix, width)))
+            for idx in range(num_plurals):
+                try:
+                    string = message.string[idx]
+                except IndexError:
+                    string = ''
+                append('%smsgstr[%d] %s\n' % (
+                    prefix, idx, _normalize(string, prefix, width)))
+        else:
+            append('%smsgid %s\n' % (
+                prefix, _normalize(message.id, prefix, width)))
+            append('%smsgstr %s\n' % (
+                prefix, _normalize(message.string or '', prefix, width)))
+
+    for message in catalog:
+        if not message.id:  # This is the header "message"
+            comment_header = catalog.header_comment
+            if width and width > 0:
+                header_wrapper = pofile.TextWrapper(
+                    width=width, subsequent_indent='# ', break_long_words=False)
+                wrapped = []
+                for line in comment_header.splitlines():
+                    wrapped += header_wrapper.wrap(line)
+                comment_header = '\n'.join(wrapped)
+            append(comment_header + '\n')
+
+        for comment in message.user_comments:
+            _write_comment(comment)
+        for comment in message.auto_comments:
+            _write_comment(comment, prefix='.')
+
+        locations = message.locations
+        try:
+            locations = sorted(
+                locations,
+                key=lambda x: (x[0], isinstance(x[1], int) and x[1] or -1))
+        except TypeError:
+            pass
+        locs = []
+        for filename, lineno in locations:
+            location = filename.replace(os.sep, '/')
+            if ' ' in location or '\t' in location:
+                location = pofile._enclose_filename_if_necessary(location)
+            if lineno:
+                location = '%s:%d' % (location, lineno)
+            if location not in locs:
+                locs.append(location)
+        _write_comment(' '.join(locs), prefix=':')
+
+        if message.flags:
+            append('#%s\n' % ', '.join([''] + sorted(message.flags)))
+
+        _write_message(message)
+        append('\n')
+
+    for message in catalog.obsolete.values():
+        for comment in message.user_comments:
+            _write_comment(comment)
+        _write_message(message, prefix='#~ ')
+        append('\n')
+
+    if not lines:
+        return
+    charset = catalog.charset
+    if codecs.lookup(charset).name.startswith(('utf-16', 'utf-32')):
+        # these codecs emit a BOM per encode call as babel does per line.
+        for line in lines:
+            fileobj.write(line.encode(charset, 'backslashreplace'))
+    else:
+        fileobj.write(''.join(lines).encode(charset, 'backslashreplace'))
+
+
+# ==================================
+# po creation by header rewriting
+
+# header entry at the beginning of a pot file, and the rest of the file
+_HEADER_RE = re.compile(br'\A((?:#(?!~).*\n|\n)*msgid ""\nmsgstr ""\n(?:".*\n)*)(?:\n|\Z)')
+# single line string with the escapes that _escape() writes except newlines
+_SIMPLE_STRING_RE = re.compile(r'"((?:[^"\\\t]|\\[\\"t])*)"\Z')
+_UNESCAPE_RE = re.compile(r'\\(.)')
+_UNESCAPES = {'\\': '\\', '"': '"', 't': '\t'}
+# characters that babel's _extract_locations treats as filename enclosures
+_ENCLOSURE_RE = re.compile('[\u2068\u2069]')
+_LINENO_RE = re.compile(r'[1-9][0-9]*\Z')
+
+
+def init_po(pot_file, po_file, locale, line_width=76):
+    """create a po file of the locale from a pot file, by rewriting the header.
+
+    The output is byte-identical to ``dump_po`` of the pot catalog with the
+    ``locale``. Only the header entry is parsed and written again, and the
+    rest of the pot file is copied as is if it is formatted exactly as
+    ``write_po`` writes it. Otherwise nothing is written, and the caller
+    has to parse the whole pot file.
+
+    :param unicode pot_file: path to pot file
+    :param unicode po_file: path to po file to create
+    :param locale: locale of the po file
+    :param line_width: maximum line wdith of po files
+    :return: True if the po file is created
+    :rtype: bool
+    """
+    with io.open(pot_file, 'rb') as f:
+        data = f.read()
+    compressor = _compressor(pot_file)
+    if compressor is not None:
+        data = compressor.decompress(data)
+    with timing.phase('rewrite', po_file):
+        data = rewrite_header(data, locale, line_width)
+    if data is None:
+        return False
+    _write_po_data(po_file, data)
+    return True
+
+
+def rewrite_header(data, locale, line_width=76):
+    """rewrite the header entry of pot file content for the locale.
+
+    :param bytes data: content of pot file
+    :param locale: locale of the po file
+    :param line_width: maximum line wdith of po files
+    :return: content of po file, or None if the entries are not formatted
+             as ``write_po`` writes them
+    :rtype: bytes
+    """
+    if not line_width or line_width <= 0:
+        return None
+    m = _HEADER_RE.match(data)
+    if m is None:
+        return None
+
+    # parse only the header entry, in the same way as load_po
+    cat = pofile.read_po(io.BytesIO(m.group(1)))
+    cat = pofile.read_po(io.BytesIO(m.group(1)), charset=cat.charset or 'utf-8')
+    if codecs.lookup(cat.charset).name.startswith(('utf-16', 'utf-32')):
+        return None
+    body = data[m.end():]
+    try:
+        text = body.decode(cat.charset)
+    except UnicodeDecodeError:
+        return None
+    if not _is_written_by_write_po(text, line_width):
+        return None
+    if not text.endswith('\n\n'):
+        body += b'\n'  # sphinx doesn't write the last blank line
+
+    cat.locale = locale
+    buf = io.BytesIO()
+    write_po(buf, cat, line_width)
+    return buf.getvalue() + body
+
+
+def _unescape(string):
+    m = _SIMPLE_STRING_RE.match(string)
+    if m is None:
+        return None
+    return _UNESCAPE_RE.sub(lambda m: _UNESCAPES[m.group(1)], m.group(1))
+
+
+def _is_plain_comment(comment, width):
+    # a comment that write_po writes as is, without wrapping
+    return (comment and comment == comment.strip() and len(comment) <= width and
+            not _WRAP_WHITESPACE_RE.search(comment))
+
+
+def _parse_locations(comment):
+    locations = []
+    for location in comment.split(' '):
+        if not location or _ENCLOSURE_RE.search(location):
+            return None
+        filename, colon, lineno = location.rpartition(':')
+        if not colon:
+            filename, lineno = location, None
+        elif not _LINENO_RE.match(lineno):
+            return None
+        else:
+            lineno = int(lineno)
+        if os.sep != '/' and os.sep in filename:
+            return None
+        locations.append((filename, lineno))
+    if sorted(set(locations), key=_location_key) != locations:
+        return None
+    return locations
+
+
+def _is_written_by_write_po(text, width):
+    """whether po entries without the header are formatted as write_po writes
+    them, conservatively for messages without plural forms, multi-line
+    strings and obsolete entries. The last blank line may be missing."""
+    if not text:
+        return True
+    if not text.endswith('\n') or '\r' in text:
+        return False
+
+    keys = set()
+    entries = text[:-2] if text.endswith('\n\n') else text[:-1]
+    for entry in entries.split('\n\n'):
+        # order of lines in write_po output
+        step = 0
+        flags = []
+        strings = {}
+        comments = set()
+        for line in entry.split('\n'):
+            if line != line.strip():
+                return False
+            prefix = line[:3]
+            if prefix[:2] == '# ' and step <= 0:
+                comment = line[2:]
+            elif prefix == '#. ' and step <= 1:
+                step = 1
+                comment = line[3:]
+            elif prefix == '#: ' and step < 2:
+                step = 2
+                comment = line[3:]
+                if _parse_locations(comment) is None:
+                    return False
+            elif prefix == '#, ' and step < 3:
+                step = 3
+                flags = line[3:].split(', ')
+                if line != '#' + ', '.join([''] + sorted(set(flags))) or not all(flags):
+                    return False
+                continue
+            elif prefix == 'msg':
+                keyword, _, string = line.partition(' ')
+                order = {'msgctxt': 4, 'msgid': 5, 'msgstr': 6}.get(keyword)
+                if order is None or order <= step:
+                    return False
+                step = order
+                string = _unescape(string)
+                if (string is None or len(line) - len(keyword) - 1 > width or
+                        _LINE_BREAK_RE.search(string)):
+                    return False
+                strings[keyword] = string
+                continue
+            else:
+                return False
+            # babel removes duplicated comments
+            if not _is_plain_comment(comment, width) or (step, comment) in comments:
+                return False
+            comments.add((step, comment))
+        if step != 6 or not strings.get('msgid') or strings.get('msgctxt') == '':
+            return False
+
+        key = (strings['msgid'], strings.get('msgctxt'))
+        if key in keys:
+            return False
+        keys.add(key)
+        # babel adds or removes format flags by the msgid
+        if Message(strings['msgid'], flags=flags).flags != set(flags):
+            return False
+    return True
+
+
+# ==================================
+# GNU gettext backend
+
+# charset of the Content-Type header
+_CHARSET_RE = re.compile(br'^"Content-Type:.*charset=([-\w.:]+)', re.M)
+
+
+@functools.lru_cache()
+def has_gettext():
+    """whether msgmerge and msgfmt of GNU gettext are installed"""
+    return bool(which('msgmerge') and which('msgfmt'))
+
+
+def can_use_gettext(*filenames):
+    """whether GNU gettext is installed and can read the files, that are not
+    compressed"""
+    return has_gettext() and not any(_compressor(f) for f in filenames)
+
+
+def _run_gettext(args):
+    try:
+        return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise ValueError('{0} failed: {1}'.format(
+            args[0], e.stderr.decode('utf-8', 'replace').strip()))
+
+
+def msgmerge(po_file, pot_file, line_width=76):
+    """update po file from pot file with GNU msgmerge.
+
+    The po file is written only if msgids are changed, as update_po() does
+    with babel.
+
+    :param unicode po_file: path to po file
+    :param unicode pot_file: path to pot file
+    :param line_width: maximum line wdith of po files
+    :return: (number of added msgids, number of deleted msgids)
+    :rtype: tuple
+    :raise ValueError: msgmerge failed
+    """
+    if line_width and line_width > 0:
+        width = '--width={0}'.format(line_width)
+    else:
+        width = '--no-wrap'
+    with timing.phase('msgmerge', po_file):
+        data = _run_gettext(['msgmerge', '--quiet', width, '--output-file=-',
+                             po_file, pot_file])
+    with io.open(po_file, 'rb') as f:
+        old = f.read()
+    with timing.phase('merge', po_file):
+        msgids = scan_msgids(old)
+        new_msgids = scan_msgids(data)
+    added = len(new_msgids - msgids)
+    deleted = len(msgids - new_msgids)
+    if added or deleted:
+        _write_po_data(po_file, data)
+    return added, deleted
+
+
+def msgfmt(po_file, mo_file):
+    """compile po file into mo file with GNU msgfmt, without the hash table
+    as write_mo writes it.
+
+    :param unicode po_file: path to po file
+    :param unicode mo_file: path to mo file
+    :return: None
+    :raise ValueError: msgfmt failed
+    """
+    with timing.phase('msgfmt', mo_file):
+        with locking.replacing(mo_file) as tmp:
+            _run_gettext(['msgfmt', '--no-hash', '--output-file=' + tmp, po_file])
+
+
+def scan_msgids(data):
+    """collect msgids of active entries from po file content, without parsing
+    the whole entries.
+
+    :param bytes data: content of po file
+    :return: set of msgids, and (msgid, msgid_plural) for plural messages, as
+             ``Message.id`` of babel
+    :rtype: set
+    """
+    msgids = set()
+    parts = None
+    current = None
+
+    def add():
+        ids = tuple(pofile.unescape('"%s"' % ''.join(p)) for p in parts)
+        if ids[0]:
+            msgids.add(ids if len(ids) > 1 else ids[0])
+
+    m = _CHARSET_RE.search(data)
+    charset = m.group(1).decode('ascii') if m else 'utf-8'
+    try:
+        text = data.decode(charset, 'surrogateescape')
+    except LookupError:
+        text = data.decode('utf-8', 'surrogateescape')
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('"'):
+            if current is not None:
+                current.append(line[1:-1])
+            continue
+        current = None
+        keyword, _, arg = line.partition(' ')
+        if keyword == 'msgid':
+            if parts is not None:
+                add()
+            current = [arg[1:-1]]
+            parts = [current]
+        elif keyword == 'msgid_plural' and parts is not None:
+            current = [arg[1:-1]]
+            parts.append(current)
+    if parts is not None:
+        add()
+    return msgids
+
+
+# ==================================
+# catalog utilities
+
+# translator comment to record the date when an entry became obsolete
+OBSOLETE_SINCE = 'sphinx-intl: obsolete since '
+
+# sphinx writes uuids of gettext_uuid as location comments
+_UUID_RE = re.compile(r'^[0-9a-f]{32}$')
 
 
 def translated_entries(catalog):
@@ -66,6 +942,18 @@ def untranslated_entries(catalog):
     return [m for m in catalog if m.id and not m.string]
 
 
+def copy_catalog(catalog):
+    """
+    Copy a catalog through pickle, that is faster than parsing it again and
+    than ``copy.deepcopy``.
+
+    :param babel.messages.Catalog catalog: catalog to copy
+    :return: independent copy of the catalog
+    :rtype: babel.messages.Catalog
+    """
+    return pickle.loads(pickle.dumps(catalog, pickle.HIGHEST_PROTOCOL))
+
+
 def update_with_fuzzy(catalog, catalog_source):
     """update catalog by template catalog with fuzzy flag.
 
@@ -74,3 +962,151 @@ def update_with_fuzzy(catalog, catalog_source):
     :return: None
     """
     catalog.update(catalog_source)
+
+
+# kinds of changed messages of diff_catalogs()
+DIFF_KINDS = ('added', 'removed', 'retranslated', 'fuzzied', 'unfuzzied')
+
+
+def diff_catalogs(old, new):
+    """compare active messages of two versions of a catalog.
+
+    A message is 'fuzzied' if it became fuzzy, 'retranslated' if its string
+    is changed otherwise, and 'unfuzzied' if it is no longer fuzzy with the
+    same string. Obsolete messages and the header are not compared.
+
+    :param old: catalog object of the old version, or None for no messages
+    :param new: catalog object of the new version, or None for no messages
+    :return: {'added': [(None, new_message), ...],
+             'removed': [(old_message, None), ...],
+             'retranslated': [(old_message, new_message), ...], ...} of
+             DIFF_KINDS in the order of messages
+    :rtype: dict
+    """
+    olds = dict(((m.id, m.context), m) for m in (old or ()) if m.id)
+    news = dict(((m.id, m.context), m) for m in (new or ()) if m.id)
+    result = {kind: [] for kind in DIFF_KINDS}
+    for key, message in olds.items():
+        if key not in news:
+            result['removed'].append((message, None))
+    for key, message in news.items():
+        before = olds.get(key)
+        if before is None:
+            kind = 'added'
+        elif message.fuzzy and not before.fuzzy:
+            kind = 'fuzzied'
+        elif message.string != before.string:
+            kind = 'retranslated'
+        elif before.fuzzy and not message.fuzzy:
+            kind = 'unfuzzied'
+        else:
+            continue
+        result[kind].append((before, message))
+    return result
+
+
+def _obsolete_since(message):
+    for comment in message.user_comments:
+        if comment.startswith(OBSOLETE_SINCE):
+            try:
+                return datetime.datetime.strptime(
+                    comment[len(OBSOLETE_SINCE):].strip(), '%Y-%m-%d').date()
+            except ValueError:
+                pass
+    return None
+
+
+def prune_obsolete(catalog, max_age=None, today=None):
+    """remove obsolete entries from catalog.
+
+    Without ``max_age`` all obsolete entries are removed. With ``max_age``,
+    entries are stamped with the date they are first seen as obsolete by a
+    translator comment, and removed ``max_age`` days after that date.
+    Obsolete entries that are active again in the catalog are always removed.
+
+    :param catalog: catalog object to be pruned
+    :param max_age: number of days to keep obsolete entries, or None
+    :param today: date to stamp and compare, default is today
+    :return: (removed messages, number of stamped messages)
+    """
+    today = today or datetime.date.today()
+    removed = []
+    stamped = 0
+    for key, message in list(catalog.obsolete.items()):
+        if max_age is not None and catalog.get(message.id, message.context) is None:
+            since = _obsolete_since(message)
+            if since is None:
+                message.user_comments.append(OBSOLETE_SINCE + today.isoformat())
+                stamped += 1
+                continue
+            if (today - since).days <= max_age:
+                continue
+        del catalog.obsolete[key]
+        message.user_comments = [
+            comment for comment in message.user_comments
+            if not comment.startswith(OBSOLETE_SINCE)]
+        removed.append(message)
+    return removed, stamped
+
+
+def _location_key(location):
+    return location[0], isinstance(location[1], int) and location[1] or -1
+
+
+def compact_locations(catalog, add_location='full', max_locations=None, uuid=True):
+    """drop, deduplicate or cap location comments of catalog entries.
+
+    :param catalog: catalog object to be compacted
+    :param add_location: 'full' to keep locations, 'file' to keep only one
+                         location of each file without line numbers, or
+                         'never' to drop locations
+    :param max_locations: maximum number of locations of each entry, or None
+    :param uuid: keep uuid comments that sphinx writes for ``gettext_uuid``
+    :return: number of entries whose locations are changed
+    """
+    changed = 0
+    for message in itertools.chain(catalog, catalog.obsolete.values()):
+        if not message.locations:
+            continue
+        uuids = []
+        locations = []
+        for location in message.locations:
+            if location[1] is None and _UUID_RE.match(location[0]):
+                uuids.append(location)
+            else:
+                locations.append(location)
+
+        if add_location == 'never':
+            locations = []
+        elif add_location == 'file':
+            locations = [(filename, None) for filename, lineno in locations]
+        # sorted and unique as write_po() writes them
+        locations = sorted(set(locations), key=_location_key)
+        if max_locations is not None:
+            locations = locations[:max_locations]
+        if uuid:
+            locations = sorted(set(locations + uuids), key=_location_key)
+
+        if locations != message.locations:
+            message.locations = locations
+            changed += 1
+    return changed
+
+
+def archive_messages(filename, messages, locale=None, line_width=76):
+    """add messages into an archive po file, the file is created if missing.
+
+    :param unicode filename: path to archive po file
+    :param messages: message objects to add, same ids are overwritten
+    :param locale: locale of the archive catalog
+    :param line_width: maximum line wdith of po files
+    :return: None
+    """
+    if os.path.exists(filename):
+        archive = load_po(filename)
+    else:
+        archive = Catalog(locale=locale)
+    for message in messages:
+        archive.delete(message.id, message.context)
+        archive[message.id] = message
+    dump_po(filename, archive, line_width)
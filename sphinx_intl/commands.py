@@ -7,16 +7,23 @@
     :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
     :license: BSD, see LICENSE for details.
 """
+import json
 import re
 import os
-from glob import glob
 
 import click
 from sphinx.util.tags import Tags
 
 from . import basic
+from . import catalog
+from . import locking
+from . import records
+from . import report
+from . import timing
 from . import transifex
-from .pycompat import execfile_, relpath
+from . import vcs
+from . import watch as watch_
+from .pycompat import execfile_
 
 ENVVAR_PREFIX = 'SPHINXINTL'
 
@@ -49,11 +56,112 @@ def read_config(path, passed_tags):
     return namespace
 
 
-def get_lang_dirs(path):
-    dirs = [relpath(d, path)
-            for d in glob(path+'/[a-z]*')
-            if os.path.isdir(d) and not d.endswith('pot')]
-    return (tuple(dirs),)
+def setup_instrumentation(ctx, timings, timings_json, profile):
+    """start timings and profiler, and report them when the command is closed"""
+    if timings or timings_json:
+        timing.enable()
+
+        def report_timings():
+            recorder = timing.disable()
+            if timings:
+                for line in timing.format_summary(recorder):
+                    click.echo(line, err=True)
+            if timings_json:
+                timing.dump_json(recorder, timings_json)
+                click.echo('Timings are written to {0}'.format(timings_json), err=True)
+
+        ctx.call_on_close(report_timings)
+
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def report_profile():
+            profiler.disable()
+            profiler.dump_stats(profile)
+            click.echo('Profile is written to {0}'.format(profile), err=True)
+
+        ctx.call_on_close(report_profile)
+
+
+def get_pot_dir(locale_dir, pot_dir):
+    """pot directory of the locale directory, that must exist"""
+    pot_dir = pot_dir or os.path.join(locale_dir, 'pot')
+    if not os.path.exists(pot_dir):
+        msg = ("%(pot_dir)r does not exist. Please specify pot directory with "
+               "-p option, or preparing your pot files in %(pot_dir)r."
+               % locals())
+        raise click.BadParameter(msg, param_hint='pot_dir')
+    return pot_dir
+
+
+def get_languages(locale_dir, language):
+    """flatten --language option, or find language directories if not passed"""
+    if not language:
+        language = basic.get_lang_dirs(locale_dir)
+    return sum(language, ())  # flatten
+
+
+def get_changes(changed_since):
+    """files changed since the git revision, or None to process all files"""
+    if not changed_since:
+        return None
+    try:
+        changes = vcs.changed_since(changed_since)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='changed_since')
+    if changes is None:
+        click.echo('Not in a git work tree, --changed-since is ignored.', err=True)
+    return changes
+
+
+def get_memory_budget(memory_budget):
+    """--memory-budget option in bytes"""
+    return memory_budget and memory_budget * 2 ** 20
+
+
+def get_records_format(fmt, filename):
+    """--format option, or the format of the file extension"""
+    if fmt:
+        return fmt
+    return 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+
+
+def get_backend(backend):
+    """--backend option, or 'babel' if GNU gettext is not installed"""
+    if backend == 'gettext' and not catalog.has_gettext():
+        click.echo('msgmerge and msgfmt are not found, babel is used.', err=True)
+        return 'babel'
+    return backend
+
+
+def get_reporter(quiet, verbose):
+    """reporter of the verbosity from counts of -q and -v options"""
+    return report.Reporter(report.get_verbosity(quiet, verbose))
+
+
+def check_output_dir(output_dir, targets, bundle=False):
+    """reject --output-dir shared by locale directories that build the same file"""
+    if not output_dir or len(targets) < 2:
+        return
+    conflicts = basic.find_output_conflicts(targets, bundle)
+    if conflicts:
+        name, first, second = conflicts[0]
+        msg = ("{0} of {1!r} and {2!r} would be written to the same file in "
+               "{3!r}. Please use --output-dir with one locale directory."
+               .format(name, first, second, output_dir))
+        raise click.BadParameter(msg, param_hint='output_dir')
+
+
+def write_report(filename, command, shard, result):
+    """write the result of a command as a json report that merge-reports reads"""
+    if not filename:
+        return
+    with open(filename, 'w') as f:
+        json.dump({'command': command, 'shard': shard, 'result': result},
+                  f, indent=2, sort_keys=True)
+    click.echo('Report is written to {0}'.format(filename), err=True)
 
 
 # ==================================
@@ -83,14 +191,138 @@ class TagsType(click.ParamType):
 TAGS = TagsType()
 
 
+class LocaleDirsType(click.ParamType):
+    name = 'locale_dirs'
+    envvar_list_splitter = ','
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (list, tuple)):
+            return tuple(value)
+        dirs = [d for d in value.split(',') if d]
+        return tuple(dirs)
+
+
+LOCALE_DIRS = LocaleDirsType()
+
+
+class ShardType(click.ParamType):
+    name = 'shard'
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        matched = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', value)
+        if not matched:
+            self.fail('%r is not K/N format.' % value, param, ctx)
+        index, count = int(matched.group(1)), int(matched.group(2))
+        if not 1 <= index <= count:
+            self.fail('%r is out of range, K must be from 1 to N.' % value, param, ctx)
+        return index, count
+
+
+SHARD = ShardType()
+
+
 option_locale_dir = click.option(
     '-d', '--locale-dir',
     envvar=ENVVAR_PREFIX + '_LOCALE_DIR',
     type=click.Path(exists=False, file_okay=False),
     default='locales', metavar='<DIR>', show_default=True,
+    help='locale directory. This option override the first directory of '
+         'locale_dirs in conf.py setting if provided.')
+
+option_locale_dirs = click.option(
+    '-d', '--locale-dir', 'locale_dirs',
+    envvar=ENVVAR_PREFIX + '_LOCALE_DIR',
+    type=LOCALE_DIRS,
+    default='locales', metavar='<DIR>', show_default=True,
     help='locale directories that allow comma separated string. This option '
-         'override locale_dir in conf.py setting if provided. Default is empty '
-         'list.')
+         'override locale_dirs in conf.py setting if provided. All directories '
+         'are processed in one run.')
+
+
+def set_split_parse_jobs(ctx, param, value):
+    """parse large files of --split-parse-size on processes of the command"""
+    if value is None:
+        # without -j option, files are processed in one process and chunks
+        # are parsed on all CPUs
+        return 1
+    split_parse = catalog.get_split_parse()
+    if split_parse is not None:
+        catalog.enable_split_parse(split_parse[0], value)
+    return value
+
+
+option_jobs = click.option(
+    '-j', '--jobs',
+    envvar=ENVVAR_PREFIX + '_JOBS',
+    type=int, default=None, metavar='<N>',
+    callback=set_split_parse_jobs,
+    help='Number of processes to process files in parallel. 0 means the '
+         'number of CPUs.  [default: 1]')
+
+option_memory_budget = click.option(
+    '--memory-budget',
+    envvar=ENVVAR_PREFIX + '_MEMORY_BUDGET',
+    type=click.IntRange(min=1), default=None, metavar='<MB>',
+    help='Estimated memory for each process of -j option. Large files are '
+         'processed first, and fewer files are processed at once if their '
+         'parsed catalogs may exceed the budget. Default is no limit.')
+
+option_backend = click.option(
+    '--backend',
+    envvar=ENVVAR_PREFIX + '_BACKEND',
+    type=click.Choice(['babel', 'gettext']), default='babel', show_default=True,
+    help='"gettext" to merge and compile files with msgmerge and msgfmt of GNU '
+         'gettext, that are faster than babel. Babel is used if they are not '
+         'installed, for compressed files, and for options that change po '
+         'entries such as --prune-obsolete.')
+
+option_shard = click.option(
+    '--shard',
+    envvar=ENVVAR_PREFIX + '_SHARD',
+    type=SHARD, default=None, metavar='<K/N>',
+    help='Process only the K-th of N shards, to split files across machines. '
+         'Files are assigned to shards by a stable hash of their paths.')
+
+option_changed_since = click.option(
+    '--changed-since',
+    envvar=ENVVAR_PREFIX + '_CHANGED_SINCE',
+    type=str, default=None, metavar='<REV>',
+    help='Process only pot and po files changed since the git revision, and '
+         'files that are not tracked by git. Po and mo files that are missing '
+         'or older than their source are always processed. All files are '
+         'processed outside of a git work tree.')
+
+option_report = click.option(
+    '--report', 'report_file',
+    envvar=ENVVAR_PREFIX + '_REPORT',
+    type=click.Path(dir_okay=False, writable=True), default=None, metavar='<FILE>',
+    help='Write the result as a json file, that merge-reports command merges '
+         'with the results of other shards.')
+
+option_compress = click.option(
+    '--compress',
+    envvar=ENVVAR_PREFIX + '_COMPRESS',
+    type=click.Choice(['gz', 'xz']), default=None,
+    help='Create new po files compressed as .po.gz or .po.xz. Existing po '
+         'files are written in their format. Compressed pot and po files are '
+         'always read.')
+
+option_quiet = click.option(
+    '-q', '--quiet', count=True,
+    help='Print less. -q prints nothing except errors.')
+
+option_verbose = click.option(
+    '-v', '--verbose', count=True,
+    help='Print more. -v prints each processed file instead of a progress '
+         'bar and a summary.')
+
+option_records_format = click.option(
+    '--format', 'records_format',
+    envvar=ENVVAR_PREFIX + '_FORMAT',
+    type=click.Choice(records.FORMATS), default=None,
+    help='Format of the records. Default is csv for a .csv file, otherwise jsonl.')
 
 option_pot_dir = click.option(
     '--pot-dir', '-p',
@@ -130,6 +362,44 @@ option_line_width = click.option(
     help='The maximum line width for the po files, 0 or a negative number '
          'disable line wrapping')
 
+option_prune_obsolete = click.option(
+    '--prune-obsolete', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_PRUNE_OBSOLETE',
+    help='Remove obsolete (#~) entries from the po files.')
+
+option_max_obsolete_age = click.option(
+    '--max-obsolete-age',
+    envvar=ENVVAR_PREFIX + '_MAX_OBSOLETE_AGE',
+    type=click.IntRange(min=0), default=None, metavar='<DAYS>',
+    help='Remove obsolete entries that are obsolete for more than the days. '
+         'The date is recorded in a translator comment of each obsolete entry.')
+
+option_obsolete_archive = click.option(
+    '--obsolete-archive',
+    envvar=ENVVAR_PREFIX + '_OBSOLETE_ARCHIVE',
+    type=click.Path(exists=False, file_okay=False), default=None, metavar='<DIR>',
+    help='Keep removed obsolete entries in po files under the directory, '
+         'with the same layout as the locale directory.')
+
+option_add_location = click.option(
+    '--add-location',
+    envvar=ENVVAR_PREFIX + '_ADD_LOCATION',
+    type=click.Choice(['full', 'file', 'never']), default='full', show_default=True,
+    help="Location comments (#:) to write in the po files. 'file' writes each "
+         "file once without line numbers, 'never' drops them. The pot files "
+         "are not changed.")
+
+option_max_locations = click.option(
+    '--max-locations',
+    envvar=ENVVAR_PREFIX + '_MAX_LOCATIONS',
+    type=click.IntRange(min=0), default=None, metavar='<N>',
+    help='Write at most N location comments for each entry of the po files.')
+
+option_no_uuid = click.option(
+    '--no-uuid', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_NO_UUID',
+    help='Drop uuid comments of gettext_uuid from the po files.')
+
 option_transifex_token = click.option(
     '--transifex-token',
     envvar=ENVVAR_PREFIX + '_TRANSIFEX_TOKEN',
@@ -159,8 +429,49 @@ option_transifex_project_name = click.option(
     default=None, metavar='<FILE>',
     help='Sphinx conf.py file to read a locale directory setting.')
 @option_tag
+@click.option(
+    '--timings', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_TIMINGS',
+    help='Print durations of each phase, the slowest files and peak RSS of '
+         'the process and of the largest child process after the command.')
+@click.option(
+    '--timings-json',
+    envvar=ENVVAR_PREFIX + '_TIMINGS_JSON',
+    type=click.Path(dir_okay=False, writable=True), default=None, metavar='<FILE>',
+    help='Write per-phase and per-file durations as a json trace file.')
+@click.option(
+    '--profile',
+    envvar=ENVVAR_PREFIX + '_PROFILE',
+    type=click.Path(dir_okay=False, writable=True), default=None, metavar='<FILE>',
+    help='Write cProfile statistics of the command to the file.')
+@click.option(
+    '--cache-dir',
+    envvar=ENVVAR_PREFIX + '_CACHE_DIR',
+    type=click.Path(file_okay=False), default=None, metavar='<DIR>',
+    help='Cache parsed po/pot files in the directory to skip parsing of '
+         'unchanged files in later runs. Default is no cache.')
+@click.option(
+    '--cache-size',
+    envvar=ENVVAR_PREFIX + '_CACHE_SIZE',
+    type=click.IntRange(min=0), default=256, metavar='<MB>', show_default=True,
+    help='Size limit of --cache-dir. Least recently used entries are removed.')
+@click.option(
+    '--split-parse-size',
+    envvar=ENVVAR_PREFIX + '_SPLIT_PARSE_SIZE',
+    type=click.IntRange(min=1), default=None, metavar='<MB>',
+    help='Parse po/pot files of this size or larger in chunks on -j processes '
+         'of the command, or all CPUs without -j option. Files processed on '
+         'worker processes of -j are parsed in one process. The size of a '
+         'compressed file is the compressed size. Default is to '
+         'parse each file in one process.')
+@click.option(
+    '--lock', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_LOCK',
+    help='Lock each po/mo file while it is written, with a .lock file next to '
+         'it, for concurrent runs on the same locale directory.')
 @click.pass_context
-def main(ctx, config, tag):
+def main(ctx, config, tag, timings, timings_json, profile, cache_dir, cache_size,
+         split_parse_size, lock):
     """
     Environment Variables:
     All command-line options can be set with environment variables using the
@@ -175,6 +486,27 @@ def main(ctx, config, tag):
 
     sphinx-intl update --language=de --language=ja
     """
+    setup_instrumentation(ctx, timings, timings_json, profile)
+    if cache_dir:
+        catalog.enable_cache(cache_dir, cache_size * 2 ** 20)
+
+        def close_cache():
+            catalog.evict_cache()
+            catalog.disable_cache()
+
+        ctx.call_on_close(close_cache)
+
+    if split_parse_size:
+        catalog.enable_split_parse(split_parse_size * 2 ** 20)
+        ctx.call_on_close(catalog.disable_split_parse)
+
+    if lock:
+        try:
+            locking.enable()
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='lock')
+        ctx.call_on_close(locking.disable)
+
     # load conf.py
     ctx.config = config
     if ctx.config is None:
@@ -185,11 +517,14 @@ def main(ctx, config, tag):
 
     # for locale_dir
     ctx.locale_dir = None
+    ctx.locale_dirs = None
     if ctx.config:
         cfg = read_config(ctx.config, tag)
-        if 'locale_dirs' in cfg:
-            ctx.locale_dir = os.path.join(
-                os.path.dirname(ctx.config), cfg['locale_dirs'][0])
+        if cfg.get('locale_dirs'):
+            ctx.locale_dirs = tuple(
+                os.path.join(os.path.dirname(ctx.config), d)
+                for d in cfg['locale_dirs'])
+            ctx.locale_dir = ctx.locale_dirs[0]
 
     # for pot_dir
     ctx.pot_dir = None
@@ -212,15 +547,37 @@ def main(ctx, config, tag):
 
     ctx.default_map = {
         'update': {
-            'locale_dir': ctx.locale_dir,
+            'locale_dirs': ctx.locale_dirs,
+            'pot_dir': ctx.pot_dir,
+        },
+        'init-language': {
+            'locale_dirs': ctx.locale_dirs,
             'pot_dir': ctx.pot_dir,
         },
         'build': {
-            'locale_dir': ctx.locale_dir,
+            'locale_dirs': ctx.locale_dirs,
         },
         'stat': {
+            'locale_dirs': ctx.locale_dirs,
+        },
+        'clean': {
+            'locale_dirs': ctx.locale_dirs,
+            'pot_dir': ctx.pot_dir,
+        },
+        'sync': {
+            'locale_dirs': ctx.locale_dirs,
+            'pot_dir': ctx.pot_dir,
+        },
+        'watch': {
+            'locale_dirs': ctx.locale_dirs,
+            'pot_dir': ctx.pot_dir,
+        },
+        'diff': {
             'locale_dir': ctx.locale_dir,
         },
+        'export': {
+            'locale_dirs': ctx.locale_dirs,
+        },
         'update-txconfig-resources': {
             'locale_dir': ctx.locale_dir,
             'pot_dir': ctx.pot_dir,
@@ -230,11 +587,33 @@ def main(ctx, config, tag):
 
 
 @main.command()
-@option_locale_dir
+@option_locale_dirs
 @option_pot_dir
 @option_language
 @option_line_width
-def update(locale_dir, pot_dir, language, line_width):
+@option_jobs
+@option_memory_budget
+@option_backend
+@option_shard
+@option_changed_since
+@option_report
+@option_compress
+@option_quiet
+@option_verbose
+@option_prune_obsolete
+@option_max_obsolete_age
+@option_obsolete_archive
+@option_add_location
+@option_max_locations
+@option_no_uuid
+@click.option(
+    '--delete-orphans', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_DELETE_ORPHANS',
+    help='Delete po and mo files whose pot file no longer exists.')
+def update(locale_dirs, pot_dir, language, line_width, jobs, memory_budget, backend, shard,
+           changed_since, report_file, compress, quiet, verbose, prune_obsolete,
+           max_obsolete_age, obsolete_archive, add_location, max_locations, no_uuid,
+           delete_orphans):
     """
     Update specified language's po files from pot.
 
@@ -243,57 +622,454 @@ def update(locale_dir, pot_dir, language, line_width):
        sphinx-intl update -l de -l ja
        sphinx-intl update -l de,ja
     """
-    if not pot_dir:
-        pot_dir = os.path.join(locale_dir, 'pot')
-    if not os.path.exists(pot_dir):
-        msg = ("%(pot_dir)r does not exist. Please specify pot directory with "
-               "-p option, or preparing your pot files in %(pot_dir)r."
-               % locals())
-        raise click.BadParameter(msg, param_hint='pot_dir')
+    changed = get_changes(changed_since)
+    tasks = []
+    targets = []
+    for locale_dir in locale_dirs:
+        locale_pot_dir = get_pot_dir(locale_dir, pot_dir)
+        languages = get_languages(locale_dir, language)
+        if not languages:
+            msg = ("No languages are found. Please specify language with -l "
+                   "option, or preparing language directories under %(locale_dir)r "
+                   "directory."
+                   % locals())
+            raise click.BadParameter(msg, param_hint='language')
+        tasks.extend(basic.update_tasks(locale_dir, locale_pot_dir, languages, shard,
+                                        changed, compress))
+        targets.append((locale_dir, locale_pot_dir, languages))
+
+    reporter = get_reporter(quiet, verbose)
+    result = basic.run_update(tasks, line_width, jobs, reporter,
+                              memory_budget=get_memory_budget(memory_budget),
+                              backend=get_backend(backend),
+                              prune_obsolete=prune_obsolete,
+                              max_obsolete_age=max_obsolete_age,
+                              obsolete_archive=obsolete_archive,
+                              add_location=add_location,
+                              max_locations=max_locations,
+                              uuid=not no_uuid)
+    write_report(report_file, 'update', shard, result)
+
+    if delete_orphans:
+        for locale_dir, locale_pot_dir, languages in targets:
+            basic.clean(locale_dir, locale_pot_dir, languages, reporter=reporter)
+
+
+@main.command('init-language')
+@option_locale_dirs
+@option_pot_dir
+@option_language
+@option_line_width
+@option_jobs
+@option_report
+@option_compress
+@option_quiet
+@option_verbose
+@option_add_location
+@option_max_locations
+@option_no_uuid
+def init_language(locale_dirs, pot_dir, language, line_width, jobs, report_file, compress,
+                  quiet, verbose, add_location, max_locations, no_uuid):
+    """
+    Create po files of new languages from pot. Existing po files are not
+    changed.
+
+    \b
+    For examples:
+       sphinx-intl init-language -l de -l ja
+       sphinx-intl init-language -l de,ja
+    """
     if not language:
-        language = get_lang_dirs(locale_dir)
-    languages = sum(language, ())  # flatten
-    if not languages:
-        msg = ("No languages are found. Please specify language with -l "
-               "option, or preparing language directories under %(locale_dir)r "
-               "directory."
-               % locals())
+        msg = "Please specify language with -l option."
         raise click.BadParameter(msg, param_hint='language')
-
-    basic.update(locale_dir, pot_dir, languages, line_width)
+    languages = sum(language, ())  # flatten
+    reporter = get_reporter(quiet, verbose)
+    result = {}
+    for locale_dir in locale_dirs:
+        locale_pot_dir = get_pot_dir(locale_dir, pot_dir)
+        status = basic.init_language(locale_dir, locale_pot_dir, languages, line_width, jobs,
+                                     compress, reporter=reporter,
+                                     add_location=add_location,
+                                     max_locations=max_locations,
+                                     uuid=not no_uuid)
+        for key, count in status.items():
+            result[key] = result.get(key, 0) + count
+    write_report(report_file, 'init-language', None, result)
 
 
 @main.command()
-@option_locale_dir
+@option_locale_dirs
 @option_output_dir
 @option_language
-def build(locale_dir, output_dir, language):
+@option_jobs
+@option_memory_budget
+@option_backend
+@option_shard
+@option_changed_since
+@click.option(
+    '--bundle', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_BUNDLE',
+    help='Write mo files of each language into one <output-dir>/<lang>.zip '
+         'bundle instead of .mo files, that sphinx_intl.bundle.Bundle reads '
+         'without extracting. Bundles are compiled with babel.')
+@option_report
+@option_quiet
+@option_verbose
+def build(locale_dirs, output_dir, language, jobs, memory_budget, backend, shard,
+          changed_since, bundle, report_file, quiet, verbose):
     """
     Build specified language's po files into mo.
     """
-    if not language:
-        language = get_lang_dirs(locale_dir)
-    languages = sum(language, ())  # flatten
+    if bundle:
+        if shard or changed_since:
+            msg = '--bundle can not be used with --shard and --changed-since.'
+            raise click.BadParameter(msg, param_hint='bundle')
+        targets = [(d, None, get_languages(d, language)) for d in locale_dirs]
+        check_output_dir(output_dir, targets, bundle=True)
+        tasks = []
+        for locale_dir, _, languages in targets:
+            tasks.extend(basic.bundle_tasks(locale_dir, output_dir or locale_dir, languages))
+        result = basic.run_bundle(tasks, jobs, get_reporter(quiet, verbose),
+                                  get_memory_budget(memory_budget))
+        write_report(report_file, 'build', None, result)
+        return
+
+    targets = [(d, None, get_languages(d, language)) for d in locale_dirs]
+    check_output_dir(output_dir, targets)
+    changed = get_changes(changed_since)
+    tasks = []
+    for locale_dir, _, languages in targets:
+        tasks.extend(basic.build_tasks(locale_dir, output_dir or locale_dir, languages,
+                                       shard, changed))
+
+    result = basic.run_build(tasks, jobs, get_reporter(quiet, verbose),
+                             get_memory_budget(memory_budget), get_backend(backend))
+    write_report(report_file, 'build', shard, result)
+
+
+@main.command()
+@option_locale_dirs
+@option_language
+@option_jobs
+@option_shard
+@option_report
+@option_quiet
+def stat(locale_dirs, language, jobs, shard, report_file, quiet):
+    """
+    Print statistics for all po files.
+    """
+    tasks = []
+    for locale_dir in locale_dirs:
+        languages = get_languages(locale_dir, language)
+        tasks.extend(basic.stat_tasks(locale_dir, languages, shard))
+
+    result = basic.run_stat(tasks, jobs, get_reporter(quiet, 0))
+    write_report(report_file, 'stat', shard, result)
+
+
+@main.command()
+@option_locale_dirs
+@option_pot_dir
+@option_output_dir
+@option_language
+@click.option(
+    '-n', '--dry-run', is_flag=True, default=False,
+    help='Only print files that would be deleted.')
+@option_quiet
+@option_verbose
+def clean(locale_dirs, pot_dir, output_dir, language, dry_run, quiet, verbose):
+    """
+    Delete po and mo files whose pot file no longer exists.
+
+    \b
+    For examples:
+       sphinx-intl clean --dry-run
+       sphinx-intl clean -p _build/gettext -l de,ja
+    """
+    targets = [(d, get_languages(d, language)) for d in locale_dirs]
+    # clean doesn't create po files from pot files
+    check_output_dir(output_dir, [(d, None, languages) for d, languages in targets])
+    reporter = get_reporter(quiet, verbose)
+    for locale_dir, languages in targets:
+        # mo files of the other locale directories in the same --output-dir
+        shared = [d for d in locale_dirs if d != locale_dir] if output_dir else []
+        basic.clean(locale_dir, get_pot_dir(locale_dir, pot_dir), languages, output_dir,
+                    dry_run, shared, reporter)
+
+
+@main.command()
+@option_locale_dirs
+@option_pot_dir
+@option_output_dir
+@option_language
+@option_line_width
+@option_jobs
+@option_shard
+@option_changed_since
+@option_report
+@option_compress
+@option_quiet
+@option_verbose
+@option_prune_obsolete
+@option_max_obsolete_age
+@option_obsolete_archive
+@option_add_location
+@option_max_locations
+@option_no_uuid
+def sync(locale_dirs, pot_dir, output_dir, language, line_width, jobs, shard,
+         changed_since, report_file, compress, quiet, verbose, prune_obsolete,
+         max_obsolete_age, obsolete_archive, add_location, max_locations, no_uuid):
+    """
+    Update po files, build mo files and print statistics in one pass.
+
+    This is same as running update, build and stat commands, but each pot
+    and po file is read only once.
+
+    \b
+    For examples:
+       sphinx-intl sync -l de,ja
+       sphinx-intl sync -j 0
+    """
+    targets = []
+    for locale_dir in locale_dirs:
+        locale_pot_dir = get_pot_dir(locale_dir, pot_dir)
+        languages = get_languages(locale_dir, language)
+        if not languages:
+            msg = ("No languages are found. Please specify language with -l "
+                   "option, or preparing language directories under %(locale_dir)r "
+                   "directory."
+                   % locals())
+            raise click.BadParameter(msg, param_hint='language')
+        targets.append((locale_dir, locale_pot_dir, languages))
+    check_output_dir(output_dir, targets)
+
+    changed = get_changes(changed_since)
+    tasks = []
+    for locale_dir, locale_pot_dir, languages in targets:
+        tasks.extend(basic.sync_tasks(locale_dir, locale_pot_dir, languages,
+                                      output_dir or locale_dir, shard, changed,
+                                      compress))
+
+    reporter = get_reporter(quiet, verbose)
+    result = basic.run_sync(tasks, line_width, jobs, reporter,
+                            prune_obsolete=prune_obsolete,
+                            max_obsolete_age=max_obsolete_age,
+                            obsolete_archive=obsolete_archive,
+                            add_location=add_location,
+                            max_locations=max_locations,
+                            uuid=not no_uuid)
+    write_report(report_file, 'sync', shard, result)
+
+
+@main.command()
+@option_locale_dirs
+@option_pot_dir
+@option_output_dir
+@option_language
+@option_line_width
+@option_jobs
+@click.option(
+    '--interval',
+    envvar=ENVVAR_PREFIX + '_INTERVAL',
+    type=click.FloatRange(min=0.01), default=1.0, metavar='<SECONDS>', show_default=True,
+    help='Interval to poll files without watchdog package.')
+@click.option(
+    '--debounce',
+    envvar=ENVVAR_PREFIX + '_DEBOUNCE',
+    type=click.FloatRange(min=0), default=0.3, metavar='<SECONDS>', show_default=True,
+    help='Process changes after files are not changed for the seconds.')
+@click.option(
+    '--polling', is_flag=True, default=False,
+    envvar=ENVVAR_PREFIX + '_POLLING',
+    help='Poll files even if watchdog package is installed.')
+def watch(locale_dirs, pot_dir, output_dir, language, line_width, jobs,
+          interval, debounce, polling):
+    """
+    Update po files and build mo files whenever pot and po files are changed.
+
+    Changes are notified by watchdog package if it is installed, otherwise
+    files are polled.
 
-    if not output_dir or (
-            os.path.exists(output_dir) and
-            os.path.samefile(locale_dir, output_dir)):
-        output_dir = locale_dir
+    \b
+    For examples:
+       sphinx-intl watch -l de,ja
+       sphinx-intl watch -p _build/gettext --debounce 1
+    """
+    targets = []
+    for locale_dir in locale_dirs:
+        locale_pot_dir = get_pot_dir(locale_dir, pot_dir)
+        languages = get_languages(locale_dir, language)
+        if not languages:
+            msg = ("No languages are found. Please specify language with -l "
+                   "option, or preparing language directories under %(locale_dir)r "
+                   "directory."
+                   % locals())
+            raise click.BadParameter(msg, param_hint='language')
+        targets.append((locale_dir, locale_pot_dir, languages))
+    check_output_dir(output_dir, targets)
+
+    watcher = watch_.Watcher(targets, output_dir, line_width, jobs)
+    # bring files up to date before watching
+    watcher.process(set(watcher.snapshot))
+    watcher.changes()
+    dirs = []
+    for locale_dir, locale_pot_dir, languages in targets:
+        dirs.extend(d for d in (locale_pot_dir, locale_dir) if d not in dirs)
+    click.echo('Watching {0}. Press Ctrl+C to stop.'.format(', '.join(dirs)))
+    try:
+        watcher.run(interval, debounce, polling)
+    except KeyboardInterrupt:
+        pass
 
-    basic.build(locale_dir, output_dir, languages)
+
+@main.command('merge-reports')
+@click.argument('reports', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '-o', '--output',
+    type=click.Path(dir_okay=False, writable=True), default=None, metavar='<FILE>',
+    help='Write the merged report to the file. Default is stdout.')
+def merge_reports(reports, output):
+    """
+    Merge --report files of shards into one report.
+
+    \b
+    For examples:
+       sphinx-intl update --shard 1/2 --report update-1.json
+       sphinx-intl update --shard 2/2 --report update-2.json
+       sphinx-intl merge-reports update-*.json -o update.json
+    """
+    loaded = []
+    for path in reports:
+        with open(path) as f:
+            loaded.append(json.load(f))
+
+    commands = set(r['command'] for r in loaded)
+    if len(commands) != 1:
+        msg = 'Reports of different commands can not be merged: %s' % ', '.join(
+            sorted(commands))
+        raise click.BadParameter(msg, param_hint='reports')
+
+    shards = [tuple(r['shard']) for r in loaded if r.get('shard')]
+    counts = set(count for index, count in shards)
+    if len(counts) == 1:
+        count = counts.pop()
+        missing = sorted(set(range(1, count + 1)) - set(index for index, _ in shards))
+        if missing:
+            click.echo('Warning: reports of shard {0} of {1} are missing.'.format(
+                ', '.join(str(i) for i in missing), count), err=True)
+
+    merged = {
+        'command': commands.pop(),
+        'shard': None,
+        'result': basic.merge_results([r['result'] for r in loaded]),
+    }
+    data = json.dumps(merged, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data)
+    else:
+        click.echo(data)
 
 
 @main.command()
+@click.argument('old')
 @option_locale_dir
 @option_language
-def stat(locale_dir, language):
+@option_jobs
+@click.option(
+    '--format', 'output_format',
+    envvar=ENVVAR_PREFIX + '_FORMAT',
+    type=click.Choice(['text', 'json']), default='text', show_default=True,
+    help='"json" prints changed messages of each po file as json.')
+@option_quiet
+@option_verbose
+def diff(old, locale_dir, language, jobs, output_format, quiet, verbose):
     """
-    Print statistics for all po files.
+    Print messages that are added, removed, retranslated, fuzzied or
+    unfuzzied since OLD, that is a locale directory or a git revision of
+    the locale directory. Identical files are skipped without parsing.
+
+    \b
+    For examples:
+       sphinx-intl diff ../old/locales -d locales
+       sphinx-intl diff origin/main -d locales -v
+       sphinx-intl diff HEAD~1 --format json
     """
-    if not language:
-        language = get_lang_dirs(locale_dir)
-    languages = sum(language, ())  # flatten
-    basic.stat(locale_dir, languages)
+    languages = get_languages(locale_dir, language)
+    if not language and os.path.isdir(old):
+        # also languages that are removed
+        languages = tuple(sorted(set(languages) | set(get_languages(old, language))))
+
+    try:
+        if os.path.isdir(old):
+            tasks = basic.diff_tasks(old, locale_dir, languages)
+        else:
+            tasks = basic.diff_tasks_since(old, locale_dir, languages)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='old')
+
+    if output_format == 'json':
+        result = basic.run_diff(tasks, jobs, report.Reporter(report.QUIET))
+        click.echo(json.dumps(result, indent=2, sort_keys=True, ensure_ascii=False))
+    else:
+        basic.run_diff(tasks, jobs, get_reporter(quiet, verbose))
+
+
+@main.command()
+@option_locale_dirs
+@option_language
+@option_shard
+@click.option(
+    '-o', '--output',
+    type=click.File('w', encoding='utf-8'), default='-', metavar='<FILE>',
+    help='Write the records to the file. Default is stdout.')
+@option_records_format
+def export(locale_dirs, language, shard, output, records_format):
+    """
+    Write every entry of po files as a record of file, msgctxt, msgid,
+    msgid_plural, msgstr and flags, one line per entry. Po files are read
+    one by one, so that memory usage doesn't grow with the number of files.
+
+    \b
+    For examples:
+       sphinx-intl export -l ja -o ja.jsonl
+       sphinx-intl export -l de,ja -o messages.csv
+    """
+    fmt = get_records_format(records_format, output.name)
+    po_files = []
+    for locale_dir in locale_dirs:
+        languages = get_languages(locale_dir, language)
+        po_files.extend(basic.stat_tasks(locale_dir, languages, shard))
+    # one dump for all locale directories, to write the csv header once
+    count = records.dump(basic.export_records(po_files), output, fmt)
+    click.echo('Records: {0} exported.'.format(count), err=True)
+
+
+@main.command('import')
+@click.argument('input_file', metavar='FILE', type=click.File('r', encoding='utf-8'))
+@option_records_format
+@option_line_width
+@option_jobs
+@option_quiet
+@option_verbose
+def import_(input_file, records_format, line_width, jobs, quiet, verbose):
+    """
+    Apply msgstr and flags of records in FILE, that export command writes,
+    to the po files. Each changed po file is written once. Run this in the
+    directory where the records are exported, or FILE '-' for stdin.
+
+    \b
+    For examples:
+       sphinx-intl import ja.jsonl
+       sphinx-intl import messages.csv -j 0
+    """
+    fmt = get_records_format(records_format, input_file.name)
+    try:
+        tasks = basic.import_tasks(records.load(input_file, fmt))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='FILE')
+    basic.run_import(tasks, line_width, jobs, get_reporter(quiet, verbose))
 
 
 @main.command('create-transifexrc')
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.ext
+    ~~~~~~~~~~~~~~~
+
+    Sphinx extension that builds mo files of the ``language`` in the
+    background while sphinx-build loads the environment, instead of Sphinx's
+    ``gettext_auto_build``. The build is finished before Sphinx finds
+    outdated documents from mtimes of mo files, as Sphinx's own build is.
+    Add ``'sphinx_intl'`` to ``extensions``.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from sphinx.util import logging
+
+from . import __version__
+from . import basic
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = 'sphinx-intl-mo.json'
+
+
+class MoBuilder(object):
+    """
+    Build stale mo files in a thread. A po file whose mo file is older is
+    compiled only if its content is changed from the last build, that is
+    recorded in the cache file, to skip unchanged files after a checkout
+    touches all files. The mo files of unchanged po files are left as they
+    are, not to make documents outdated.
+
+    :param list locale_dirs: paths for locale directories
+    :param unicode language: language to build mo files
+    :param unicode cache_file: path for json file of po file digests, or None
+    :param int jobs: number of processes, 0 for number of CPUs
+    """
+
+    def __init__(self, locale_dirs, language, cache_file=None, jobs=1):
+        self.locale_dirs = locale_dirs
+        self.language = language
+        self.cache_file = cache_file
+        self.jobs = jobs
+        self.built = []
+        self._error = None
+        self._thread = None
+
+    def load_cache(self):
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file) as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+        return {}
+
+    def save_cache(self, cache):
+        if self.cache_file:
+            dirname = os.path.dirname(self.cache_file)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname, exist_ok=True)
+            with open(self.cache_file, 'w') as f:
+                json.dump(cache, f, indent=0, sort_keys=True)
+
+    def build(self):
+        """
+        Build stale mo files.
+
+        :return: [mo_file, ...] of built files
+        :rtype: list
+        """
+        cache = self.load_cache()
+        tasks = []
+        for locale_dir in self.locale_dirs:
+            for task in basic.build_tasks(locale_dir, locale_dir, (self.language,)):
+                with open(task.po_file, 'rb') as f:
+                    digest = hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+                key = os.path.abspath(task.po_file)
+                if cache.get(key) == digest and os.path.exists(task.mo_file):
+                    continue
+                cache[key] = digest
+                tasks.append(task)
+
+        for event in basic.process_build(tasks, self.jobs):
+            self.built.append(event.mo_file)
+        self.save_cache(cache)
+        return self.built
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as e:
+            self._error = e
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sphinx-intl-build-mo')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def join(self):
+        """
+        Wait for the thread, and raise an exception that the thread raised.
+
+        :return: [mo_file, ...] of built files
+        :rtype: list
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if self._error is not None:
+                raise self._error
+        return self.built
+
+
+# ==================================
+# sphinx events
+
+def config_inited(app, config):
+    if not (config.sphinx_intl_build_mo and config.language):
+        return
+    # mo files are built by MoBuilder instead, and it is finished on
+    # builder-inited, before Sphinx's own build would run on reading
+    config.gettext_auto_build = False
+    locale_dirs = [os.path.join(app.srcdir, d) for d in config.locale_dirs]
+    cache_file = os.path.join(app.doctreedir, CACHE_FILENAME)
+    app._sphinx_intl_mo_builder = MoBuilder(
+        locale_dirs, config.language, cache_file, config.sphinx_intl_jobs)
+    app._sphinx_intl_mo_builder.start()
+
+
+def builder_inited(app):
+    mo_builder = getattr(app, '_sphinx_intl_mo_builder', None)
+    if mo_builder is None:
+        return
+    app._sphinx_intl_mo_builder = None
+    built = mo_builder.join()
+    if built:
+        logger.info('sphinx-intl: built %d mo files for %s', len(built), mo_builder.language)
+
+
+def setup(app):
+    app.add_config_value('sphinx_intl_build_mo', True, '')
+    app.add_config_value('sphinx_intl_jobs', 1, '')
+    app.connect('config-inited', config_inited)
+    # outdated documents are found from mtimes of mo files after this
+    app.connect('builder-inited', builder_inited)
+    return {
+        'version': __version__,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.locking
+    ~~~~~~~~~~~~~~~~~~~
+
+    Per-file advisory locks for concurrent runs on a shared locale directory,
+    for ``--lock`` option, and atomic replacement of files.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+from . import timing
+
+LOCK_SUFFIX = '.lock'
+
+# whether files are locked in this process.
+_enabled = False
+
+# mode of new files, that mkstemp doesn't apply.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+# ==================================
+# utility functions
+
+def enable():
+    """
+    start locking files in this process
+
+    :raise ValueError: the platform doesn't support file locking
+    """
+    global _enabled
+    if fcntl is None:
+        raise ValueError('file locking is not supported on this platform')
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def lock_path(path):
+    """:return: path of the lock file of the file"""
+    return path + LOCK_SUFFIX
+
+
+@contextmanager
+def locked(path):
+    """
+    Hold an exclusive lock of the file in a block while locking is enabled.
+    The lock is taken with ``lockf`` on a lock file next to the file, that
+    is also honored by NFS, and the lock file is removed on release.
+
+    Locks are held by the process, so threads of a process don't exclude
+    each other.
+
+    :param unicode path: path of the file to lock, the file itself may not
+                         exist yet
+    """
+    if not _enabled:
+        yield
+        return
+
+    filename = lock_path(path)
+    with timing.phase('lock', path):
+        fd = _acquire(filename)
+    try:
+        yield
+    finally:
+        # remove before unlocking, waiters see the removal and retry
+        try:
+            os.remove(filename)
+        finally:
+            os.close(fd)
+
+
+@contextmanager
+def replacing(filename):
+    """
+    Write a file atomically. A temporary file next to the file is yielded to
+    write, and it replaces the file at the end of the block, so that readers
+    see the old or the new content. The temporary file is removed if the
+    block raises.
+
+    The target of a symlink is replaced, not the symlink, and the mode and
+    the group of the existing file are kept.
+
+    :param unicode filename: path to the file to replace, the file itself may
+                             not exist yet
+    """
+    filename = os.path.realpath(filename)
+    dirname, basename = os.path.split(filename)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=basename + '.', suffix='.tmp', dir=dirname)
+    os.close(fd)
+    try:
+        yield tmp
+        _copy_stat(filename, tmp)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _copy_stat(filename, tmp):
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        return
+    shutil.copymode(filename, tmp)
+    if hasattr(os, 'chown'):
+        try:
+            os.chown(tmp, -1, st.st_gid)
+        except OSError:
+            pass  # not a member of the group
+
+
+def _acquire(filename):
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname, exist_ok=True)
+    while True:
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            # the previous holder may have removed the lock file meanwhile
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(filename)):
+                    return fd
+            except FileNotFoundError:
+                pass
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.parallel
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Run per-file work on a shared process pool.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import collections
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+from . import catalog
+from . import locking
+from . import timing
+
+# estimated memory of a parsed catalog per byte of the po file
+FOOTPRINT_RATIO = 10
+
+# settings of the parent process applied in this worker process.
+_worker_settings = None
+
+
+# ==================================
+# utility functions
+
+def cpu_count():
+    return os.cpu_count() or 1
+
+
+def normalize_jobs(jobs):
+    """
+    Resolve number of worker processes.
+
+    :param int jobs: number of processes, 0 or negative for number of CPUs
+    :return: number of processes, at least 1
+    :rtype: int
+    """
+    if not jobs or jobs < 1:
+        return cpu_count()
+    return jobs
+
+
+def imap(func, items, jobs=1, sizes=None, memory_budget=None):
+    """
+    Apply ``func`` to each item and yield results in the order of items.
+
+    With ``jobs`` greater than 1 the items are processed by a process pool,
+    therefore ``func`` must be a module level function and the items and
+    results must be picklable. Timings recorded in the workers are merged
+    into the recorder of this process, with the busy time of the pool.
+
+    Items are read as they are sent to the workers, and at most ``jobs * 2``
+    batches of items and their results are held at once, so a long iterator
+    of items is processed in constant memory.
+
+    With ``sizes``, items are sent to the workers in batches of about the
+    same total size, in the order of items. Pass items in descending order
+    of the size to start large files first. Running batches are limited so
+    that their estimated memory is within ``memory_budget`` per process,
+    while one batch always runs.
+
+    :param func: function that takes one item
+    :param items: iterable of items
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param list sizes: file sizes in bytes of each item, or None
+    :param int memory_budget: estimated memory in bytes for each process, or
+                              None for no limit
+    :return: iterator of results
+    """
+    total = len(items) if hasattr(items, '__len__') else None
+    items = iter(items)
+    head = list(itertools.islice(items, normalize_jobs(jobs)))
+    jobs = len(head)
+    items = itertools.chain(head, items)
+    if jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    if sizes is not None:
+        batches = iter(_batches(sizes, jobs))
+    else:
+        batches = _chunks(total, jobs)
+
+    recorder = timing.get_recorder()
+    # same settings as this process, that are not inherited by spawn. They are
+    # sent with each batch, as initializer of the pool needs Python 3.7.
+    settings = (recorder is not None, catalog.get_cache(), locking.is_enabled())
+    call = partial(_call_batch, settings, func)
+    started = time.perf_counter()
+    busy = 0.0
+    count = 0
+    try:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = _schedule(executor, call, items, batches, sizes, jobs, memory_budget)
+            for result, duration, worker_started, events in results:
+                busy += duration
+                count += 1
+                if recorder is not None:
+                    recorder.extend(events, worker_started)
+                yield result
+    finally:
+        # also when the caller stops at the last result, e.g. zip()
+        if recorder is not None:
+            recorder.add_pool(jobs, count, busy, time.perf_counter() - started)
+
+
+def footprint(size):
+    """estimated memory in bytes of a catalog parsed from a file of the size"""
+    return size * FOOTPRINT_RATIO
+
+
+def _batches(sizes, jobs):
+    """split items into [(start, end), ...] of about the same total size"""
+    target = sum(sizes) / (jobs * 8)
+    chunksize = max(1, len(sizes) // (jobs * 8))
+    batches = []
+    start = 0
+    total = 0
+    for i, size in enumerate(sizes):
+        if i > start and (total + size > target or i - start >= chunksize):
+            batches.append((start, i))
+            start = i
+            total = 0
+        total += size
+    batches.append((start, len(sizes)))
+    return batches
+
+
+def _chunks(total, jobs):
+    """endless (start, end) of the same number of items, 1 if total is None"""
+    chunksize = max(1, (total or 0) // (jobs * 8))
+    for start in itertools.count(0, chunksize):
+        yield start, start + chunksize
+
+
+def _schedule(executor, call, items, batches, sizes, jobs, memory_budget):
+    limit = memory_budget * jobs if memory_budget else None
+    order = collections.deque()  # batches that are not yielded yet
+    pending = []
+    running = {}
+    done = {}
+    used = 0
+    while True:
+        # read the next batches of items, while held batches are few
+        while len(order) < jobs * 2:
+            batch = next(batches, None)
+            chunk = [] if batch is None else list(itertools.islice(items, batch[1] - batch[0]))
+            if not chunk:
+                break
+            start, end = batch
+            estimate = footprint(max(sizes[start:end])) if sizes is not None else 0
+            order.append(batch)
+            pending.append((batch, chunk, estimate))
+        if not order:
+            return
+
+        for entry in list(pending):
+            if len(running) >= jobs:
+                break
+            batch, chunk, estimate = entry
+            if running and limit is not None and used + estimate > limit:
+                continue  # a smaller batch may fit
+            future = executor.submit(call, chunk)
+            running[future] = (batch, estimate)
+            used += estimate
+            pending.remove(entry)
+
+        if order[0] not in done:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch, estimate = running.pop(future)
+                used -= estimate
+                done[batch] = future.result()
+        while order and order[0] in done:
+            for result in done.pop(order.popleft()):
+                yield result
+
+
+def _init_worker(settings):
+    # once in each worker process
+    global _worker_settings
+    if settings == _worker_settings:
+        return
+    _worker_settings = settings
+    timings, cache, lock = settings
+    if timings:
+        timing.enable()
+    if cache is not None:
+        catalog.enable_cache(*cache)
+    # files are parsed serially on the workers, not to start processes of
+    # --split-parse-size on each of the jobs, that are inherited by fork.
+    catalog.disable_split_parse()
+    if lock:
+        locking.enable()
+
+
+def _call(func, item):
+    started = time.perf_counter()
+    result = func(item)
+    duration = time.perf_counter() - started
+    recorder = timing.get_recorder()
+    if recorder is None:
+        return result, duration, 0, []
+    events, recorder.events = recorder.events, []
+    return result, duration, recorder.started, events
+
+
+def _call_batch(settings, func, items):
+    _init_worker(settings)
+    return [_call(func, item) for item in items]
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.records
+    ~~~~~~~~~~~~~~~~~~~
+
+    Flat records of po file entries as JSONL or CSV, for ``export`` and
+    ``import`` commands.
+
+    A record is ``{'file': ..., 'msgctxt': ..., 'msgid': ..., 'msgid_plural':
+    ..., 'msgstr': ..., 'flags': [...]}``. ``msgstr`` of a plural entry is a
+    list of the plural forms. In CSV, empty ``msgctxt`` and ``msgid_plural``
+    are None, ``flags`` are separated by commas and plural forms of
+    ``msgstr`` are a json array.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import csv
+import json
+
+FIELDS = ('file', 'msgctxt', 'msgid', 'msgid_plural', 'msgstr', 'flags')
+FORMATS = ('jsonl', 'csv')
+
+
+def message_record(po_file, message):
+    """
+    :param unicode po_file: path for po file of the message
+    :param message: message object
+    :return: record of the message
+    :rtype: dict
+    """
+    if isinstance(message.id, (list, tuple)):
+        msgid, msgid_plural = message.id[0], message.id[1]
+        msgstr = list(message.string)
+    else:
+        msgid, msgid_plural, msgstr = message.id, None, message.string
+    return {
+        'file': po_file.replace('\\', '/'),
+        'msgctxt': message.context,
+        'msgid': msgid,
+        'msgid_plural': msgid_plural,
+        'msgstr': msgstr,
+        'flags': sorted(message.flags),
+    }
+
+
+def dump(records, fileobj, fmt='jsonl'):
+    """
+    Write records one by one.
+
+    :param records: iterable of records
+    :param fileobj: text file object to write
+    :param unicode fmt: 'jsonl' or 'csv'
+    :return: number of records
+    :rtype: int
+    """
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(fileobj, FIELDS, lineterminator='\n')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(_to_csv(record))
+            count += 1
+    else:
+        for record in records:
+            fileobj.write(json.dumps(record, ensure_ascii=False))
+            fileobj.write('\n')
+            count += 1
+    return count
+
+
+def load(fileobj, fmt='jsonl'):
+    """
+    Read records one by one.
+
+    :param fileobj: text file object to read
+    :param unicode fmt: 'jsonl' or 'csv'
+    :return: iterator of records
+    :raise ValueError: a line or a row is not a record
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            where = 'line {0}'.format(reader.line_num)
+            yield _check(_from_csv(row, where), where)
+        return
+    for lineno, line in enumerate(fileobj, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError('line {0}: {1}'.format(lineno, e))
+        yield _check(record, 'line {0}'.format(lineno))
+
+
+def _check(record, where):
+    if not isinstance(record, dict) or not record.get('file') or not record.get('msgid'):
+        raise ValueError('{0}: file and msgid are required'.format(where))
+    return record
+
+
+def _to_csv(record):
+    row = dict(record)
+    if record.get('msgid_plural') is not None:
+        row['msgstr'] = json.dumps(record['msgstr'], ensure_ascii=False)
+    row['flags'] = ', '.join(record.get('flags') or [])
+    return row
+
+
+def _from_csv(row, where):
+    record = dict((field, row.get(field) or None) for field in FIELDS)
+    # an empty cell is an untranslated string, a missing column is not applied
+    record['msgstr'] = row.get('msgstr')
+    if record['msgid_plural'] is not None and record['msgstr'] is not None:
+        try:
+            record['msgstr'] = json.loads(record['msgstr'])
+        except ValueError:
+            raise ValueError('{0}: msgstr of plural forms is not a json array'.format(where))
+    if 'flags' in row:
+        record['flags'] = [f.strip() for f in (row['flags'] or '').split(',') if f.strip()]
+    else:
+        del record['flags']
+    return record
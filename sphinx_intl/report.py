@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.report
+    ~~~~~~~~~~~~~~~~~~
+
+    Console reporting of processed files with verbosity levels, buffered
+    writes and a rate-limited progress bar.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import sys
+import time
+
+import click
+
+
+QUIET = 0    # print nothing
+NORMAL = 1   # print a progress bar on a terminal and a summary
+VERBOSE = 2  # print each file
+
+# flush buffered lines when the buffer has this many lines, or this many
+# seconds passed since the last flush
+FLUSH_LINES = 1000
+FLUSH_INTERVAL = 0.2
+
+
+def get_verbosity(quiet=0, verbose=0):
+    """
+    :param int quiet: count of -q options
+    :param int verbose: count of -v options
+    :return: QUIET, NORMAL or VERBOSE
+    :rtype: int
+    """
+    return max(QUIET, min(VERBOSE, NORMAL + verbose - quiet))
+
+
+class Reporter(object):
+    """
+    Print messages of a run. Lines are buffered and written together to keep
+    the cost of output low on slow terminals and log collectors.
+
+    :param int verbosity: QUIET, NORMAL or VERBOSE
+    :param file: output stream, default is stdout
+    """
+
+    def __init__(self, verbosity=VERBOSE, file=None):
+        self.verbosity = verbosity
+        self.file = file
+        self._lines = []
+        self._flushed = time.monotonic()
+        self._progress = None
+
+    def start(self, label, total=None):
+        """
+        Start a run of ``total`` steps. A progress bar is shown only for
+        NORMAL verbosity on a terminal.
+
+        :param unicode label: label of the progress bar
+        :param int total: number of steps, or None for no progress bar
+        """
+        file = self.file or sys.stdout
+        if (self.verbosity == NORMAL and total and
+                hasattr(file, 'isatty') and file.isatty()):
+            self._progress = click.progressbar(
+                length=total,
+                label=label,
+                file=file,
+                # render at most about 100 times
+                update_min_steps=max(1, total // 100),
+            )
+            self._progress.__enter__()
+
+    def step(self, count=1):
+        """advance the progress bar"""
+        if self._progress is not None:
+            self._progress.update(count)
+
+    def line(self, message, level=VERBOSE):
+        """
+        Print the message if the verbosity is ``level`` or more.
+
+        :param unicode message: message to print
+        :param int level: NORMAL or VERBOSE
+        """
+        if self.verbosity < level:
+            return
+        self._lines.append(message)
+        if (len(self._lines) >= FLUSH_LINES or
+                time.monotonic() - self._flushed >= FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            click.echo('\n'.join(self._lines), file=self.file)
+            self._lines = []
+        self._flushed = time.monotonic()
+
+    def finish(self, *summary):
+        """
+        Close the progress bar and print buffered lines and summary lines.
+
+        :param summary: summary lines that are printed for NORMAL verbosity
+                        or more
+        """
+        if self._progress is not None:
+            self._progress.__exit__(None, None, None)
+            self._progress = None
+        for message in summary:
+            self.line(message, NORMAL)
+        self.flush()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.timing
+    ~~~~~~~~~~~~~~~~~~
+
+    Phase-level timing instrumentation for ``--timings`` option.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# recorder of the current process, None while timing is disabled.
+_recorder = None
+
+
+class Recorder(object):
+    """Collect durations per phase and per file."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []
+        self.pools = []
+
+    def add(self, phase, filename, start, duration):
+        self.events.append((phase, filename, start - self.started, duration))
+
+    def extend(self, events, started):
+        """merge events that were recorded by another recorder
+
+        :param list events: events of the other recorder
+        :param float started: ``started`` of the other recorder, on the same
+                              clock of ``time.perf_counter``
+        """
+        offset = started - self.started
+        self.events.extend((phase, filename, start + offset, duration)
+                           for phase, filename, start, duration in events)
+
+    def add_pool(self, jobs, tasks, busy, wall):
+        """record a run of a process pool
+
+        :param int jobs: number of processes
+        :param int tasks: number of processed items
+        :param float busy: total seconds that the processes worked on items
+        :param float wall: seconds from the start to the end of the run
+        """
+        self.pools.append({
+            'jobs': jobs,
+            'tasks': tasks,
+            'busy': busy,
+            'wall': wall,
+            # ratio of the time that the processes were busy
+            'efficiency': busy / (jobs * wall) if wall else 0.0,
+        })
+
+    def phases(self):
+        """:return: {'PHASE': {'count': 0, 'total': 0.0}, ...}"""
+        result = {}
+        for phase, filename, start, duration in self.events:
+            r = result.setdefault(phase, {'count': 0, 'total': 0.0})
+            r['count'] += 1
+            r['total'] += duration
+        return result
+
+    def files(self):
+        """:return: {'FILENAME': {'PHASE': 0.0, ..., 'total': 0.0}, ...}"""
+        result = {}
+        for phase, filename, start, duration in self.events:
+            if filename is None:
+                continue
+            r = result.setdefault(filename, {'total': 0.0})
+            r[phase] = r.get(phase, 0.0) + duration
+            r['total'] += duration
+        return result
+
+    def wall(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'wall': self.wall(),
+            'peak_rss': peak_rss(),
+            'peak_rss_children': peak_rss(children=True),
+            'phases': self.phases(),
+            'files': self.files(),
+            'pools': self.pools,
+            'events': [
+                {'phase': phase, 'file': filename, 'start': start, 'duration': duration}
+                for phase, filename, start, duration in self.events
+            ],
+        }
+
+
+# ==================================
+# utility functions
+
+def enable():
+    """start recording timings in this process"""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable():
+    """stop recording timings and return the recorder"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def is_enabled():
+    return _recorder is not None
+
+
+def get_recorder():
+    return _recorder
+
+
+@contextmanager
+def phase(name, filename=None):
+    """measure a block as the ``name`` phase of ``filename``
+
+    :param str name: phase name such as 'parse' or 'write'
+    :param unicode filename: target file of the phase, if any
+    """
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, filename, start, time.perf_counter() - start)
+
+
+def peak_rss(children=False):
+    """peak resident set size of this process, or of the largest child process
+    that has been waited for. They are peaks at different times, and are not
+    summed up.
+
+    :param bool children: get the size of the largest child process
+    :return: size in bytes, or None if the platform does not provide it
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    usage = resource.getrusage(who).ru_maxrss
+    if sys.platform == 'darwin':  # bytes on macOS, kilobytes elsewhere
+        return usage
+    return usage * 1024
+
+
+def format_summary(recorder, top=10):
+    """
+    Format recorded timings as human readable lines.
+
+    :param recorder: Recorder object
+    :param int top: number of the slowest files to show
+    :return: list of lines
+    """
+    lines = ['Timings: {0:.3f}s wall'.format(recorder.wall())]
+    rss = peak_rss()
+    if rss is not None:
+        lines.append('  peak RSS: {0:.1f} MiB'.format(rss / 2 ** 20))
+    rss = peak_rss(children=True)
+    if rss:
+        lines.append('  peak RSS of largest child process: {0:.1f} MiB'.format(rss / 2 ** 20))
+    for name, r in sorted(recorder.phases().items(), key=lambda x: -x[1]['total']):
+        lines.append('  {0:<12} {1:9.3f}s  ({2} calls)'.format(name, r['total'], r['count']))
+    for pool in recorder.pools:
+        lines.append('  pool of {0} jobs: {1} tasks in {2:.3f}s wall, {3:.1%} busy'.format(
+            pool['jobs'], pool['tasks'], pool['wall'], pool['efficiency']))
+
+    files = sorted(recorder.files().items(), key=lambda x: -x[1]['total'])[:top]
+    if files:
+        lines.append('Slowest files:')
+    for filename, r in files:
+        detail = ', '.join('{0} {1:.3f}s'.format(k, v)
+                           for k, v in sorted(r.items()) if k != 'total')
+        lines.append('  {0:9.3f}s {1} ({2})'.format(r['total'], filename, detail))
+    return lines
+
+
+def dump_json(recorder, filename):
+    """write recorded timings as a json trace file
+
+    :param recorder: Recorder object
+    :param unicode filename: path to json file
+    :return: None
+    """
+    with open(filename, 'w') as f:
+        json.dump(recorder.as_dict(), f, indent=1)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.tree
+    ~~~~~~~~~~~~~~~~
+
+    Discovery of pot/po/mo files with a single ``os.scandir`` traversal.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+from collections import namedtuple
+
+from . import timing
+
+
+FileEntry = namedtuple('FileEntry', 'path size mtime')
+
+# compressed files such as 'index.po.gz' are collected as '.po' files
+COMPRESSIONS = ('.gz', '.xz')
+
+
+# ==================================
+# utility functions
+
+def split_ext(name):
+    """
+    Split a file name into the base name, the extension and the compression.
+
+    :param unicode name: file name or path
+    :return: ('index', '.po', '.gz') for 'index.po.gz', and ('index', '.po', '')
+             for 'index.po'
+    :rtype: tuple
+    """
+    base, ext = os.path.splitext(name)
+    if ext in COMPRESSIONS:
+        base, inner = os.path.splitext(base)
+        return base, inner, ext
+    return base, ext, ''
+
+
+def scan(top, extensions):
+    """
+    Collect files with the extensions under the directory in one traversal.
+
+    :param unicode top: path for directory to walk
+    :param tuple extensions: extensions to collect such as ('.po', '.mo')
+    :return: {EXT: {BASENAME: FileEntry, ...}, ...}. BASENAME is a relative
+             path from ``top`` without the extension. Compressed files are
+             collected with the extension without the compression, and an
+             uncompressed file is preferred to compressed one of the same
+             name. Empty dicts are returned if ``top`` does not exist.
+    :rtype: dict
+    """
+    result = {ext: {} for ext in extensions}
+    with timing.phase('walk'):
+        _scan(top, '', result)
+    return result
+
+
+def _scan(dirpath, prefix, result):
+    try:
+        it = os.scandir(dirpath)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    subdirs = []
+    with it:
+        for entry in it:
+            # symlinked directories are not followed, they may be cyclic
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+                continue
+            base, ext, compression = split_ext(entry.name)
+            files = result.get(ext)
+            if files is None or (compression and prefix + base in files):
+                continue
+            st = entry.stat()
+            files[prefix + base] = FileEntry(entry.path, st.st_size, st.st_mtime)
+    for entry in subdirs:
+        _scan(entry.path, prefix + entry.name + os.sep, result)
+
+
+def get_lang_dirs(path):
+    """
+    Find language directories under the locale directory.
+
+    :param unicode path: path for locale directory
+    :return: sorted names of language directories
+    :rtype: tuple
+    """
+    try:
+        it = os.scandir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return ()
+    with it:
+        dirs = [entry.name for entry in it
+                if 'a' <= entry.name[:1] <= 'z' and entry.is_dir() and
+                not entry.name.endswith('pot')]
+    return tuple(sorted(dirs))
+
+
+def scan_locale_dir(locale_dir, languages, extensions=('.po',)):
+    """
+    Collect files of the languages under the locale directory.
+
+    :param unicode locale_dir: path for locale directory
+    :param tuple languages: languages to collect
+    :param tuple extensions: extensions to collect such as ('.po', '.mo')
+    :return: {LANG: {EXT: {BASENAME: FileEntry, ...}, ...}, ...}. BASENAME
+             is a relative path from the language directory without the
+             extension, such as 'LC_MESSAGES/index'.
+    :rtype: dict
+    """
+    return {lang: scan(os.path.join(locale_dir, lang), extensions)
+            for lang in languages}
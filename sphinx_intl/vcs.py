@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.vcs
+    ~~~~~~~~~~~~~~~
+
+    Change detection with the local git repository.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+import subprocess
+
+from . import timing
+
+
+class Changes(object):
+    """
+    Files changed since a revision. A file is changed if git reports a
+    difference between the revision and the work tree, or if the file is not
+    tracked by git, such as pot files in an ignored build directory.
+    """
+
+    def __init__(self, top, changed, tracked):
+        self.top = top
+        self.changed = changed
+        self.tracked = tracked
+
+    def __contains__(self, path):
+        relpath = os.path.relpath(os.path.realpath(path), self.top)
+        relpath = relpath.replace(os.sep, '/')
+        return relpath in self.changed or relpath not in self.tracked
+
+
+def _git(args, cwd):
+    return subprocess.run(['git'] + args, cwd=cwd, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, check=True).stdout
+
+
+def _split(output):
+    return set(os.fsdecode(p) for p in output.split(b'\0') if p)
+
+
+def changed_since(rev, cwd='.'):
+    """
+    Collect files changed since the revision with ``git diff --name-only``,
+    that doesn't access the network.
+
+    :param unicode rev: git revision such as ``HEAD~1`` or ``origin/main``
+    :param unicode cwd: directory in the git work tree
+    :return: Changes, or None if cwd is not in a git work tree or git is not
+             installed
+    :raise ValueError: the revision is not found
+    """
+    with timing.phase('git'):
+        try:
+            top = _git(['rev-parse', '--show-toplevel'], cwd)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        top = os.path.realpath(os.fsdecode(top.strip()))
+
+        try:
+            changed = _git(['diff', '--name-only', '--no-renames', '-z', rev, '--'], top)
+        except subprocess.CalledProcessError as e:
+            raise ValueError('git diff failed for %r: %s' % (
+                rev, e.stderr.decode('utf-8', 'replace').strip()))
+        tracked = _git(['ls-files', '-z'], top)
+
+    return Changes(top, _split(changed), _split(tracked))
+
+
+def read_files(rev, paths, cwd='.'):
+    """
+    Read contents of files at the revision with one ``git cat-file --batch``.
+
+    :param unicode rev: git revision such as ``HEAD~1`` or ``origin/main``
+    :param list paths: paths of files in the work tree, relative to cwd
+    :param unicode cwd: directory in the git work tree
+    :return: {path: content}. The content is None if the file doesn't exist
+             at the revision.
+    :rtype: dict
+    :raise ValueError: cwd is not in a git work tree, or git is not installed
+    """
+    with timing.phase('git'):
+        try:
+            top = _git(['rev-parse', '--show-toplevel'], cwd)
+        except (OSError, subprocess.CalledProcessError):
+            raise ValueError('git work tree is not found')
+        top = os.path.realpath(os.fsdecode(top.strip()))
+
+        specs = []
+        for path in paths:
+            relpath = os.path.relpath(os.path.realpath(os.path.join(cwd, path)), top)
+            specs.append('{0}:{1}\n'.format(rev, relpath.replace(os.sep, '/')))
+        # headers without object names, that are specs for missing files and
+        # may have spaces
+        output = subprocess.run(
+            ['git', 'cat-file', '--batch=%(objecttype) %(objectsize)'], cwd=top,
+            input=os.fsencode(''.join(specs)),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+
+    result = {}
+    pos = 0
+    for path in paths:
+        end = output.index(b'\n', pos)
+        header = output[pos:end].split(b' ')
+        pos = end + 1
+        result[path] = None
+        if len(header) != 2 or not header[1].isdigit():  # '<spec> missing'
+            continue
+        size = int(header[1])
+        if header[0] == b'blob':
+            result[path] = output[pos:pos + size]
+        pos += size + 1
+    return result
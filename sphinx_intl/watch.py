@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinx_intl.watch
+    ~~~~~~~~~~~~~~~~~
+
+    Keep po and mo files up to date while pot and po files are edited.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import threading
+import time
+
+from . import basic
+from . import tree
+
+
+class Watcher(object):
+    """
+    Watch pot and po files of locale directories, and update po files of
+    changed pot files and build mo files of changed po files.
+
+    Changes are found by comparing ``os.scandir`` snapshots. If watchdog_ is
+    installed, a snapshot is taken when the file system notifies a change,
+    otherwise snapshots are polled.
+
+    .. _watchdog: https://pypi.org/project/watchdog/
+
+    :param list targets: [(locale_dir, pot_dir, languages), ...]
+    :param unicode output_dir: path for mo output directory, default is locale_dir
+    :param number line_width: maximum line wdith of po files
+    :param int jobs: number of processes, 0 for number of CPUs
+    :param options: keyword arguments for basic.update_po()
+    """
+
+    def __init__(self, targets, output_dir=None, line_width=76, jobs=1, **options):
+        self.targets = targets
+        self.output_dir = output_dir
+        self.line_width = line_width
+        self.jobs = jobs
+        self.options = options
+        self.snapshot = self.take_snapshot()
+        self._event = threading.Event()
+        self._observer = None
+
+    def take_snapshot(self):
+        """
+        :return: {path: (mtime, size)} of pot and po files
+        :rtype: dict
+        """
+        snapshot = {}
+        for locale_dir, pot_dir, languages in self.targets:
+            entries = list(tree.scan(pot_dir, ('.pot',))['.pot'].values())
+            for files in tree.scan_locale_dir(locale_dir, languages).values():
+                entries.extend(files['.po'].values())
+            for entry in entries:
+                snapshot[entry.path] = (entry.mtime, entry.size)
+        return snapshot
+
+    def changes(self):
+        """
+        Take a new snapshot and compare it with the previous one.
+
+        :return: paths of added, modified and removed files
+        :rtype: set
+        """
+        old, new = self.snapshot, self.take_snapshot()
+        self.snapshot = new
+        return set(path for path in set(old) | set(new) if old.get(path) != new.get(path))
+
+    def process(self, changed):
+        """
+        Update po files of the changed pot files and build mo files of po
+        files that are newer than the mo files, including the updated ones.
+
+        :param set changed: changed paths from changes()
+        :return: number of processed files
+        :rtype: int
+        """
+        pots = set(path for path in changed if tree.split_ext(path)[1] == '.pot')
+        update_tasks = []
+        build_tasks = []
+        for locale_dir, pot_dir, languages in self.targets:
+            if pots:
+                update_tasks.extend(
+                    basic.update_tasks(locale_dir, pot_dir, languages, changed=pots))
+        basic.run_update(update_tasks, self.line_width, self.jobs, **self.options)
+        for locale_dir, pot_dir, languages in self.targets:
+            build_tasks.extend(
+                basic.build_tasks(locale_dir, self.output_dir or locale_dir, languages))
+        basic.run_build(build_tasks, self.jobs)
+        return len(update_tasks) + len(build_tasks)
+
+    def start_observer(self):
+        """
+        Start watchdog observer if it is installed.
+
+        :return: True if the observer is started
+        :rtype: bool
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        event = self._event
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, e):
+                event.set()
+
+        self._observer = Observer()
+        paths = set()
+        for locale_dir, pot_dir, languages in self.targets:
+            paths.update([locale_dir, pot_dir])
+        for path in sorted(paths):
+            self._observer.schedule(Handler(), path, recursive=True)
+        self._observer.start()
+        return True
+
+    def stop_observer(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def wait(self, interval):
+        """wait until the file system notifies a change, or for interval to poll"""
+        if self._observer is None:
+            time.sleep(interval)
+            return
+        # wait in slices to keep KeyboardInterrupt working
+        while not self._event.wait(1.0):
+            pass
+        self._event.clear()
+
+    def run(self, interval=1.0, debounce=0.3, polling=False, cycles=None):
+        """
+        Process changes until interrupted. Changes are collected until files
+        are not changed for ``debounce`` seconds, to process a burst of
+        changes such as a ``make gettext`` run at once.
+
+        :param float interval: seconds between snapshots without watchdog
+        :param float debounce: seconds without changes before processing
+        :param bool polling: poll snapshots even if watchdog is installed
+        :param int cycles: stop after processing changes for the times, or None
+        :return: None
+        """
+        if not polling:
+            self.start_observer()
+        try:
+            while cycles is None or cycles > 0:
+                changed = self.changes()
+                if not changed:
+                    self.wait(interval)
+                    continue
+                while True:
+                    time.sleep(debounce)
+                    more = self.changes()
+                    if not more:
+                        break
+                    changed |= more
+                self.process(changed)
+                if cycles is not None:
+                    cycles -= 1
+        finally:
+            self.stop_observer()
@@ -8,9 +8,15 @@
     :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
     :license: BSD, see LICENSE for details.
 """
+import gettext
+import io
+import json
+import os
+
 import mock
+import pytest
 
-from sphinx_intl import basic
+from sphinx_intl import basic, bundle, catalog
 
 
 def test_update_simple(temp):
@@ -74,3 +80,375 @@ def test_build_mo_on_another_location(load_po, write_mo, temp):
     assert load_po.call_args[0][0].endswith('README.po')
     assert write_mo.call_args[0][0].startswith('mo_dir')
     assert write_mo.call_args[0][0].endswith('README.mo')
+
+
+def test_update_build_stat_in_parallel(temp):
+    r1 = basic.update('locale', '_build/locale', ('ja', 'de', 'it'), jobs=2)
+    assert r1 == {'create': 3, 'update': 0, 'notchanged': 0}
+    basic.build('locale', 'locale', ('ja', 'de', 'it'), jobs=2)
+    assert (temp / 'locale/de/LC_MESSAGES/README.mo').exists()
+    r2 = basic.stat('locale', ('ja', 'de', 'it'), jobs=2)
+    assert r2 == basic.stat('locale', ('ja', 'de', 'it'))
+
+
+def test_build_tasks_skip_up_to_date(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    assert [t.mo_file for t in basic.build_tasks('locale', 'locale', ('ja',))] == [
+        os.path.join('locale', 'ja', 'LC_MESSAGES', 'README.mo')]
+    basic.build('locale', 'locale', ('ja',))
+    assert basic.build_tasks('locale', 'locale', ('ja',)) == []
+
+
+def test_update_prune_obsolete(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('_build/locale/README.pot', 'r') as f:
+        d = f.read().replace('test1', 'test2')
+    with open('_build/locale/README.pot', 'w') as f:
+        f.write(d)
+
+    r1 = basic.update('locale', '_build/locale', ('ja',), max_obsolete_age=10)
+    assert r1 == {'create': 0, 'update': 1, 'notchanged': 0}
+    with open('locale/ja/LC_MESSAGES/README.po') as f:
+        assert '# sphinx-intl: obsolete since' in f.read()
+
+    r2 = basic.update('locale', '_build/locale', ('ja',), max_obsolete_age=10)
+    assert r2 == {'create': 0, 'update': 0, 'notchanged': 1}
+
+    r3 = basic.update('locale', '_build/locale', ('ja',),
+                      prune_obsolete=True, obsolete_archive='archive')
+    assert r3 == {'create': 0, 'update': 1, 'notchanged': 0}
+    with open('locale/ja/LC_MESSAGES/README.po') as f:
+        assert '#~' not in f.read()
+    with open('archive/ja/LC_MESSAGES/README.po') as f:
+        assert 'msgid "test1"' in f.read()
+
+
+def test_clean(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('_build/locale/other.pot', 'w') as f:
+        f.write('msgid "other"\nmsgstr ""\n')
+    basic.update('locale', '_build/locale', ('ja',))
+    basic.build('locale', 'locale', ('ja',))
+    os.remove('_build/locale/other.pot')
+
+    orphans = [os.path.join('locale', 'ja', 'LC_MESSAGES', 'other.po'),
+               os.path.join('locale', 'ja', 'LC_MESSAGES', 'other.mo')]
+    assert basic.clean('locale', '_build/locale', ('ja',), dry_run=True) == orphans
+    assert os.path.exists(orphans[0])
+
+    assert basic.clean('locale', '_build/locale', ('ja',)) == orphans
+    assert not any(os.path.exists(p) for p in orphans)
+    assert os.path.exists('locale/ja/LC_MESSAGES/README.po')
+    assert os.path.exists('locale/ja/LC_MESSAGES/README.mo')
+
+
+def test_clean_without_pot_files(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    os.makedirs('empty')
+    assert basic.clean('locale', 'empty', ('ja',)) == []
+
+
+def test_sync(temp):
+    r1 = basic.sync('locale', '_build/locale', ('ja', 'de'))
+    assert r1['update'] == {'create': 2, 'update': 0, 'notchanged': 0}
+    assert r1['build'] == 2
+    assert r1['stat'] == basic.stat('locale', ('ja', 'de'))
+    assert basic.build_tasks('locale', 'locale', ('ja', 'de')) == []
+
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    r2 = basic.sync('locale', '_build/locale', ('ja', 'de'), jobs=2)
+    assert r2['update'] == {'create': 0, 'update': 2, 'notchanged': 0}
+    assert r2['build'] == 2
+    assert r2['stat']['locale/ja/LC_MESSAGES/README.po']['untranslated'] == 2
+
+    r3 = basic.sync('locale', '_build/locale', ('ja', 'de'))
+    assert r3['update'] == {'create': 0, 'update': 0, 'notchanged': 2}
+    assert r3['build'] == 0
+
+
+@mock.patch('sphinx_intl.catalog.load_po', wraps=basic.c.load_po)
+def test_sync_parses_each_file_once(load_po, temp):
+    basic.update('locale', '_build/locale', ('ja', 'de'))
+    with open('locale/ja/extra.po', 'w') as f:
+        f.write('msgid "extra"\nmsgstr "EXTRA"\n')
+    load_po.reset_mock()
+
+    r = basic.sync('locale', '_build/locale', ('ja', 'de', 'it'))
+    assert r['update'] == {'create': 1, 'update': 0, 'notchanged': 2}
+    assert r['stat']['locale/ja/extra.po'] == {'translated': 1, 'fuzzy': 0, 'untranslated': 0}
+    assert os.path.exists('locale/ja/extra.mo')
+    parsed = [call[0][0] for call in load_po.call_args_list]
+    assert sorted(parsed) == sorted(set(parsed))
+    assert len(parsed) == 4
+
+
+def test_shards(temp):
+    for i in range(10):
+        with open('_build/locale/doc%d.pot' % i, 'w') as f:
+            f.write('msgid "doc%d"\nmsgstr ""\n' % i)
+    languages = ('ja', 'de')
+    all_tasks = basic.update_tasks('locale', '_build/locale', languages)
+    shards = [basic.update_tasks('locale', '_build/locale', languages, (k, 3))
+              for k in (1, 2, 3)]
+    assert sorted(sum(shards, [])) == sorted(all_tasks)
+    assert shards == [basic.update_tasks('locale', '_build/locale', languages, (k, 3))
+                      for k in (1, 2, 3)]
+    # all languages of a resource are in the same shard
+    for tasks in shards:
+        assert len(tasks) % len(languages) == 0
+
+    results = [basic.update('locale', '_build/locale', languages, shard=(k, 3))
+               for k in (1, 2, 3)]
+    assert basic.merge_results(results) == {'create': 22, 'update': 0, 'notchanged': 0}
+    stats = [basic.stat('locale', languages, shard=(k, 3)) for k in (1, 2, 3)]
+    assert basic.merge_results(stats) == basic.stat('locale', languages)
+    builds = [basic.build('locale', 'locale', languages, shard=(k, 3)) for k in (1, 2, 3)]
+    assert len(basic.merge_results(builds)) == 22
+
+
+def test_update_compact_locations(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('locale/ja/LC_MESSAGES/README.po') as f:
+        assert 'README.rst:2\n' in f.read()
+
+    r1 = basic.update('locale', '_build/locale', ('ja',), add_location='file')
+    assert r1 == {'create': 0, 'update': 1, 'notchanged': 0}
+    with open('locale/ja/LC_MESSAGES/README.po') as f:
+        assert 'README.rst\n' in f.read()
+    r2 = basic.update('locale', '_build/locale', ('ja',), add_location='file')
+    assert r2 == {'create': 0, 'update': 0, 'notchanged': 1}
+
+    r3 = basic.sync('locale', '_build/locale', ('ja', 'de'), add_location='never')
+    assert r3['update'] == {'create': 1, 'update': 1, 'notchanged': 0}
+    for lang in ('ja', 'de'):
+        with open('locale/%s/LC_MESSAGES/README.po' % lang) as f:
+            assert '#:' not in f.read()
+    with open('_build/locale/README.pot') as f:
+        assert '#:' in f.read()
+
+
+def test_process_events(temp):
+    tasks = basic.update_tasks('locale', '_build/locale', ('ja', 'de'))
+    events = basic.process_update(tasks)
+    event = next(events)
+    assert isinstance(event, basic.UpdateEvent)
+    assert (event.status, event.po_file) == (
+        'create', os.path.join('locale', 'ja', 'LC_MESSAGES', 'README.po'))
+    assert event.duration >= 0
+    assert [e.status for e in events] == ['create']
+
+    events = list(basic.process_build(basic.build_tasks('locale', 'locale', ('ja',))))
+    assert [e.mo_file for e in events] == [
+        os.path.join('locale', 'ja', 'LC_MESSAGES', 'README.mo')]
+    assert basic.format_event(events[0]) == 'Build: ' + events[0].mo_file
+
+    events = list(basic.process_stat(basic.stat_tasks('locale', ('ja',)), jobs=2))
+    assert [(e.translated, e.fuzzy, e.untranslated) for e in events] == [(0, 0, 1)]
+
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    tasks = basic.sync_tasks('locale', '_build/locale', ('ja',))
+    assert [type(e).__name__ for e in basic.process_sync(tasks)] == [
+        'UpdateEvent', 'BuildEvent', 'StatEvent']
+
+
+def test_compressed_tree(temp):
+    import gzip
+    with open('_build/locale/README.pot', 'rb') as f:
+        data = f.read()
+    with gzip.open('_build/locale/README.pot.gz', 'wb') as f:
+        f.write(data)
+    os.remove('_build/locale/README.pot')
+
+    r1 = basic.update('locale', '_build/locale', ('ja', 'de'), compression='xz')
+    assert r1 == {'create': 2, 'update': 0, 'notchanged': 0}
+    po_file = os.path.join('locale', 'ja', 'LC_MESSAGES', 'README.po.xz')
+    assert os.path.exists(po_file)
+
+    r2 = basic.update('locale', '_build/locale', ('ja', 'de'))
+    assert r2 == {'create': 0, 'update': 0, 'notchanged': 2}
+    assert basic.build('locale', 'locale', ('ja',)) == [
+        'locale/ja/LC_MESSAGES/README.mo']
+    assert basic.stat('locale', ('ja',)) == {
+        'locale/ja/LC_MESSAGES/README.po.xz': {
+            'translated': 0, 'fuzzy': 0, 'untranslated': 1}}
+
+
+def test_init_language(temp):
+    from sphinx_intl import catalog
+    # a pot file written by sphinx-intl is not parsed
+    catalog.dump_po('_build/locale/README.pot', catalog.load_po('_build/locale/README.pot'))
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('locale/ja/LC_MESSAGES/README.po', 'rb') as f:
+        po = f.read()
+
+    os.remove('locale/ja/LC_MESSAGES/README.po')
+    with mock.patch('sphinx_intl.catalog.load_po') as load_po:
+        r1 = basic.init_language('locale', '_build/locale', ('ja',))
+    assert r1 == {'create': 1, 'update': 0, 'notchanged': 0}
+    assert load_po.call_count == 0
+    with open('locale/ja/LC_MESSAGES/README.po', 'rb') as f:
+        assert f.read() == po
+
+    # existing po files are not changed
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    r2 = basic.init_language('locale', '_build/locale', ('ja',))
+    assert r2 == {'create': 0, 'update': 0, 'notchanged': 0}
+
+
+def test_tasks_by_size(temp):
+    with open('_build/locale/large.pot', 'w') as f:
+        f.write('msgid "large"\nmsgstr ""\n' * 100)
+    tasks = basic.update_tasks('locale', '_build/locale', ('ja',))
+    assert [t.basename for t in tasks] == ['README', 'large']
+    assert tasks[1].size == os.path.getsize('_build/locale/large.pot')
+    assert [t.basename for t in basic.by_size(tasks, jobs=2)] == ['large', 'README']
+    assert basic.by_size(tasks, jobs=1) == tasks
+
+    r = basic.update('locale', '_build/locale', ('ja',), jobs=2, memory_budget=1)
+    assert r == {'create': 2, 'update': 0, 'notchanged': 0}
+
+
+def test_use_gettext():
+    with mock.patch('sphinx_intl.catalog.has_gettext', return_value=True):
+        assert basic.use_gettext('gettext', 'a.po', 'a.pot')
+        assert not basic.use_gettext('babel', 'a.po', 'a.pot')
+        assert not basic.use_gettext('gettext', 'a.po', 'a.pot', add_location='never')
+        assert not basic.use_gettext('gettext', 'a.po', 'a.pot', prune_obsolete=True)
+
+
+@mock.patch('sphinx_intl.catalog.has_gettext', return_value=False)
+def test_gettext_backend_falls_back_to_babel(has_gettext, temp):
+    r1 = basic.update('locale', '_build/locale', ('ja',), backend='gettext')
+    assert r1 == {'create': 1, 'update': 0, 'notchanged': 0}
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    r2 = basic.update('locale', '_build/locale', ('ja',), backend='gettext')
+    assert r2 == {'create': 0, 'update': 1, 'notchanged': 0}
+    basic.build('locale', 'locale', ('ja',), backend='gettext')
+    assert os.path.exists('locale/ja/LC_MESSAGES/README.mo')
+
+
+@pytest.mark.skipif(not catalog.has_gettext(), reason='GNU gettext is not installed')
+def test_gettext_backend_is_same_as_babel(temp):
+    for locale_dir in ('babel', 'gettext'):
+        basic.update(locale_dir, '_build/locale', ('ja',))
+        po_file = os.path.join(locale_dir, 'ja', 'LC_MESSAGES', 'README.po')
+        cat = catalog.load_po(po_file)
+        for message in cat:
+            if message.id:
+                message.string = 'translated'
+        catalog.dump_po(po_file, cat)
+
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    results = {}
+    for backend in ('babel', 'gettext'):
+        results[backend] = basic.update(backend, '_build/locale', ('ja',), backend=backend)
+        basic.build(backend, backend, ('ja',), backend=backend)
+    assert results['babel'] == results['gettext'] == {
+        'create': 0, 'update': 1, 'notchanged': 0}
+    r = basic.update('gettext', '_build/locale', ('ja',), backend='gettext')
+    assert r == {'create': 0, 'update': 0, 'notchanged': 1}
+
+    def messages(locale_dir):
+        cat = catalog.load_po(os.path.join(locale_dir, 'ja', 'LC_MESSAGES', 'README.po'))
+        return sorted((m.id, m.string, m.fuzzy) for m in cat if m.id)
+
+    def translations(locale_dir):
+        with open(os.path.join(locale_dir, 'ja', 'LC_MESSAGES', 'README.mo'), 'rb') as f:
+            return gettext.GNUTranslations(f)._catalog
+
+    assert messages('babel') == messages('gettext')
+    assert translations('babel') == translations('gettext')
+
+
+def test_diff(temp):
+    basic.update('locale', '_build/locale', ('ja', 'de'))
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    basic.update('new', '_build/locale', ('ja',))
+    basic.update('new', '_build/locale', ('it',))
+    assert basic.diff('locale', 'locale', ('ja', 'de')) == {}
+
+    cat = catalog.load_po('new/ja/LC_MESSAGES/README.po')
+    cat['test1'].string = 'translated'
+    catalog.dump_po('new/ja/LC_MESSAGES/README.po', cat)
+    r = basic.diff('locale', 'new', ('ja', 'de', 'it'), jobs=2)
+    assert sorted(r) == ['locale/de/LC_MESSAGES/README.po', 'new/it/LC_MESSAGES/README.po',
+                         'new/ja/LC_MESSAGES/README.po']
+    assert r['new/ja/LC_MESSAGES/README.po']['added'] == [
+        {'msgid': 'test1', 'msgctxt': None, 'old': None, 'new': 'translated'}]
+    assert len(r['new/it/LC_MESSAGES/README.po']['added']) == 2
+    assert len(r['locale/de/LC_MESSAGES/README.po']['removed']) == 1
+
+
+def test_export_and_import(temp):
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "apple"\nmsgid_plural "apples"\nmsgstr[0] ""\nmsgstr[1] ""\n')
+    basic.update('locale', '_build/locale', ('ja', 'de'))
+    buf = io.StringIO()
+    assert basic.export('locale', ('ja', 'de'), buf) == 4
+    items = [json.loads(line) for line in buf.getvalue().splitlines()]
+    assert [(r['file'], r['msgid']) for r in items] == [
+        ('locale/ja/LC_MESSAGES/README.po', 'sphinx-intl: translation support utility for Sphinx'),
+        ('locale/ja/LC_MESSAGES/README.po', 'apple'),
+        ('locale/de/LC_MESSAGES/README.po', 'sphinx-intl: translation support utility for Sphinx'),
+        ('locale/de/LC_MESSAGES/README.po', 'apple'),
+    ]
+
+    items[0]['msgstr'] = 'translated'
+    items[0]['flags'] = ['fuzzy']
+    items[1]['msgstr'] = ['apple']
+    items.append(dict(items[1], msgid='missing'))
+    items.append(dict(items[1], msgstr='not plural'))
+    buf = io.StringIO(''.join(json.dumps(r) + '\n' for r in items))
+    with mock.patch('sphinx_intl.catalog.dump_po', wraps=catalog.dump_po) as dump_po:
+        r = basic.import_records(buf)
+    assert r == {'update': 1, 'notchanged': 1, 'messages': 2, 'unmatched': 2}
+    assert dump_po.call_count == 1
+
+    cat = catalog.load_po('locale/ja/LC_MESSAGES/README.po')
+    message = cat['sphinx-intl: translation support utility for Sphinx']
+    assert message.string == 'translated'
+    assert message.fuzzy
+    assert cat['apple'].string == ('apple', '')
+
+
+def test_build_bundle(temp):
+    with open('_build/locale/other.pot', 'w') as f:
+        f.write('msgid "other"\nmsgstr ""\n')
+    basic.update('locale', '_build/locale', ('ja', 'de'))
+    cat = catalog.load_po('locale/ja/LC_MESSAGES/other.po')
+    cat['other'].string = 'translated'
+    catalog.dump_po('locale/ja/LC_MESSAGES/other.po', cat)
+
+    assert basic.build('locale', 'out', ('ja', 'de'), jobs=2, bundle=True) == [
+        'out/ja.zip', 'out/de.zip']
+    assert not os.path.exists('out/ja/LC_MESSAGES/other.mo')
+    with bundle.Bundle('out/ja.zip') as b:
+        assert b.names() == ['LC_MESSAGES/README.mo', 'LC_MESSAGES/other.mo']
+        assert b.translation('other').gettext('other') == 'translated'
+    assert basic.bundle_tasks('locale', 'out', ('ja', 'de')) == []
+
+    # only the changed po file is compiled
+    os.utime('out/ja.zip', (1, 1))
+    os.utime('locale/ja/LC_MESSAGES/README.po', (0, 0))
+    tasks = basic.bundle_tasks('locale', 'out', ('ja', 'de'))
+    assert [[e.stale for e in task.entries] for task in tasks] == [[False, True]]
+    with mock.patch('sphinx_intl.catalog.load_po', wraps=catalog.load_po) as load_po:
+        assert basic.run_bundle(tasks) == ['out/ja.zip']
+    assert load_po.call_count == 1
+    with bundle.Bundle('out/ja.zip') as b:
+        assert b.names() == ['LC_MESSAGES/README.mo', 'LC_MESSAGES/other.mo']
+        assert b.translation('other').gettext('other') == 'translated'
+
+    os.remove('locale/ja/LC_MESSAGES/other.po')
+    assert basic.build('locale', 'out', ('ja', 'de'), bundle=True) == ['out/ja.zip']
+    with bundle.Bundle('out/ja.zip') as b:
+        assert b.names() == ['LC_MESSAGES/README.mo']
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+    test_bundle
+    ~~~~~~~~~~~
+
+    Test bundles of mo files.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import gettext
+import zipfile
+
+import pytest
+from babel.messages import Catalog
+
+from sphinx_intl import bundle, catalog
+
+
+def mo_data(string):
+    cat = Catalog(locale='ja')
+    cat.add('Hello', string)
+    cat.add(('apple', 'apples'), ('りんご',))
+    return catalog.compile_mo(cat)
+
+
+def test_write_and_read_bundle(temp):
+    entries = [('LC_MESSAGES/index.mo', mo_data(u'こんにちは')),
+               ('LC_MESSAGES/sub/page.mo', mo_data(u'やあ'))]
+    assert bundle.write_bundle('out/ja.zip', entries) == 2
+    with open('out/ja.zip', 'rb') as f:
+        data = f.read()
+    bundle.write_bundle('out/ja.zip', entries)
+    with open('out/ja.zip', 'rb') as f:
+        assert f.read() == data  # reproducible
+
+    with bundle.Bundle('out/ja.zip') as b:
+        assert b.names() == ['LC_MESSAGES/index.mo', 'LC_MESSAGES/sub/page.mo']
+        assert b.read('LC_MESSAGES/index.mo') == entries[0][1]
+        translations = b.translation('sub/page')
+        assert isinstance(translations, gettext.GNUTranslations)
+        assert translations.gettext('Hello') == u'やあ'
+        assert translations.ngettext('apple', 'apples', 2) == u'りんご'
+        assert b.translation('sub/page') is translations
+        assert type(b.translation('missing', fallback=True)) is gettext.NullTranslations
+        with pytest.raises(FileNotFoundError):
+            b.translation('missing')
+
+
+def test_compressed_bundle(temp):
+    with zipfile.ZipFile('ja.zip', 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('LC_MESSAGES/index.mo', mo_data(u'こんにちは'))
+    with pytest.raises(ValueError):
+        bundle.Bundle('ja.zip')
@@ -8,7 +8,17 @@
     :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
     :license: BSD, see LICENSE for details.
 """
-from babel.messages import Catalog, Message
+import datetime
+import io
+import os
+import random
+from pathlib import Path
+
+import mock
+import pytest
+from babel.messages import Catalog, Message, pofile
+
+GOLDEN_DIR = Path(__file__).parent / 'golden'
 
 
 def test_write_and_read_po_file_with_non_ascii_string(temp):
@@ -41,3 +51,349 @@ def test_fuzzy_flag_on_catalog_update():
     catalog.update_with_fuzzy(cat, cat_src)
     assert msg.id not in cat
     assert cat[msg_src.id].fuzzy
+
+
+@pytest.mark.parametrize('line_width', [76, 40, 10, 0, -1])
+@pytest.mark.parametrize('po_file', sorted(GOLDEN_DIR.glob('*.po*')), ids=lambda p: p.name)
+def test_write_po_is_identical_to_babel(po_file, line_width):
+    from sphinx_intl import catalog
+
+    cat = catalog.load_po(str(po_file))
+
+    expected = io.BytesIO()
+    pofile.write_po(expected, cat, line_width)
+    actual = io.BytesIO()
+    catalog.write_po(actual, cat, line_width)
+
+    assert actual.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize('width', [76, 20, 7, 0])
+def test_normalize_is_identical_to_babel(width):
+    from sphinx_intl import catalog
+
+    rnd = random.Random(width)
+    alphabet = ['word', 'hyphen-ated', '--', '-', "it's-a", '!--', ' ', '  ', '\t', '"', '\\',
+                '\n', '\r', '　', ' ', 'é', 'x' * 30]
+    for _ in range(500):
+        string = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 30)))
+        for prefix in ('', '#~ '):
+            expected = pofile.normalize(string, prefix=prefix, width=width)
+            assert catalog._normalize(string, prefix, width) == expected
+
+
+def _catalog_with_obsolete():
+    cat = Catalog(locale='ja', domain='domain', fuzzy=False)
+    cat['live'] = Message('live', 'ライブ')
+    cat.obsolete['old'] = Message('old', '古い')
+    cat.obsolete['older'] = Message(
+        'older', 'もっと古い', user_comments=['sphinx-intl: obsolete since 2019-01-01'])
+    cat.obsolete['live'] = Message('live', 'ライブ')
+    return cat
+
+
+def test_prune_obsolete_all():
+    from sphinx_intl import catalog
+
+    cat = _catalog_with_obsolete()
+    removed, stamped = catalog.prune_obsolete(cat)
+    assert [m.id for m in removed] == ['old', 'older', 'live']
+    assert stamped == 0
+    assert not cat.obsolete
+    assert removed[1].user_comments == []
+
+
+def test_prune_obsolete_by_age():
+    from sphinx_intl import catalog
+
+    cat = _catalog_with_obsolete()
+    removed, stamped = catalog.prune_obsolete(cat, 30, today=datetime.date(2019, 1, 20))
+    assert [m.id for m in removed] == ['live']
+    assert stamped == 1
+    assert cat.obsolete['old'].user_comments == ['sphinx-intl: obsolete since 2019-01-20']
+
+    removed, stamped = catalog.prune_obsolete(cat, 30, today=datetime.date(2019, 2, 5))
+    assert [m.id for m in removed] == ['older']
+    assert stamped == 0
+    assert list(cat.obsolete) == ['old']
+
+
+UUID1 = '0123456789abcdef0123456789abcdef'
+UUID2 = 'fedcba9876543210fedcba9876543210'
+
+
+def _catalog_with_locations():
+    cat = Catalog(locale='ja')
+    cat.add('msg', locations=[('b.rst', 3), ('a.rst', 10), ('a.rst', 2),
+                              (UUID1, None), (UUID2, None)])
+    return cat
+
+
+@pytest.mark.parametrize('options, expected', [
+    ({}, [(UUID1, None), ('a.rst', 2), ('a.rst', 10), ('b.rst', 3), (UUID2, None)]),
+    ({'add_location': 'file'}, [(UUID1, None), ('a.rst', None), ('b.rst', None),
+                                (UUID2, None)]),
+    ({'add_location': 'never'}, [(UUID1, None), (UUID2, None)]),
+    ({'max_locations': 1, 'uuid': False}, [('a.rst', 2)]),
+    ({'add_location': 'never', 'uuid': False}, []),
+])
+def test_compact_locations(options, expected):
+    from sphinx_intl import catalog
+
+    cat = _catalog_with_locations()
+    assert catalog.compact_locations(cat, **options) == 1
+    assert cat['msg'].locations == expected
+
+    # compacted locations are kept through write and read
+    buf = io.BytesIO()
+    catalog.write_po(buf, cat)
+    buf.seek(0)
+    assert pofile.read_po(buf)['msg'].locations == expected
+    assert catalog.compact_locations(cat, **options) == 0
+
+
+def test_archive_messages(temp):
+    from sphinx_intl import catalog
+
+    archive_file = temp / 'archive' / 'domain.po'
+    catalog.archive_messages(archive_file, [Message('old', 'v1')], 'ja')
+    catalog.archive_messages(archive_file, [Message('old', 'v2'), Message('a', 'b')], 'ja')
+    cat = catalog.load_po(archive_file)
+    assert [(m.id, m.string) for m in cat if m.id] == [('old', 'v2'), ('a', 'b')]
+
+
+@pytest.fixture
+def cache_dir(tmpdir):
+    from sphinx_intl import catalog
+
+    catalog.enable_cache(str(tmpdir / 'cache'))
+    yield str(tmpdir / 'cache')
+    catalog.disable_cache()
+
+
+def test_load_po_from_cache(temp, cache_dir):
+    from sphinx_intl import catalog
+
+    cat = catalog.load_po('_build/locale/README.pot')
+    with mock.patch('babel.messages.pofile.read_po') as read_po:
+        cached = catalog.load_po('_build/locale/README.pot')
+    assert not read_po.called
+    assert [m.id for m in cached] == [m.id for m in cat]
+
+    # changed file is parsed again
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    assert 'test1' in catalog.load_po('_build/locale/README.pot')
+
+
+@pytest.mark.parametrize('ext', ['.gz', '.xz'])
+def test_dump_and_load_compressed_po(temp, ext):
+    from sphinx_intl import catalog
+
+    cat = catalog.load_po('_build/locale/README.pot')
+    catalog.dump_po('out/README.po' + ext, cat)
+    with open('out/README.po' + ext, 'rb') as f:
+        assert b'msgid' not in f.read()
+    # the content is not decompressed into memory
+    module = catalog._compressor('out/README.po' + ext)
+    with mock.patch.object(module, 'decompress', side_effect=AssertionError):
+        loaded = catalog.load_po('out/README.po' + ext)
+    assert [m.id for m in loaded] == [m.id for m in cat]
+
+    # same content is compressed to the same bytes
+    with open('out/README.po' + ext, 'rb') as f:
+        data = f.read()
+    catalog.dump_po('out/README.po' + ext, loaded)
+    with open('out/README.po' + ext, 'rb') as f:
+        assert f.read() == data
+
+
+def test_rewrite_header_is_identical_to_dump_po(temp):
+    from sphinx_intl import catalog
+
+    # a pot file written by sphinx-intl
+    catalog.dump_po('out/README.pot', catalog.load_po('_build/locale/README.pot'))
+    with open('out/README.pot', 'rb') as f:
+        pot = f.read()
+    for lang in ('ja', 'de', 'ru'):
+        cat = catalog.load_po('out/README.pot')
+        cat.locale = lang
+        buf = io.BytesIO()
+        catalog.write_po(buf, cat)
+        assert catalog.rewrite_header(pot, lang) == buf.getvalue()
+
+    assert catalog.init_po('out/README.pot', 'out/ja/README.po', 'ja')
+    assert catalog.load_po('out/ja/README.po').locale_identifier == 'ja'
+
+
+def test_rewrite_header_of_sphinx_pot(tmp_path):
+    from sphinx.cmd.build import build_main
+    from sphinx_intl import catalog
+
+    (tmp_path / 'conf.py').write_text("project = 'test'\n")
+    (tmp_path / 'index.rst').write_text(
+        'Title\n=====\n\nHello "world".\n\n.. note:: Note text\n')
+    out = tmp_path / '_build'
+    assert build_main(['-q', '-b', 'gettext', str(tmp_path), str(out)]) == 0
+    pot_file = str(out / 'index.pot')
+    with open(pot_file, 'rb') as f:
+        pot = f.read()
+    assert pot.endswith(b'msgstr ""\n')
+
+    cat = catalog.load_po(pot_file)
+    cat.locale = 'ja'
+    buf = io.BytesIO()
+    catalog.write_po(buf, cat)
+    assert catalog.rewrite_header(pot, 'ja') == buf.getvalue()
+
+
+@pytest.mark.parametrize('entry', [
+    # sphinx writes each location in a line
+    b'#: a.rst:1\n#: b.rst:2\nmsgid "a"\nmsgstr ""\n',
+    # line number of non-ascii digits
+    '#: a.rst:\u0661\nmsgid "a"\nmsgstr ""\n'.encode('utf-8'),
+    # unsorted locations
+    b'#: b.rst:2 a.rst:1\nmsgid "a"\nmsgstr ""\n',
+    # long msgid
+    b'msgid "' + b'a ' * 40 + b'"\nmsgstr ""\n',
+    # plural forms depend on the language
+    b'msgid "a"\nmsgid_plural "as"\nmsgstr[0] ""\nmsgstr[1] ""\n',
+    # babel adds python-format flag
+    b'msgid "%s"\nmsgstr ""\n',
+    b'#~ msgid "a"\n#~ msgstr ""\n',
+])
+def test_rewrite_header_of_other_format(entry):
+    from sphinx_intl import catalog
+
+    header = b'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n'
+    assert catalog.rewrite_header(header + b'msgid "b"\nmsgstr ""\n\n', 'ja') is not None
+    assert catalog.rewrite_header(header + entry + b'\n', 'ja') is None
+
+
+@pytest.mark.parametrize('jobs', [2, 3, 8])
+def test_load_po_in_chunks(temp, jobs):
+    from sphinx_intl import catalog
+
+    cat = Catalog(locale='ru')
+    for i in range(30):
+        msgid = 'message %d' % (i % 20)  # duplicated msgids are merged
+        if i % 7 == 0:
+            msgid = (msgid, msgid + 's')
+        cat.add(msgid, locations=[('index.rst', i)], flags=['fuzzy'] if i % 3 else [],
+                context='ctx' if i % 5 == 0 else None)
+    cat.obsolete['old'] = Message('old', 'v')
+    catalog.dump_po('out/big.po', cat)
+    with open('out/big.po', 'a') as f:
+        # blank lines in an entry are not boundaries
+        f.write('#: a.rst:1\n\n#: b.rst:2\nmsgid "b"\n\nmsgstr ""\n"b"\n')
+
+    def entries(cat):
+        return [(m.id, m.string, m.context, m.locations, m.flags, m.lineno)
+                for m in list(cat) + list(cat.obsolete.values())]
+
+    serial = catalog.load_po('out/big.po')
+    catalog.enable_split_parse(1, jobs)
+    try:
+        with mock.patch('babel.messages.pofile.read_po',
+                        side_effect=pofile.read_po) as read_po:
+            chunked = catalog.load_po('out/big.po')
+    finally:
+        catalog.disable_split_parse()
+    # only the header is parsed in this process, twice to get the charset
+    assert read_po.call_count == 2
+    assert entries(chunked) == entries(serial)
+    assert chunked.mime_headers == serial.mime_headers
+
+
+def test_load_compressed_po_in_chunks(temp):
+    from sphinx_intl import catalog
+
+    cat = Catalog(locale='ja')
+    for i in range(30):
+        cat.add('message %d' % i, locations=[('index.rst', i)])
+    catalog.dump_po('out/big.po.gz', cat)
+    catalog.enable_split_parse(1, 2)
+    try:
+        with mock.patch('babel.messages.pofile.read_po',
+                        side_effect=pofile.read_po) as read_po:
+            chunked = catalog.load_po('out/big.po.gz')
+    finally:
+        catalog.disable_split_parse()
+    assert read_po.call_count == 2
+    assert [m.id for m in chunked] == [m.id for m in cat]
+
+
+def test_evict_cache(temp, cache_dir):
+    from sphinx_intl import catalog
+
+    for i in range(3):
+        with open('_build/locale/README.pot', 'a') as f:
+            f.write('\nmsgid "test%d"\nmsgstr ""\n' % i)
+        catalog.load_po('_build/locale/README.pot')
+    catalog.enable_cache(cache_dir, max_size=1)
+    assert catalog.evict_cache() == 3
+
+
+@pytest.mark.parametrize('po_file', sorted(GOLDEN_DIR.glob('*.po*')), ids=lambda p: p.name)
+def test_scan_msgids_is_same_as_babel(po_file):
+    from sphinx_intl import catalog
+
+    cat = catalog.load_po(str(po_file))
+    assert catalog.scan_msgids(po_file.read_bytes()) == set(m.id for m in cat if m.id)
+
+
+def test_can_use_gettext():
+    from sphinx_intl import catalog
+
+    with mock.patch('sphinx_intl.catalog.has_gettext', return_value=True):
+        assert catalog.can_use_gettext('a.po', 'a.pot')
+        assert not catalog.can_use_gettext('a.po.gz', 'a.pot')
+    with mock.patch('sphinx_intl.catalog.has_gettext', return_value=False):
+        assert not catalog.can_use_gettext('a.po', 'a.pot')
+
+
+def test_dump_po_replaces_file(temp):
+    from sphinx_intl import catalog
+
+    cat = catalog.load_po('_build/locale/README.pot')
+    catalog.dump_po('out/README.po', cat)
+    with open('out/README.po', 'rb') as f:
+        po = f.read()
+    with mock.patch('sphinx_intl.catalog.os.replace', side_effect=OSError):
+        with pytest.raises(OSError):
+            catalog.dump_po('out/README.po', cat, 40)
+        with pytest.raises(OSError):
+            catalog.write_mo('out/README.mo', cat)
+    assert os.listdir('out') == ['README.po']
+    with open('out/README.po', 'rb') as f:
+        assert f.read() == po
+
+
+def test_diff_catalogs():
+    from sphinx_intl import catalog
+
+    old = Catalog(locale='ja')
+    old.add('removed', 'a')
+    old.add('retranslated', 'a')
+    old.add('fuzzied', 'a')
+    old.add('unfuzzied', 'a', flags=['fuzzy'])
+    old.add('same', 'a', context='ctx')
+    new = Catalog(locale='ja')
+    new.add('added', 'b')
+    new.add('retranslated', 'b')
+    new.add('fuzzied', 'b', flags=['fuzzy'])
+    new.add('unfuzzied', 'a')
+    new.add('same', 'a', context='ctx')
+    new.add('same', 'b')  # another context
+
+    result = catalog.diff_catalogs(old, new)
+    ids = dict((kind, [(o and o.id, n and n.id) for o, n in pairs])
+               for kind, pairs in result.items())
+    assert ids == {
+        'added': [(None, 'added'), (None, 'same')],
+        'removed': [('removed', None)],
+        'retranslated': [('retranslated', 'retranslated')],
+        'fuzzied': [('fuzzied', 'fuzzied')],
+        'unfuzzied': [('unfuzzied', 'unfuzzied')],
+    }
+    assert catalog.diff_catalogs(None, new)['added'] == [(None, m) for m in new if m.id]
@@ -8,9 +8,13 @@
     :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
     :license: BSD, see LICENSE for details.
 """
+import json
+import os
+
+import mock
 from click.testing import CliRunner
 
-from sphinx_intl import commands
+from sphinx_intl import basic, catalog, commands, locking
 
 runner = CliRunner()
 
@@ -33,7 +37,8 @@ def test_update_simple(temp):
 
 
 def test_update_difference_detect(temp):
-    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja',
+                                         '-v'])
     assert r1.exit_code == 0
     assert r1.output.count('Create:') == 1
     assert r1.output.count('Update:') == 0
@@ -42,7 +47,7 @@ def test_update_difference_detect(temp):
     with open('_build/locale/README.pot', 'a') as f:
         f.write('\nmsgid "test1"\nmsgstr ""\n')
 
-    r2 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale'])
+    r2 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-v'])
     assert r2.exit_code == 0
     assert r2.output.count('Create:') == 0
     assert r2.output.count('Update:') == 1
@@ -54,13 +59,13 @@ def test_update_difference_detect(temp):
     with open('_build/locale/README.pot', 'w') as f:
         f.write(d)
 
-    r3 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale'])
+    r3 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-v'])
     assert r3.exit_code == 0
     assert r3.output.count('Create:') == 0
     assert r3.output.count('Update:') == 1
     assert r3.output.count('Not Changed:') == 0
 
-    r4 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale'])
+    r4 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-v'])
     assert r4.exit_code == 0
     assert r4.output.count('Create:') == 0
     assert r4.output.count('Update:') == 0
@@ -86,6 +91,311 @@ def test_stat_with_multiple_languages(temp):
     assert 'README.po: 0 translated, 0 fuzzy, 1 untranslated.' in r2.output
 
 
+def test_init_language(temp):
+    r1 = runner.invoke(commands.init_language, ['-d', 'locale', '-p', '_build/locale'])
+    assert r1.exit_code != 0
+    assert 'Please specify language with -l option.' in r1.output
+
+    r2 = runner.invoke(commands.init_language, ['-d', 'locale', '-p', '_build/locale',
+                                                '-l', 'ja,de', '-v'])
+    assert r2.exit_code == 0
+    assert 'Create: locale/ja/LC_MESSAGES/README.po' in r2.output
+    assert 'Create: locale/de/LC_MESSAGES/README.po' in r2.output
+
+    r3 = runner.invoke(commands.init_language, ['-d', 'locale,locale2',
+                                                '-p', '_build/locale', '-l', 'ja,ru',
+                                                '--report', 'init.json', '-v'])
+    assert r3.exit_code == 0
+    # existing po file is kept
+    assert 'Create: locale/ja/LC_MESSAGES/README.po' not in r3.output
+    assert 'Create: locale/ru/LC_MESSAGES/README.po' in r3.output
+    assert 'Create: locale2/ja/LC_MESSAGES/README.po' in r3.output
+    assert 'Create: locale2/ru/LC_MESSAGES/README.po' in r3.output
+    with open('init.json') as f:
+        assert json.load(f)['result'] == {'create': 3, 'update': 0, 'notchanged': 0}
+
+
 def test_build(temp):
     result = runner.invoke(commands.build, ['--locale-dir', 'locale'])
     assert result.exit_code == 0
+
+
+def test_multiple_locale_dirs(temp):
+    r1 = runner.invoke(commands.update, ['-d', 'locale,locale2', '-p', '_build/locale',
+                                         '-l', 'ja', '-j', '2', '-v'])
+    assert r1.exit_code == 0
+    assert r1.output.count('Create:') == 2
+    assert 'locale2/ja/LC_MESSAGES/README.po' in r1.output
+
+    r2 = runner.invoke(commands.build, ['-d', 'locale,locale2', '-v'])
+    assert r2.exit_code == 0
+    assert r2.output.count('Build:') == 2
+
+    r3 = runner.invoke(commands.stat, ['-d', 'locale,locale2'])
+    assert r3.exit_code == 0
+    assert r3.output.count('0 translated, 0 fuzzy, 1 untranslated.') == 2
+
+    # both README.po would be built into out/ja/LC_MESSAGES/README.mo
+    for args in (['build'], ['build', '--bundle'], ['sync', '-p', '_build/locale']):
+        r4 = runner.invoke(commands.main, args + ['-d', 'locale,locale2', '-o', 'out'])
+        assert r4.exit_code == 2
+        assert 'would be written to the same file' in r4.output
+    assert not os.path.exists('out')
+
+    os.remove('locale2/ja/LC_MESSAGES/README.po')
+    r5 = runner.invoke(commands.build, ['-d', 'locale,locale2', '-o', 'out', '--bundle'])
+    assert r5.exit_code == 0
+    assert os.path.exists('out/ja.zip')
+
+
+def test_locale_dirs_in_conf_py(temp):
+    with open('conf.py', 'w') as f:
+        f.write("locale_dirs = ['locale', 'locale2']\n")
+    r1 = runner.invoke(commands.main, ['update', '-p', '_build/locale', '-l', 'ja', '-v'])
+    assert r1.exit_code == 0
+    assert r1.output.count('Create:') == 2
+
+
+def test_update_prune_obsolete(temp):
+    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    assert r1.exit_code == 0
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale'])
+    with open('_build/locale/README.pot', 'r') as f:
+        d = f.read().replace('test1', 'test2')
+    with open('_build/locale/README.pot', 'w') as f:
+        f.write(d)
+
+    r2 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale',
+                                         '--prune-obsolete', '-v'])
+    assert r2.exit_code == 0
+    assert 'Update: locale/ja/LC_MESSAGES/README.po +1, -1, pruned 1 obsolete' in r2.output
+
+
+def test_clean(temp):
+    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    assert r1.exit_code == 0
+    with open('locale/ja/LC_MESSAGES/removed.po', 'w') as f:
+        f.write('msgid "removed"\nmsgstr ""\n')
+
+    r2 = runner.invoke(commands.clean, ['-d', 'locale', '-p', '_build/locale', '-n', '-v'])
+    assert r2.exit_code == 0
+    assert 'Would delete: locale/ja/LC_MESSAGES/removed.po' in r2.output
+    assert 'Orphans: 1 would be deleted.' in r2.output
+
+    r3 = runner.invoke(commands.clean, ['-d', 'locale', '-p', '_build/locale', '-n', '-q'])
+    assert r3.exit_code == 0
+    assert r3.output == ''
+
+    r4 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale',
+                                         '--delete-orphans', '-v'])
+    assert r4.exit_code == 0
+    assert 'Delete: locale/ja/LC_MESSAGES/removed.po' in r4.output
+    assert not os.path.exists('locale/ja/LC_MESSAGES/removed.po')
+
+
+def test_clean_shared_output_dir(temp):
+    with open('_build/locale/other.pot', 'w') as f:
+        f.write('msgid "other"\nmsgstr ""\n')
+    runner.invoke(commands.update, ['-d', 'locale,locale2', '-p', '_build/locale', '-l', 'ja'])
+    os.remove('locale/ja/LC_MESSAGES/other.po')
+    os.remove('locale2/ja/LC_MESSAGES/README.po')
+    r1 = runner.invoke(commands.build, ['-d', 'locale,locale2', '-o', 'out'])
+    assert r1.exit_code == 0
+    assert sorted(os.listdir('out/ja/LC_MESSAGES')) == ['README.mo', 'other.mo']
+
+    # mo files of both locale directories are kept
+    args = ['-d', 'locale,locale2', '-p', '_build/locale', '-o', 'out']
+    r2 = runner.invoke(commands.clean, args + ['-n', '-v'])
+    assert r2.exit_code == 0
+    assert 'Would delete' not in r2.output
+
+    os.remove('_build/locale/other.pot')
+    r3 = runner.invoke(commands.clean, args + ['-v'])
+    assert r3.exit_code == 0
+    assert 'Delete: locale2/ja/LC_MESSAGES/other.po' in r3.output
+    assert 'Delete: out/ja/LC_MESSAGES/other.mo' in r3.output
+    assert os.listdir('out/ja/LC_MESSAGES') == ['README.mo']
+
+    # both README.po would be built into out/ja/LC_MESSAGES/README.mo
+    runner.invoke(commands.update, ['-d', 'locale2', '-p', '_build/locale', '-l', 'ja'])
+    r4 = runner.invoke(commands.clean, args)
+    assert r4.exit_code == 2
+    assert 'would be written to the same file' in r4.output
+
+
+def test_cache_dir(temp):
+    r1 = runner.invoke(commands.main, ['--cache-dir', 'cache', 'update', '-d', 'locale',
+                                       '-p', '_build/locale', '-l', 'ja'])
+    assert r1.exit_code == 0
+    r2 = runner.invoke(commands.main, ['--cache-dir', 'cache', 'stat', '-d', 'locale'])
+    assert r2.exit_code == 0
+    assert 'README.po: 0 translated, 0 fuzzy, 1 untranslated.' in r2.output
+    assert os.listdir('cache')
+
+
+def test_split_parse_size(temp):
+    r1 = runner.invoke(commands.main, ['--split-parse-size', '1', 'update', '-d', 'locale',
+                                       '-p', '_build/locale', '-l', 'ja'])
+    assert r1.exit_code == 0
+    assert catalog.get_split_parse() is None
+
+    # chunks are parsed on processes of -j
+    with mock.patch.object(catalog, 'enable_split_parse',
+                           wraps=catalog.enable_split_parse) as enable:
+        r2 = runner.invoke(commands.main, ['--split-parse-size', '1', 'stat', '-d', 'locale',
+                                           '-l', 'ja', '-j', '3'])
+    assert r2.exit_code == 0
+    assert enable.call_args == mock.call(2 ** 20, 3)
+
+    # chunks are parsed on all CPUs without -j option
+    run_stat = basic.run_stat
+    calls = []
+
+    def run_stat_and_record(tasks, jobs, reporter):
+        calls.append((jobs, catalog.get_split_parse()))
+        return run_stat(tasks, jobs, reporter)
+
+    with mock.patch.object(basic, 'run_stat', side_effect=run_stat_and_record):
+        r3 = runner.invoke(commands.main, ['--split-parse-size', '1', 'stat', '-d', 'locale',
+                                           '-l', 'ja'])
+    assert r3.exit_code == 0
+    assert calls == [(1, (2 ** 20, 0))]
+
+
+def test_sync(temp):
+    r1 = runner.invoke(commands.sync, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja',
+                                       '-v'])
+    assert r1.exit_code == 0
+    assert 'Create: locale/ja/LC_MESSAGES/README.po' in r1.output
+    assert 'Build: locale/ja/LC_MESSAGES/README.mo' in r1.output
+    assert 'README.po: 0 translated, 0 fuzzy, 1 untranslated.' in r1.output
+
+    r2 = runner.invoke(commands.sync, ['-d', 'locale', '-p', '_build/locale', '-v'])
+    assert r2.exit_code == 0
+    assert 'Not Changed: locale/ja/LC_MESSAGES/README.po' in r2.output
+    assert 'Build:' not in r2.output
+
+
+def test_shard_reports(temp):
+    with open('_build/locale/other.pot', 'w') as f:
+        f.write('msgid "other"\nmsgstr ""\n')
+    for k in (1, 2):
+        r = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja',
+                                            '--shard', '%d/2' % k,
+                                            '--report', 'update-%d.json' % k])
+        assert r.exit_code == 0
+
+    r1 = runner.invoke(commands.merge_reports, ['update-1.json', 'update-2.json'])
+    assert r1.exit_code == 0
+    assert json.loads(r1.output) == {
+        'command': 'update',
+        'shard': None,
+        'result': {'create': 2, 'update': 0, 'notchanged': 0},
+    }
+
+    r2 = runner.invoke(commands.merge_reports, ['update-1.json'])
+    assert r2.exit_code == 0
+    assert 'shard 2 of 2 are missing' in r2.output
+
+    r3 = runner.invoke(commands.update, ['-d', 'locale', '--shard', '3/2'])
+    assert r3.exit_code != 0
+
+
+def test_verbosity(temp):
+    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    assert r1.exit_code == 0
+    assert r1.output == 'Po files: 1 created, 0 updated, 0 not changed.\n'
+
+    r2 = runner.invoke(commands.build, ['-d', 'locale', '-q'])
+    assert r2.exit_code == 0
+    assert r2.output == ''
+
+    r3 = runner.invoke(commands.stat, ['-d', 'locale'])
+    assert 'README.po: 0 translated, 0 fuzzy, 1 untranslated.' in r3.output
+    r4 = runner.invoke(commands.stat, ['-d', 'locale', '-q'])
+    assert r4.output == ''
+
+    r5 = runner.invoke(commands.sync, ['-d', 'locale', '-p', '_build/locale'])
+    assert r5.output.splitlines() == [
+        'Po files: 0 created, 0 updated, 1 not changed.',
+        'Mo files: 0 built.',
+        'Total: 0 translated, 0 fuzzy, 1 untranslated.',
+    ]
+
+
+def test_backend_without_gettext(temp, monkeypatch):
+    monkeypatch.setattr(catalog, 'has_gettext', lambda: False)
+    r1 = runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja',
+                                         '--backend', 'gettext'])
+    assert r1.exit_code == 0
+    assert 'msgmerge and msgfmt are not found, babel is used.' in r1.output
+    assert os.path.exists('locale/ja/LC_MESSAGES/README.po')
+
+
+def test_lock(temp):
+    r1 = runner.invoke(commands.main, ['--lock', 'sync', '-d', 'locale', '-p', '_build/locale',
+                                       '-l', 'ja'])
+    assert r1.exit_code == 0
+    assert not locking.is_enabled()
+    assert sorted(os.listdir('locale/ja/LC_MESSAGES')) == ['README.mo', 'README.po']
+
+
+def test_diff(temp):
+    runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    runner.invoke(commands.update, ['-d', 'new', '-p', '_build/locale', '-l', 'ja', '-l', 'de'])
+    r1 = runner.invoke(commands.diff, ['locale', '-d', 'new', '-v'])
+    assert r1.exit_code == 0
+    assert 'new/de/LC_MESSAGES/README.po: 1 added, 0 removed' in r1.output
+    assert "  added: 'sphinx-intl: translation support utility for Sphinx'" in r1.output
+    assert 'Po files: 1 changed, 1 not changed.' in r1.output
+
+    r2 = runner.invoke(commands.diff, ['locale', '-d', 'new', '--format', 'json'])
+    assert r2.exit_code == 0
+    assert list(json.loads(r2.output)) == ['new/de/LC_MESSAGES/README.po']
+
+
+def test_export_and_import(temp):
+    runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    r1 = runner.invoke(commands.export, ['-d', 'locale', '-o', 'ja.csv'])
+    assert r1.exit_code == 0
+    with open('ja.csv', encoding='utf-8') as f:
+        data = f.read()
+    assert data.startswith('file,msgctxt,msgid,msgid_plural,msgstr,flags\n')
+    with open('ja.csv', 'w', encoding='utf-8') as f:
+        f.write(data.replace('Sphinx,,,', 'Sphinx,,translated,fuzzy'))
+
+    r2 = runner.invoke(commands.import_, ['ja.csv', '-v', '-j', '2'])
+    assert r2.exit_code == 0
+    assert 'Import: locale/ja/LC_MESSAGES/README.po 1 updated' in r2.output
+    r3 = runner.invoke(commands.stat, ['-d', 'locale'])
+    assert 'README.po: 1 translated, 1 fuzzy, 0 untranslated.' in r3.output
+
+    r4 = runner.invoke(commands.import_, ['-'], input='{"file": "ja.csv", "msgid": "x"}\n')
+    assert r4.exit_code == 2
+    assert 'ja.csv is not an existing po file' in r4.output
+
+
+def test_export_multiple_locale_dirs(temp):
+    runner.invoke(commands.update, ['-d', 'locale,locale2', '-p', '_build/locale', '-l', 'ja'])
+    r1 = runner.invoke(commands.export, ['-d', 'locale,locale2', '-o', 'ja.csv'])
+    assert r1.exit_code == 0
+    assert 'Records: 2 exported.' in r1.output
+    with open('ja.csv', encoding='utf-8') as f:
+        assert f.read().count('file,msgctxt,msgid') == 1
+
+    r2 = runner.invoke(commands.import_, ['ja.csv'])
+    assert r2.exit_code == 0
+
+
+def test_build_bundle(temp):
+    runner.invoke(commands.update, ['-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    r1 = runner.invoke(commands.build, ['-d', 'locale', '--bundle', '-v'])
+    assert r1.exit_code == 0
+    assert 'Bundle: locale/ja.zip 1 of 1 compiled' in r1.output
+    assert os.path.exists('locale/ja.zip')
+    assert not os.path.exists('locale/ja/LC_MESSAGES/README.mo')
+
+    r2 = runner.invoke(commands.build, ['-d', 'locale', '--bundle', '--shard', '1/2'])
+    assert r2.exit_code == 2
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    test_ext
+    ~~~~~~~~
+
+    Test the Sphinx extension.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+import subprocess
+import sys
+
+from sphinx.cmd.build import build_main
+
+from sphinx_intl import ext
+
+CONF_PY = """\
+extensions = ['sphinx_intl']
+language = 'ja'
+locale_dirs = ['locale/']
+"""
+
+PO = """\
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+
+msgid "Hello"
+msgstr "Konnichiwa"
+"""
+
+
+def make_project(path):
+    os.makedirs(str(path / 'locale' / 'ja' / 'LC_MESSAGES'))
+    (path / 'conf.py').write_text(CONF_PY)
+    (path / 'index.rst').write_text('Hello\n')
+    (path / 'locale' / 'ja' / 'LC_MESSAGES' / 'index.po').write_text(PO)
+
+
+def test_build_mo_in_sphinx_build(tmp_path):
+    make_project(tmp_path)
+    out = tmp_path / '_build'
+    assert build_main(['-q', '-b', 'text', str(tmp_path), str(out)]) == 0
+    assert (tmp_path / 'locale' / 'ja' / 'LC_MESSAGES' / 'index.mo').exists()
+    assert 'Konnichiwa' in (out / 'index.txt').read_text()
+
+
+def test_translation_change_in_next_build(tmp_path):
+    # gettext caches translations in a process, builds run in processes
+    make_project(tmp_path)
+    out = tmp_path / '_build'
+    args = [sys.executable, '-m', 'sphinx', '-q', '-b', 'text', str(tmp_path), str(out)]
+    subprocess.check_call(args)
+
+    po_file = tmp_path / 'locale' / 'ja' / 'LC_MESSAGES' / 'index.po'
+    po_file.write_text(PO.replace('Konnichiwa', 'Kon-nichiwa'))
+    st = po_file.stat()
+    os.utime(str(po_file), (st.st_atime, st.st_mtime + 10))
+    subprocess.check_call(args)
+    assert 'Kon-nichiwa' in (out / 'index.txt').read_text()
+
+
+def test_mo_builder_skips_unchanged_po(tmp_path):
+    make_project(tmp_path)
+    locale_dir = str(tmp_path / 'locale')
+    cache_file = str(tmp_path / 'cache.json')
+    mo_file = os.path.join(locale_dir, 'ja', 'LC_MESSAGES', 'index.mo')
+    builder = ext.MoBuilder([locale_dir], 'ja', cache_file)
+    assert builder.build() == [mo_file]
+
+    # a checkout touches the po file without changing its content
+    po_file = os.path.join(locale_dir, 'ja', 'LC_MESSAGES', 'index.po')
+    st = os.stat(mo_file)
+    os.utime(po_file, (st.st_atime, st.st_mtime + 10))
+    builder = ext.MoBuilder([locale_dir], 'ja', cache_file)
+    builder.start()
+    assert builder.join() == []
+    # the mo file is not touched, documents are not outdated by it
+    assert os.stat(mo_file).st_mtime == st.st_mtime
+
+    with open(po_file, 'a') as f:
+        f.write('\nmsgid "World"\nmsgstr "Sekai"\n')
+    st = os.stat(mo_file)
+    os.utime(po_file, (st.st_atime, st.st_mtime + 20))
+    assert ext.MoBuilder([locale_dir], 'ja', cache_file).build() == [mo_file]
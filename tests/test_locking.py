@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+    test_locking
+    ~~~~~~~~~~~~
+
+    Test per-file locks for concurrent runs.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import multiprocessing
+import os
+
+import pytest
+
+from sphinx_intl import basic, locking
+
+pytestmark = pytest.mark.skipif(locking.fcntl is None, reason='fcntl is not available')
+
+
+@pytest.fixture
+def lock(request):
+    locking.enable()
+    request.addfinalizer(locking.disable)
+
+
+def increment(path, count):
+    locking.enable()
+    for i in range(count):
+        with locking.locked(path):
+            with open(path) as f:
+                value = int(f.read())
+            with open(path, 'w') as f:
+                f.write(str(value + 1))
+
+
+def test_locked_without_locking(temp):
+    with locking.locked('counter'):
+        assert not os.path.exists('counter.lock')
+
+
+def test_locked(temp, lock):
+    with locking.locked('out/counter'):
+        assert os.path.exists('out/counter.lock')
+    assert os.listdir('out') == []
+
+
+def test_locked_by_processes(temp):
+    with open('counter', 'w') as f:
+        f.write('0')
+    processes = [multiprocessing.Process(target=increment, args=('counter', 50))
+                 for i in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    with open('counter') as f:
+        assert f.read() == '200'
+    assert not os.path.exists('counter.lock')
+
+
+def test_update_po_created_by_another_run(temp, lock):
+    tasks = basic.update_tasks('locale', '_build/locale', ('ja',))
+    assert not tasks[0].exists
+    # another run creates the po file after planning
+    basic.update('locale', '_build/locale', ('ja',))
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+
+    assert basic.update_po(tasks[0])[0] == 'update'
+    basic.build('locale', 'locale', ('ja',))
+    assert sorted(os.listdir('locale/ja/LC_MESSAGES')) == ['README.mo', 'README.po']
+
+
+def test_replacing_keeps_symlink_and_mode(temp):
+    os.makedirs('real')
+    with open('real/README.po', 'w') as f:
+        f.write('old')
+    os.chmod('real/README.po', 0o640)
+    os.symlink(os.path.join('real', 'README.po'), 'link.po')
+
+    with locking.replacing('link.po') as tmp:
+        assert os.path.dirname(tmp) == os.path.realpath('real')
+        with open(tmp, 'w') as f:
+            f.write('new')
+    assert os.path.islink('link.po')
+    with open('real/README.po') as f:
+        assert f.read() == 'new'
+    assert os.stat('real/README.po').st_mode & 0o777 == 0o640
+    assert os.listdir('real') == ['README.po']
+
+
+def test_replacing_new_file(temp):
+    with locking.replacing('out/new.po') as tmp:
+        open(tmp, 'w').close()
+    assert os.stat('out/new.po').st_mode & 0o777 == 0o666 & ~locking._UMASK
+
+    with pytest.raises(ValueError):
+        with locking.replacing('out/new.po'):
+            raise ValueError
+    assert os.listdir('out') == ['new.po']
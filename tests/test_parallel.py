@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+    test_parallel
+    ~~~~~~~~~~~~~
+
+    Test scheduling of work on the process pool.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import time
+
+import pytest
+
+from sphinx_intl import catalog, locking, parallel
+
+
+def sleep(seconds):
+    started = time.perf_counter()
+    time.sleep(seconds)
+    return started, time.perf_counter()
+
+
+def test_batches():
+    assert parallel._batches([100, 50, 1, 1, 1, 1, 1, 1], 1) == [
+        (0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 7), (7, 8)]
+    assert parallel._batches([100] + [1] * 200, 2) == [(0, 1)] + [
+        (i, i + 12) for i in range(1, 193, 12)] + [(193, 201)]
+
+
+def test_imap_with_sizes():
+    items = [0.01 * i for i in range(20)]
+    results = list(parallel.imap(sleep, items, 2, sizes=list(range(20))))
+    assert len(results) == 20
+
+
+def test_imap_with_memory_budget():
+    # two large items don't fit in the budget of two processes together
+    sizes = [1000, 1000, 1, 1]
+    budget = parallel.footprint(1000) * 3 // 4
+    results = list(parallel.imap(sleep, [0.2, 0.2, 0.01, 0.01], 2, sizes, budget))
+    (start1, end1), (start2, end2) = results[:2]
+    assert end1 <= start2 or end2 <= start1
+
+
+def test_imap_reads_items_lazily():
+    consumed = []
+
+    def items():
+        for i in range(1000):
+            consumed.append(i)
+            yield 0
+
+    results = parallel.imap(sleep, items(), 2)
+    next(results)
+    assert len(consumed) < 20
+    assert len(list(results)) == 999
+
+
+def split_parse(_):
+    return catalog.get_split_parse()
+
+
+def test_imap_parses_serially_in_workers():
+    catalog.enable_split_parse(1, 2)
+    try:
+        assert list(parallel.imap(split_parse, range(4), 2)) == [None] * 4
+    finally:
+        catalog.disable_split_parse()
+
+
+def lock_enabled(_):
+    return locking.is_enabled()
+
+
+@pytest.mark.skipif(locking.fcntl is None, reason='fcntl is not available')
+def test_imap_applies_settings_in_workers():
+    locking.enable()
+    try:
+        assert list(parallel.imap(lock_enabled, range(4), 2)) == [True] * 4
+    finally:
+        locking.disable()
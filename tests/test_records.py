@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+    test_records
+    ~~~~~~~~~~~~
+
+    Test records of po file entries.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import io
+
+import pytest
+from babel.messages import Catalog
+
+from sphinx_intl import records
+
+
+def catalog_records():
+    cat = Catalog(locale='ja')
+    cat.add('Hello', u'こんにちは, "世界"\n', flags=['fuzzy', 'c-format'])
+    cat.add(('apple', 'apples'), ('', 'りんご'), context='fruit')
+    return [records.message_record('locale\\ja\\LC_MESSAGES\\x.po', m) for m in cat if m.id]
+
+
+def test_message_record():
+    assert catalog_records() == [
+        {'file': 'locale/ja/LC_MESSAGES/x.po', 'msgctxt': None, 'msgid': 'Hello',
+         'msgid_plural': None, 'msgstr': u'こんにちは, "世界"\n',
+         'flags': ['c-format', 'fuzzy']},
+        {'file': 'locale/ja/LC_MESSAGES/x.po', 'msgctxt': 'fruit', 'msgid': 'apple',
+         'msgid_plural': 'apples', 'msgstr': ['', 'りんご'], 'flags': []},
+    ]
+
+
+@pytest.mark.parametrize('fmt', records.FORMATS)
+def test_dump_and_load(fmt):
+    expected = catalog_records()
+    buf = io.StringIO()
+    assert records.dump(iter(expected), buf, fmt) == 2
+    buf.seek(0)
+    assert list(records.load(buf, fmt)) == expected
+
+
+def test_load_partial_records():
+    jsonl = io.StringIO('{"file": "x.po", "msgid": "Hello"}\n\n')
+    assert list(records.load(jsonl)) == [{'file': 'x.po', 'msgid': 'Hello'}]
+    csv = io.StringIO('file,msgid,msgstr\nx.po,Hello,\n')
+    assert list(records.load(csv, 'csv')) == [
+        {'file': 'x.po', 'msgctxt': None, 'msgid': 'Hello', 'msgid_plural': None,
+         'msgstr': ''}]
+
+
+@pytest.mark.parametrize('fmt,data', [
+    ('jsonl', '{"file": "x.po", "msgid": "Hello"}\nnot json\n'),
+    ('jsonl', '{"file": "x.po"}\n'),
+    ('csv', 'file,msgid,msgid_plural,msgstr\nx.po,apple,apples,not json\n'),
+])
+def test_load_invalid_records(fmt, data):
+    with pytest.raises(ValueError):
+        list(records.load(io.StringIO(data), fmt))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+    test_report
+    ~~~~~~~~~~~
+
+    Test console reporting.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import io
+
+import pytest
+
+from sphinx_intl import report
+
+
+@pytest.mark.parametrize('quiet, verbose, expected', [
+    (0, 0, report.NORMAL),
+    (1, 0, report.QUIET),
+    (2, 0, report.QUIET),
+    (0, 1, report.VERBOSE),
+    (0, 3, report.VERBOSE),
+    (1, 1, report.NORMAL),
+])
+def test_get_verbosity(quiet, verbose, expected):
+    assert report.get_verbosity(quiet, verbose) == expected
+
+
+def test_reporter_buffers_lines(monkeypatch):
+    monkeypatch.setattr(report, 'FLUSH_INTERVAL', 3600)
+    out = io.StringIO()
+    reporter = report.Reporter(report.VERBOSE, out)
+    reporter.start('test', 3)
+    for i in range(3):
+        reporter.line('file%d' % i)
+        reporter.step()
+    assert out.getvalue() == ''
+    reporter.finish('summary')
+    assert out.getvalue() == 'file0\nfile1\nfile2\nsummary\n'
+
+
+def test_reporter_normal_prints_summary():
+    out = io.StringIO()
+    reporter = report.Reporter(report.NORMAL, out)
+    reporter.start('test', 2)
+    reporter.line('file0')
+    reporter.line('stat0', report.NORMAL)
+    reporter.step(2)
+    reporter.finish('summary')
+    assert out.getvalue() == 'stat0\nsummary\n'
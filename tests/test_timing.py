@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+    test_timing
+    ~~~~~~~~~~~
+
+    Test timing instrumentation.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import json
+
+from click.testing import CliRunner
+
+from sphinx_intl import basic, commands, timing
+
+runner = CliRunner()
+
+
+def test_phases_are_recorded(temp):
+    timing.enable()
+    try:
+        basic.update('locale', '_build/locale', ('ja',))
+        with open('_build/locale/README.pot', 'a') as f:
+            f.write('\nmsgid "test1"\nmsgstr ""\n')
+        basic.update('locale', '_build/locale', ('ja',))
+        basic.build('locale', 'locale', ('ja',))
+    finally:
+        recorder = timing.disable()
+
+    phases = recorder.phases()
+    assert set(phases) >= {'walk', 'parse', 'merge', 'serialize', 'write', 'compile'}
+    assert phases['merge']['count'] == 1
+    files = recorder.files()
+    assert 'parse' in files['_build/locale/README.pot']
+    assert not timing.is_enabled()
+
+
+def test_phase_without_recorder():
+    with timing.phase('parse', 'README.po'):
+        pass
+    assert timing.get_recorder() is None
+
+
+def test_cli_timings(temp):
+    r = runner.invoke(commands.main, [
+        '--timings', '--timings-json', 'trace.json',
+        'update', '-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    assert r.exit_code == 0
+    assert 'Timings:' in r.output
+    assert 'Slowest files:' in r.output
+
+    with open('trace.json') as f:
+        trace = json.load(f)
+    # new po files are created by rewriting the header of the pot file
+    assert 'rewrite' in trace['phases']
+    assert any(e['file'] == 'locale/ja/LC_MESSAGES/README.po' for e in trace['events'])
+    assert trace['peak_rss'] > 0
+    assert 'peak_rss_children' in trace
+
+
+def test_cli_profile(temp):
+    r = runner.invoke(commands.main, [
+        '--profile', 'update.prof',
+        'update', '-d', 'locale', '-p', '_build/locale', '-l', 'ja'])
+    assert r.exit_code == 0
+    assert (temp / 'update.prof').exists()
+
+
+def test_phases_are_recorded_in_workers(temp):
+    timing.enable()
+    try:
+        basic.update('locale', '_build/locale', ('ja', 'de'), jobs=2)
+    finally:
+        recorder = timing.disable()
+
+    files = recorder.files()
+    assert 'rewrite' in files['locale/ja/LC_MESSAGES/README.po']
+    assert 'rewrite' in files['locale/de/LC_MESSAGES/README.po']
+    assert all(start >= 0 for _, _, start, _ in recorder.events)
+
+
+def test_pool_efficiency(temp):
+    timing.enable()
+    try:
+        basic.update('locale', '_build/locale', ('ja', 'de'), jobs=2)
+    finally:
+        recorder = timing.disable()
+
+    pool, = recorder.pools
+    assert pool['jobs'] == 2
+    assert pool['tasks'] == 2
+    assert 0 < pool['efficiency'] <= 1
+    assert any(line.startswith('  pool of 2 jobs: 2 tasks in ')
+               for line in timing.format_summary(recorder))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+    test_tree
+    ~~~~~~~~~
+
+    Test discovery of pot/po/mo files.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+
+from sphinx_intl import basic, tree
+
+
+def test_scan(temp):
+    basic.update('locale', '_build/locale', ('ja', 'de'))
+    os.makedirs('locale/ja/LC_MESSAGES/sub')
+    open('locale/ja/LC_MESSAGES/sub/index.po', 'w').close()
+    open('locale/ja/LC_MESSAGES/notes.txt', 'w').close()
+
+    files = tree.scan('locale/ja', ('.po', '.mo'))
+    assert files['.mo'] == {}
+    assert sorted(files['.po']) == [
+        os.path.join('LC_MESSAGES', 'README'),
+        os.path.join('LC_MESSAGES', 'sub', 'index'),
+    ]
+    entry = files['.po'][os.path.join('LC_MESSAGES', 'README')]
+    assert entry.path == os.path.join('locale/ja', 'LC_MESSAGES', 'README.po')
+    assert entry.size == os.path.getsize(entry.path)
+    assert entry.mtime == os.path.getmtime(entry.path)
+
+
+def test_scan_missing_directory(temp):
+    assert tree.scan('not-exists', ('.pot',)) == {'.pot': {}}
+    assert tree.get_lang_dirs('not-exists') == ()
+
+
+def test_get_lang_dirs(temp):
+    for d in ('ja', 'de', 'pot', 'Upper', '.hidden'):
+        os.makedirs(os.path.join('locale', d))
+    open('locale/file', 'w').close()
+    assert tree.get_lang_dirs('locale') == ('de', 'ja')
+
+
+def test_scan_locale_dir(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    files = tree.scan_locale_dir('locale', ('ja', 'de'), ('.po',))
+    assert list(files['ja']['.po']) == [os.path.join('LC_MESSAGES', 'README')]
+    assert files['de'] == {'.po': {}}
+
+
+def test_scan_compressed_files(temp):
+    os.makedirs('pot')
+    for name in ('a.pot.gz', 'b.pot.xz', 'c.pot', 'c.pot.gz', 'd.txt.gz'):
+        open(os.path.join('pot', name), 'w').close()
+    files = tree.scan('pot', ('.pot',))['.pot']
+    assert sorted(files) == ['a', 'b', 'c']
+    assert files['a'].path == os.path.join('pot', 'a.pot.gz')
+    # uncompressed file is preferred
+    assert files['c'].path == os.path.join('pot', 'c.pot')
+    assert tree.split_ext('index.po.xz') == ('index', '.po', '.xz')
+
+
+def test_scan_cyclic_symlink(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    os.symlink('..', 'locale/ja/LC_MESSAGES/loop')
+    files = tree.scan('locale/ja', ('.po',))['.po']
+    assert list(files) == [os.path.join('LC_MESSAGES', 'README')]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+    test_vcs
+    ~~~~~~~~
+
+    Test change detection with git.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+import subprocess
+from shutil import which
+
+import pytest
+
+from sphinx_intl import basic, vcs
+
+pytestmark = pytest.mark.skipif(not which('git'), reason='git is not installed')
+
+
+def git(*args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+                   + list(args), check=True, stdout=subprocess.PIPE)
+
+
+@pytest.fixture
+def repo(temp):
+    with open('_build/locale/other.pot', 'w') as f:
+        f.write('msgid "other"\nmsgstr ""\n')
+    basic.update('locale', '_build/locale', ('ja',))
+    basic.build('locale', 'locale', ('ja',))
+    git('init', '-q')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'initial')
+    return temp
+
+
+def test_changed_since(repo):
+    with open('locale/ja/LC_MESSAGES/other.po', 'a') as f:
+        f.write('\n')
+    with open('untracked.po', 'w') as f:
+        f.write('')
+    changes = vcs.changed_since('HEAD')
+    assert 'locale/ja/LC_MESSAGES/other.po' in changes
+    assert 'untracked.po' in changes
+    assert 'locale/ja/LC_MESSAGES/README.po' not in changes
+    assert '_build/locale/README.pot' not in changes
+
+
+def test_changed_since_unknown_revision(repo):
+    with pytest.raises(ValueError):
+        vcs.changed_since('no-such-revision')
+
+
+def test_changed_since_outside_of_git(temp):
+    assert vcs.changed_since('HEAD') is None
+    r = basic.update('locale', '_build/locale', ('ja',), changed_since='HEAD')
+    assert r == {'create': 1, 'update': 0, 'notchanged': 0}
+
+
+def test_update_and_build_changed_files(repo):
+    r1 = basic.update('locale', '_build/locale', ('ja',), changed_since='HEAD')
+    assert r1 == {'create': 0, 'update': 0, 'notchanged': 0}
+
+    with open('_build/locale/other.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    r2 = basic.update('locale', '_build/locale', ('ja',), changed_since='HEAD')
+    assert r2 == {'create': 0, 'update': 1, 'notchanged': 0}
+
+    assert basic.build('locale', 'locale', ('ja',), changed_since='HEAD') == [
+        'locale/ja/LC_MESSAGES/other.mo']
+    # missing mo file is built without changes of the po file
+    os.remove('locale/ja/LC_MESSAGES/README.mo')
+    assert basic.build('locale', 'locale', ('ja',), changed_since='HEAD') == [
+        'locale/ja/LC_MESSAGES/README.mo']
+
+
+def test_build_and_sync_missing_mo_files(repo):
+    for name in ('README.mo', 'other.mo'):
+        os.remove(os.path.join('locale/ja/LC_MESSAGES', name))
+    git('rm', '-q', '--cached', 'locale/ja/LC_MESSAGES/README.mo',
+        'locale/ja/LC_MESSAGES/other.mo')
+    git('commit', '-q', '-m', 'no mo files')
+
+    tasks = basic.sync_tasks('locale', '_build/locale', ('ja',),
+                             changed=vcs.changed_since('HEAD'))
+    assert [t.basename for t in tasks] == ['README', 'other']
+    assert basic.build('locale', 'locale', ('ja',), changed_since='HEAD') == [
+        'locale/ja/LC_MESSAGES/README.mo', 'locale/ja/LC_MESSAGES/other.mo']
+
+
+def test_read_files(repo):
+    os.remove('locale/ja/LC_MESSAGES/other.po')
+    contents = vcs.read_files('HEAD', ['locale/ja/LC_MESSAGES/other.po',
+                                       'locale/ja/LC_MESSAGES/README.mo', 'untracked.po',
+                                       'untracked file.po', 'locale/ja/LC_MESSAGES'])
+    with open('locale/ja/LC_MESSAGES/README.mo', 'rb') as f:
+        assert contents['locale/ja/LC_MESSAGES/README.mo'] == f.read()
+    assert b'msgid "other"' in contents['locale/ja/LC_MESSAGES/other.po']
+    assert contents['untracked.po'] is None
+    assert contents['untracked file.po'] is None
+    assert contents['locale/ja/LC_MESSAGES'] is None
+
+
+def test_diff_since(repo):
+    assert basic.diff('HEAD', 'locale', ('ja',)) == {}
+    os.remove('_build/locale/other.pot')
+    os.remove('locale/ja/LC_MESSAGES/other.po')
+    with open('_build/locale/README.pot', 'a') as f:
+        f.write('\nmsgid "test1"\nmsgstr ""\n')
+    basic.update('locale', '_build/locale', ('ja',))
+    r = basic.diff('HEAD', 'locale', ('ja',))
+    assert [c['msgid'] for c in r['locale/ja/LC_MESSAGES/README.po']['added']] == ['test1']
+    assert [c['msgid'] for c in r['locale/ja/LC_MESSAGES/other.po']['removed']] == ['other']
+    with pytest.raises(ValueError):
+        basic.diff('no-such-revision', 'locale', ('ja',))
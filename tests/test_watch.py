@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+    test_watch
+    ~~~~~~~~~~
+
+    Test watch mode.
+
+    :copyright: Copyright 2019 by Takayuki SHIMIZUKAWA.
+    :license: BSD, see LICENSE for details.
+"""
+import os
+import threading
+import time
+
+from sphinx_intl import basic, watch
+
+
+def touch(path, content):
+    with open(path, 'a') as f:
+        f.write(content)
+    # make the change visible even on coarse mtime resolution
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 2))
+
+
+def test_watcher_process_changes(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    basic.build('locale', 'locale', ('ja',))
+    watcher = watch.Watcher([('locale', '_build/locale', ('ja',))])
+    assert watcher.changes() == set()
+
+    touch('_build/locale/README.pot', '\nmsgid "test1"\nmsgstr ""\n')
+    changed = watcher.changes()
+    assert changed == {os.path.join('_build', 'locale', 'README.pot')}
+    assert watcher.process(changed) == 2
+    with open('locale/ja/LC_MESSAGES/README.po') as f:
+        assert 'test1' in f.read()
+
+    # the updated po file is already built
+    changed = watcher.changes()
+    assert changed == {os.path.join('locale', 'ja', 'LC_MESSAGES', 'README.po')}
+    assert watcher.process(changed) == 0
+
+    touch('locale/ja/LC_MESSAGES/README.po', '\n')
+    assert watcher.process(watcher.changes()) == 1
+
+
+def test_watcher_run_with_polling(temp):
+    basic.update('locale', '_build/locale', ('ja',))
+    watcher = watch.Watcher([('locale', '_build/locale', ('ja',))])
+
+    def edit():
+        time.sleep(0.1)
+        touch('_build/locale/README.pot', '\nmsgid "test1"\nmsgstr ""\n')
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    watcher.run(interval=0.02, debounce=0.05, polling=True, cycles=1)
+    thread.join()
+    assert os.path.exists('locale/ja/LC_MESSAGES/README.mo')